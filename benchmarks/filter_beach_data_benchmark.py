@@ -0,0 +1,109 @@
+# Compares the vectorized filter_beach_data against the original per-beach, per-timestamp .loc loop (baseline)
+# on a synthetic month of gridded data. Run from the project root: python -m benchmarks.filter_beach_data_benchmark
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+from functions.API_preprocessing.wave_feature_output import filter_beach_data
+from functions.utils.misc import beach_coordinates_locator
+
+
+def loop_filter_beach_data(beach_info_sensor: pd.DataFrame, unfiltered_beach_data: pd.DataFrame) -> list:
+    """
+    The original filter_beach_data loop, kept unchanged as the baseline: it reads the first wet longitude
+    of the sensor latitude row, where filter_beach_data now reads the located sensor cell.
+    """
+    result_df = []
+    for beach_i in range(len(beach_info_sensor)):
+        var_dict = {}
+
+        for time_point in unfiltered_beach_data.index.levels[0]:
+            lat_point = beach_info_sensor.iloc[beach_i].lat_sensor[1]
+            lon_point = unfiltered_beach_data.loc[(time_point, lat_point)].index[0]
+            var_dict[time_point] = unfiltered_beach_data.loc[(
+                time_point, lat_point, lon_point)]
+
+        result_df.append(pd.DataFrame.from_dict(var_dict, orient='index'))
+    return result_df
+
+
+def first_wet_longitudes(beach_info_sensor: pd.DataFrame, unfiltered_beach_data: pd.DataFrame) -> np.ndarray:
+    """
+    The longitude the original loop reads for every beach, i.e. the first wet cell of the sensor latitude row.
+    """
+    first_time = unfiltered_beach_data.index.levels[0][0]
+    return np.array([unfiltered_beach_data.loc[(first_time, lat_sensor[1])].index[0]
+                     for lat_sensor in beach_info_sensor['lat_sensor']])
+
+
+def synthetic_grid(hours: int, n_lat: int, n_lon: int, n_variables: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Builds a (time, latitude, longitude) DataFrame shaped like a monthly download, with land cells
+    on the western side of every latitude row dropped, as read_api_data does.
+    """
+    rng = np.random.default_rng(seed)
+    times = pd.date_range('2021-12-01', periods=hours, freq='h')
+    lats = np.round(np.linspace(41.96, 43.74, n_lat), 4)
+    lons = np.round(np.linspace(27.09, 28.60, n_lon), 4)
+
+    index = pd.MultiIndex.from_product([times, lats, lons], names=['time', 'latitude', 'longitude'])
+    values = rng.random((len(index), n_variables), dtype=np.float32)
+    grid = pd.DataFrame(values, index=index, columns=[f'V{i}' for i in range(n_variables)])
+
+    coastline = rng.integers(0, n_lon // 2, size=n_lat)
+    land = np.tile(np.arange(n_lon)[None, :] < coastline[:, None], (hours, 1)).ravel()
+    return grid[~land]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hours', type=int, default=48)
+    parser.add_argument('--beaches', type=int, default=63)
+    parser.add_argument('--lat', type=int, default=72)
+    parser.add_argument('--lon', type=int, default=61)
+    parser.add_argument('--variables', type=int, default=19)
+    args = parser.parse_args()
+
+    grid = synthetic_grid(args.hours, args.lat, args.lon, args.variables)
+    beach_info = pd.DataFrame({
+        'latitude': np.random.default_rng(1).uniform(41.96, 43.74, size=args.beaches),
+        'longitude': np.random.default_rng(2).uniform(27.09, 28.60, size=args.beaches),
+    })
+    beach_info_sensor = beach_coordinates_locator(beach_info, grid)
+
+    start = time.perf_counter()
+    expected = loop_filter_beach_data(beach_info_sensor, grid)
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = filter_beach_data(beach_info_sensor, grid)
+    vectorized_seconds = time.perf_counter() - start
+
+    # Beaches whose sensor cell is the first wet cell of its row must match the baseline; the others
+    # differ by design, since the located sensor cell is read instead
+    same_cell = first_wet_longitudes(beach_info_sensor, grid) == np.array(
+        [lon_sensor[1] for lon_sensor in beach_info_sensor['lon_sensor']])
+    for expected_df, result_df in [pair for pair, same in zip(zip(expected, result), same_cell) if same]:
+        pd.testing.assert_frame_equal(expected_df, result_df, check_dtype=False, check_freq=False)
+
+    # Every beach, including those, must read exactly its located (lat_sensor, lon_sensor) cell
+    for beach_i, result_df in enumerate(result):
+        lat_point = beach_info_sensor.iloc[beach_i].lat_sensor[1]
+        lon_point = beach_info_sensor.iloc[beach_i].lon_sensor[1]
+        sensor_cell = pd.DataFrame.from_dict({time_point: grid.loc[(time_point, lat_point, lon_point)]
+                                              for time_point in grid.index.levels[0]}, orient='index')
+        pd.testing.assert_frame_equal(sensor_cell, result_df, check_dtype=False, check_freq=False)
+
+    print(f'{args.beaches} beaches x {args.hours} hours, {len(grid)} grid rows')
+    print(f'same cell as baseline: {same_cell.sum()}/{args.beaches} beaches (the others read the located '
+          f'sensor cell instead of the first wet longitude of the row)')
+    print(f'sensor cell verified:  {len(result)}/{args.beaches} beaches')
+    print(f'baseline loop: {loop_seconds:.3f} s')
+    print(f'vectorized:    {vectorized_seconds:.3f} s')
+    print(f'speedup:       {loop_seconds / vectorized_seconds:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,13 @@
-from functions.utils.misc import remove_months, add_months, beach_coordinates_locator
+from functions.utils.misc import beach_coordinates_locator, monthly_date_ranges, monthly_output_filename
 from functions.API_preprocessing.wave_feature_output import filter_beach_data
-from functions.API_preprocessing.get_api import call_api
+from functions.API_preprocessing.get_api import download_api_data, read_api_data, read_grid_sample, read_beach_points
+from functions.API_preprocessing.netcdf_cache import NetCDFCache
+from functions.data_load_and_transform.parquet_io import write_beach_parquet
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from dateutil.relativedelta import relativedelta
 from datetime import datetime
-from typing import Tuple, Optional
+from typing import List, Tuple, Optional
 import calendar
 import getpass
 import os
@@ -18,6 +21,18 @@ YYYY_MM_datetime_start_date = input(
 YYYY_datetime_end_date, MM_datetime_end_date = map(int, input(
     'Enter the extraction end date (YYYY-MM): ').split('-'))
 OUTPUT_FILENAME = 'black_sea_waves_reanalysis.nc'
+# 'parquet' writes a float32 dataset partitioned by beach/year, 'json' the orient='split' file
+OUTPUT_FORMAT = 'parquet'
+MAX_CONCURRENT_DOWNLOADS = 4  # Months downloaded at once
+MAX_DOWNLOAD_RETRIES = 3  # Retries per month, with exponential backoff
+FILTER_WORKERS = 2  # Months read and filtered at once
+# Read only the beach grid cells from each file, instead of the whole grid. Peak memory scales with beaches x hours.
+LAZY_READ = True
+# The BallTree of the ocean grid cells, used to locate the beach sensors, is stored and reused from here
+OCEAN_CELL_INDEX_DIR = os.path.join(project_root, 'ocean_cell_index')
+# Downloaded months are kept here and reused by later runs. Set CACHE_DIR to None to disable the cache.
+CACHE_DIR = os.path.join(project_root, 'netcdf_cache')
+CACHE_MAX_BYTES = 200 * 1024 ** 3  # Least recently used months are evicted above this size. None for no limit.
 BEACH_INFO = pd.read_csv(os.path.join(
     project_root, 'csv_data', 'beach_info.csv'), index_col=0)
 
@@ -46,66 +61,98 @@ if delta.days > 0 and datetime_end_date.day < datetime_start_date.day:  # Leap y
     total_month_range -= 1
 
 
-# Used to specify start/end date for beach data extraction
-def range_defined_beach_data(start_date: str, end_date: str, total_month_range: int) -> pd.DataFrame:
+# Used to specify start/end date for beach data extraction.
+# Months are downloaded concurrently (I/O bound), while reading and filtering runs on its own pool (CPU bound),
+# so a slow download never blocks the filtering of months that have already arrived.
+def range_defined_beach_data(start_date: str, end_date: str, total_month_range: int,
+                             max_concurrent_downloads: int = MAX_CONCURRENT_DOWNLOADS) -> pd.DataFrame:
 
-    def get_monthly_beach_data(start_date: str, end_date: str, beach_coordinates: Optional[pd.DataFrame] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
-        """
-        Fetches and filters beach data for a given date range.
+    cache = NetCDFCache(CACHE_DIR, CACHE_MAX_BYTES) if CACHE_DIR is not None else None
 
-        This function calls an API to get unfiltered beach data for a specified date range. 
-        It then filters this data based on the provided beach coordinates. 
-        If no coordinates are provided, it uses the `beach_coordinates_locator` function 
-        to determine the coordinates.
+    def download_month(month_start_date: str, month_end_date: str) -> str:
+        """
+        Downloads one month of data into its own NetCDF file, retrying with backoff on failure.
+        Months already in the cache are not downloaded again, and the cached file is pinned until it is filtered.
 
         Parameters:
-        start_date (str): The start date for fetching the data in 'YYYY-MM-DD' format.
-        end_date (str): The end date for fetching the data in 'YYYY-MM-DD' format.
-        beach_coordinates (tuple, optional): A tuple containing the latitude and longitude of the beach. 
-                                            Defaults to None.
+        month_start_date (str): The first hour of the month in 'YYYY-MM-DD HH:MM:SS' format.
+        month_end_date (str): The last hour of the month in 'YYYY-MM-DD HH:MM:SS' format.
 
         Returns:
-        tuple: A tuple where the first element is the filtered beach data and the second element 
-            is the beach coordinates used for filtering.
+        str: The name of the downloaded file.
         """
+        month_filename = monthly_output_filename(OUTPUT_FILENAME, month_start_date)
+        return download_api_data(USERNAME, PASSWORD, month_filename, month_start_date, month_end_date,
+                                 max_retries=MAX_DOWNLOAD_RETRIES, cache=cache, pin=True)
 
-        unfiltered_beach_data = call_api(
-            USERNAME, PASSWORD, OUTPUT_FILENAME, start_date, end_date)
-        if beach_coordinates == None:
-            beach_coordinates = beach_coordinates_locator(
-                BEACH_INFO, unfiltered_beach_data)
-        return filter_beach_data(beach_coordinates, unfiltered_beach_data), beach_coordinates
-
-    filtered_monthly_beach_data = []
-
-    if total_month_range == 0:  # Edge case where only one month is processed
-        filtered_monthly_beach_data, beach_coordinates = get_monthly_beach_data(
-            start_date, end_date, beach_coordinates=None)
-    else:
-        # We carry out this trick, in order to account for varying month length (i.e. 30 or 31 days) and leap years
-        for i in range(total_month_range + 1):
-            if i == 0:
-                # The start_date & end_date are set to the same month
-                end_date = remove_months(end_date, total_month_range)
-                filtered_monthly_beach_data, beach_coordinates = get_monthly_beach_data(
-                    start_date, end_date, beach_coordinates=None)
-            else:
-                # With each iteration, shift start and end by 1 month
-                start_date = add_months(start_date, 1)
-                # The add_months function accounts for the month length variability
-                end_date = add_months(end_date, 1)
-
-                one_month_filtered_beach_data, beach_coordinates = get_monthly_beach_data(
-                    start_date, end_date)
+    def filter_month(month_filename: str, beach_coordinates: Optional[pd.DataFrame] = None) -> Tuple[List[pd.DataFrame], pd.DataFrame]:
+        """
+        Reads and filters one downloaded month. Without a cache, the file is removed afterwards;
+        with a cache, the file is released for eviction.
 
-                if len(one_month_filtered_beach_data) != 63:
-                    raise ValueError("Missing beach data")
+        If no coordinates are provided, it uses the `beach_coordinates_locator` function
+        to determine the coordinates.
 
-                filtered_monthly_beach_data = [pd.concat([df1, df2], ignore_index=False)  # type: ignore
-                                               for df1, df2 in zip(filtered_monthly_beach_data, one_month_filtered_beach_data)]
+        Parameters:
+        month_filename (str): The name of the downloaded NetCDF file.
+        beach_coordinates (pd.DataFrame, optional): The located sensor coordinates of each beach. Defaults to None.
 
-    beach_df = pd.concat(filtered_monthly_beach_data,  # type: ignore
-                         keys=beach_coordinates['beach_name'])  # type: ignore
+        Returns:
+        tuple: A tuple where the first element is the filtered beach data and the second element
+            is the beach coordinates used for filtering.
+        """
+        try:
+            if LAZY_READ:
+                if beach_coordinates is None:
+                    beach_coordinates = beach_coordinates_locator(
+                        BEACH_INFO, read_grid_sample(month_filename), OCEAN_CELL_INDEX_DIR)
+                one_month_filtered_beach_data = read_beach_points(
+                    month_filename, beach_coordinates)
+            else:
+                unfiltered_beach_data = read_api_data(month_filename)
+                if beach_coordinates is None:
+                    beach_coordinates = beach_coordinates_locator(
+                        BEACH_INFO, unfiltered_beach_data, OCEAN_CELL_INDEX_DIR)
+                one_month_filtered_beach_data = filter_beach_data(
+                    beach_coordinates, unfiltered_beach_data)
+        finally:
+            # The month can be evicted from the cache once it has been read
+            if cache is not None:
+                cache.release(month_filename)
+
+        if cache is None:
+            os.remove(month_filename)
+        if len(one_month_filtered_beach_data) != len(beach_coordinates):
+            raise ValueError("Missing beach data")
+        return one_month_filtered_beach_data, beach_coordinates
+
+    month_date_ranges = monthly_date_ranges(start_date, end_date, total_month_range)
+
+    download_pool = ThreadPoolExecutor(max_workers=max_concurrent_downloads)
+    filter_pool = ThreadPoolExecutor(max_workers=FILTER_WORKERS)
+    try:
+        download_futures = [download_pool.submit(download_month, month_start_date, month_end_date)
+                            for month_start_date, month_end_date in month_date_ranges]
+
+        # Downloads are consumed in date order, so the results are assembled in date order as well.
+        # The first month locates the beach coordinates, which every later month reuses.
+        filtered_monthly_beach_data, beach_coordinates = filter_month(
+            download_futures[0].result())
+        filter_futures = [filter_pool.submit(filter_month, download_future.result(), beach_coordinates)
+                          for download_future in download_futures[1:]]
+
+        monthly_beach_data = [filtered_monthly_beach_data] + \
+            [filter_future.result()[0] for filter_future in filter_futures]
+    finally:
+        download_pool.shutdown(cancel_futures=True)
+        filter_pool.shutdown(cancel_futures=True)
+
+    # One concat per beach over all months, instead of re-concatenating the growing frames every month
+    filtered_beach_data = [pd.concat(beach_months, ignore_index=False)
+                           for beach_months in zip(*monthly_beach_data)]
+
+    beach_df = pd.concat(filtered_beach_data,
+                         keys=beach_coordinates['beach_name'])
     beach_df.index.set_names(['beach_name', 'time'], inplace=True)
     return beach_df
 
@@ -115,5 +162,9 @@ temporal_beach_data_df = range_defined_beach_data(
     start_date, end_date, total_month_range)
 
 
-filename = f'temporal_beach_data_df_{datetime_start_date.year}_{datetime_start_date.month}-{datetime_end_date.year}_{datetime_end_date.month}.json'
-temporal_beach_data_df.to_json(filename, orient='split')
+# Named beach_df_* so process_json_to_sql picks it up; zero-padded months sort the files chronologically
+filename = f'beach_df_{datetime_start_date.year}_{datetime_start_date.month:02d}-{datetime_end_date.year}_{datetime_end_date.month:02d}'
+if OUTPUT_FORMAT == 'parquet':
+    write_beach_parquet(temporal_beach_data_df, f'{filename}.parquet')
+else:
+    temporal_beach_data_df.to_json(f'{filename}.json', orient='split')
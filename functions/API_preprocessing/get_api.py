@@ -1,8 +1,20 @@
 # MotuOptions and motu_option_parser sourced from "https://help.marine.copernicus.eu/en/articles/5211063-how-to-use-the-motuclient-within-python-environment"
 
+import os
+import time
+import numpy as np
 import motuclient
 import xarray as xr
 import pandas as pd
+from typing import List, Optional
+from functions.API_preprocessing.netcdf_cache import NetCDFCache
+from functions.API_preprocessing.wave_feature_output import sensor_grid_cells
+
+try:
+    import dask  # noqa: F401  # xarray needs dask to open files chunked
+    CHUNKS = {'time': 24}
+except ImportError:
+    CHUNKS = None
 
 
 class MotuOptions:
@@ -47,9 +59,47 @@ def motu_option_parser(script_template, usr, pwd, output_filename, date_min, dat
     return dictionary
 
 
-def call_api(USERNAME: str, PASSWORD: str, OUTPUT_FILENAME: str, DATE_START: str, DATE_END: str) -> pd.DataFrame:
+API_REQUEST = 'python -m motuclient --motu https://my.cmems-du.eu/motu-web/Motu --service-id BLKSEA_MULTIYEAR_WAV_007_006-TDS --product-id cmems_mod_blk_wav_my_2.5km_PT1H-i --longitude-min 27.09038280355556 --longitude-max 28.605053299999998 --latitude-min 41.9582344 --latitude-max 43.742464399999996 --date-min "2021-12-01 00:00:00" --date-max "2021-12-31 23:00:00" --variable VHM0 --variable VHM0_SW1 --variable VHM0_SW2 --variable VHM0_WW --variable VMDR --variable VMDR_SW1 --variable VMDR_SW2 --variable VMDR_WW --variable VPED --variable VSDX --variable VSDY --variable VTM01_SW1 --variable VTM01_SW2 --variable VTM01_WW --variable VTM02 --variable VTM10 --variable VTMX --variable VTPK --variable VZMX --out-dir <OUTPUT_DIRECTORY> --out-name <OUTPUT_FILENAME> --user <USERNAME> --pwd <PASSWORD>'
+
+
+def request_cache_key(black_sea_data_request: dict) -> str:
     """
-    Calls an API to fetch data, processes the data and returns a DataFrame.
+    Builds the NetCDFCache key of a parsed request from its product id, bounding box, variables and month.
+
+    Parameters:
+    black_sea_data_request (dict): A request parsed by motu_option_parser.
+
+    Returns:
+    str: The cache key of the request.
+    """
+    bbox = [black_sea_data_request[k] for k in
+            ['longitude_min', 'longitude_max', 'latitude_min', 'latitude_max']]
+    month = black_sea_data_request['date_min'][:7]
+    return NetCDFCache.make_key(black_sea_data_request['product_id'], bbox,
+                                black_sea_data_request['variable'], month)
+
+
+def is_readable_netcdf(filename: str) -> bool:
+    """
+    Checks that a downloaded file opens as a NetCDF dataset and its last hour reads, i.e. that the download
+    was not cut off.
+    """
+    try:
+        with xr.open_dataset(filename) as dataset:
+            dataset.isel(time=-1).load()
+        return True
+    except Exception:
+        return False
+
+
+def download_api_data(USERNAME: str, PASSWORD: str, OUTPUT_FILENAME: str, DATE_START: str, DATE_END: str,
+                      max_retries: int = 3, backoff_seconds: float = 30.0,
+                      cache: Optional[NetCDFCache] = None, pin: bool = False) -> str:
+    """
+    Downloads the data for a date range into a NetCDF file, retrying failed requests with exponential backoff.
+
+    When a cache is given, a month that was already downloaded is not requested again,
+    and a new download is moved into the cache.
 
     Parameters:
     USERNAME (str): The username for the API.
@@ -57,18 +107,156 @@ def call_api(USERNAME: str, PASSWORD: str, OUTPUT_FILENAME: str, DATE_START: str
     OUTPUT_FILENAME (str): The name of the output file where the fetched data will be stored.
     DATE_START (str): The start date for the data request in 'YYYY-MM-DD HH:MM:SS' format.
     DATE_END (str): The end date for the data request in 'YYYY-MM-DD HH:MM:SS' format.
+    max_retries (int, Optional): The number of retries after a failed request. Defaults to 3.
+    backoff_seconds (float, Optional): The wait before the first retry, doubled on each further retry. Defaults to 30.
+    cache (NetCDFCache, Optional): The cache of monthly downloads. Defaults to None.
+    pin (bool, Optional): Keep the cached file out of eviction until cache.release() is called with it,
+        i.e. until it has been read. Defaults to False.
 
     Returns:
-    pd.DataFrame: A DataFrame containing the processed data.
+    str: The name of the downloaded (or cached) NetCDF file.
     """
 
-    API_request = 'python -m motuclient --motu https://my.cmems-du.eu/motu-web/Motu --service-id BLKSEA_MULTIYEAR_WAV_007_006-TDS --product-id cmems_mod_blk_wav_my_2.5km_PT1H-i --longitude-min 27.09038280355556 --longitude-max 28.605053299999998 --latitude-min 41.9582344 --latitude-max 43.742464399999996 --date-min "2021-12-01 00:00:00" --date-max "2021-12-31 23:00:00" --variable VHM0 --variable VHM0_SW1 --variable VHM0_SW2 --variable VHM0_WW --variable VMDR --variable VMDR_SW1 --variable VMDR_SW2 --variable VMDR_WW --variable VPED --variable VSDX --variable VSDY --variable VTM01_SW1 --variable VTM01_SW2 --variable VTM01_WW --variable VTM02 --variable VTM10 --variable VTMX --variable VTPK --variable VZMX --out-dir <OUTPUT_DIRECTORY> --out-name <OUTPUT_FILENAME> --user <USERNAME> --pwd <PASSWORD>'
-
+    # Downloaded under a temporary name and renamed once it opens, so a partial file is never mistaken for data
+    partial_filename = OUTPUT_FILENAME + '.part'
     black_sea_data_request = motu_option_parser(
-        API_request, USERNAME, PASSWORD, OUTPUT_FILENAME, DATE_START, DATE_END)
-    motuclient.motu_api.execute_request(MotuOptions(black_sea_data_request))
+        API_REQUEST, USERNAME, PASSWORD, partial_filename, DATE_START, DATE_END)
 
-    black_sea_dataset = xr.open_dataset(OUTPUT_FILENAME)
-    black_sea_df = black_sea_dataset.to_dataframe()
+    if cache is not None:
+        cache_key = request_cache_key(black_sea_data_request)
+        cached_filename = cache.get(cache_key, pin=pin)
+        if cached_filename is not None:
+            return cached_filename
+
+    for attempt in range(max_retries + 1):
+        for filename in (OUTPUT_FILENAME, partial_filename):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+        try:
+            motuclient.motu_api.execute_request(
+                MotuOptions(dict(black_sea_data_request)))
+            # motuclient logs some failures instead of raising, so a file that opens is the real check
+            if os.path.exists(partial_filename) and is_readable_netcdf(partial_filename):
+                os.replace(partial_filename, OUTPUT_FILENAME)
+                if cache is not None:
+                    return cache.put(cache_key, OUTPUT_FILENAME, metadata={
+                        'product_id': black_sea_data_request['product_id'], 'month': DATE_START[:7]}, pin=pin)
+                return OUTPUT_FILENAME
+            error = Exception(f'No complete data was downloaded for {DATE_START} - {DATE_END}')
+        except Exception as e:
+            error = e
+
+        if attempt < max_retries:
+            time.sleep(backoff_seconds * 2 ** attempt)
+
+    if os.path.exists(partial_filename):
+        os.remove(partial_filename)
+    raise Exception(
+        f'Download of {DATE_START} - {DATE_END} failed after {max_retries + 1} attempts') from error
+
+
+def read_api_data(OUTPUT_FILENAME: str) -> pd.DataFrame:
+    """
+    Reads a downloaded NetCDF file into a MultiIndex (time, latitude, longitude) DataFrame.
+
+    Parameters:
+    OUTPUT_FILENAME (str): The name of the NetCDF file.
+
+    Returns:
+    pd.DataFrame: A DataFrame containing the processed data.
+    """
+
+    with xr.open_dataset(OUTPUT_FILENAME) as black_sea_dataset:
+        black_sea_df = black_sea_dataset.to_dataframe()
     black_sea_df = black_sea_df.dropna(how='all')
     return black_sea_df
+
+
+def read_grid_sample(OUTPUT_FILENAME: str) -> pd.DataFrame:
+    """
+    Reads only the first timestamp of a downloaded NetCDF file, i.e. to locate the beach coordinates.
+
+    Parameters:
+    OUTPUT_FILENAME (str): The name of the NetCDF file.
+
+    Returns:
+    pd.DataFrame: A MultiIndex (time, latitude, longitude) DataFrame of one timestamp, without empty rows.
+    """
+
+    with xr.open_dataset(OUTPUT_FILENAME) as black_sea_dataset:
+        grid_sample_df = black_sea_dataset.isel(time=[0]).to_dataframe()
+    return grid_sample_df.dropna(how='all')
+
+
+def grid_indexer(coordinate_index: pd.Index, points: np.ndarray, beach_info_sensor: pd.DataFrame,
+                 coordinate: str) -> np.ndarray:
+    """
+    Positions of the beach coordinates on one grid axis, matched to the nearest cell within half a grid step.
+
+    Raises:
+    ValueError: If a beach coordinate is missing or outside the grid of the file.
+    """
+    tolerance = np.abs(np.diff(coordinate_index.values)).min() / 2 if len(coordinate_index) > 1 else 0
+    indexes = coordinate_index.get_indexer(points, method='nearest', tolerance=tolerance)
+
+    if (indexes == -1).any():
+        beach_names = beach_info_sensor['beach_name'] if 'beach_name' in beach_info_sensor \
+            else beach_info_sensor.index
+        missing_beaches = [str(name) for name in np.asarray(beach_names)[indexes == -1]]
+        raise ValueError(f'The {coordinate} of {", ".join(missing_beaches)} is not on the grid of the file')
+    return indexes
+
+
+def read_beach_points(OUTPUT_FILENAME: str, beach_info_sensor: pd.DataFrame) -> List[pd.DataFrame]:
+    """
+    Lazily reads only the grid cells of the beaches from a downloaded NetCDF file.
+
+    The file is opened chunked along time (when dask is installed) and the beach cells are selected
+    with point indexers before anything is loaded, so memory scales with beaches x hours instead of
+    the full grid. Returns the same per-beach frames as read_api_data followed by filter_beach_data.
+
+    Parameters:
+    OUTPUT_FILENAME (str): The name of the NetCDF file.
+    beach_info_sensor (pd.DataFrame): A DataFrame containing sensor information.
+
+    Returns:
+    List[pd.DataFrame]: A list of DataFrames containing filtered beach data.
+    """
+
+    lat_points, lon_points = sensor_grid_cells(beach_info_sensor)
+
+    with xr.open_dataset(OUTPUT_FILENAME, chunks=CHUNKS) as black_sea_dataset:
+        lat_indexes = grid_indexer(black_sea_dataset.indexes['latitude'], lat_points, beach_info_sensor, 'latitude')
+        lon_indexes = grid_indexer(black_sea_dataset.indexes['longitude'], lon_points, beach_info_sensor, 'longitude')
+        beach_points = black_sea_dataset.isel(latitude=xr.DataArray(lat_indexes, dims='beach'),
+                                              longitude=xr.DataArray(lon_indexes, dims='beach')).load()
+
+    times = beach_points.indexes['time'].rename(None)
+    variables = {name: beach_points[name].transpose('time', 'beach').values
+                 for name in beach_points.data_vars}
+
+    result_df = []
+    for beach_i in range(len(beach_info_sensor)):
+        beach_df = pd.DataFrame({name: values[:, beach_i] for name, values in variables.items()}, index=times)
+        result_df.append(beach_df)
+    return result_df
+
+
+def call_api(USERNAME: str, PASSWORD: str, OUTPUT_FILENAME: str, DATE_START: str, DATE_END: str) -> pd.DataFrame:
+    """
+    Calls an API to fetch data, processes the data and returns a DataFrame.
+
+    Parameters:
+    USERNAME (str): The username for the API.
+    PASSWORD (str): The password for the API.
+    OUTPUT_FILENAME (str): The name of the output file where the fetched data will be stored.
+    DATE_START (str): The start date for the data request in 'YYYY-MM-DD HH:MM:SS' format.
+    DATE_END (str): The end date for the data request in 'YYYY-MM-DD HH:MM:SS' format.
+
+    Returns:
+    pd.DataFrame: A DataFrame containing the processed data.
+    """
+
+    download_api_data(USERNAME, PASSWORD, OUTPUT_FILENAME, DATE_START, DATE_END)
+    return read_api_data(OUTPUT_FILENAME)
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class NetCDFCache:
+    """
+    On-disk cache of monthly NetCDF downloads, keyed by (product-id, bbox, variables, month).
+
+    Every cached file is recorded in a JSON manifest next to the files, so reruns and overlapping
+    date ranges reuse the months already fetched, and an interrupted backfill resumes where it stopped.
+    When max_size_bytes is set, the least recently used files are evicted to stay below it. Files handed out
+    with pin=True are never evicted until they are released, i.e. while a downloaded month waits to be filtered.
+    """
+
+    MANIFEST_FILENAME = 'manifest.json'
+
+    def __init__(self, cache_dir: str, max_size_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.manifest_path = os.path.join(cache_dir, self.MANIFEST_FILENAME)
+        self._lock = threading.Lock()
+        self._pins: Dict[str, int] = {}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.entries = self._read_manifest()
+
+    @staticmethod
+    def make_key(product_id: str, bbox: List[float], variables: List[str], month: str) -> str:
+        """
+        Builds the content address of a monthly download.
+
+        Parameters:
+        product_id (str): The product id of the request.
+        bbox (List[float]): longitude-min, longitude-max, latitude-min, latitude-max of the request.
+        variables (List[str]): The requested variables.
+        month (str): The month in 'YYYY-MM' format.
+
+        Returns:
+        str: A SHA-256 hex digest identifying the download.
+        """
+        key_fields = {
+            'product_id': product_id,
+            'bbox': [round(float(value), 6) for value in bbox],
+            'variables': sorted(variables),
+            'month': month,
+        }
+        return hashlib.sha256(json.dumps(key_fields, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _read_manifest(self) -> Dict[str, dict]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+
+        with open(self.manifest_path, 'r') as file:
+            entries = json.load(file)['entries']
+
+        # Drop entries whose file was removed outside of the cache
+        return {key: entry for key, entry in entries.items()
+                if os.path.exists(os.path.join(self.cache_dir, entry['filename']))}
+
+    def _write_manifest(self) -> None:
+        # Written to a temporary file first, so a crash never leaves a half-written manifest
+        temporary_path = self.manifest_path + '.tmp'
+        with open(temporary_path, 'w') as file:
+            json.dump({'version': 1, 'entries': self.entries}, file, indent=1)
+        os.replace(temporary_path, self.manifest_path)
+
+    def get(self, key: str, pin: bool = False) -> Optional[str]:
+        """
+        Returns the path of a cached file and marks it as recently used, or None on a cache miss.
+        With pin, the file is kept out of eviction until release() is called with its path.
+        """
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            if pin:
+                self._pins[key] = self._pins.get(key, 0) + 1
+            entry['last_access'] = time.time()
+            self._write_manifest()
+            return os.path.join(self.cache_dir, entry['filename'])
+
+    def put(self, key: str, source_path: str, metadata: Optional[dict] = None, pin: bool = False) -> str:
+        """
+        Moves a downloaded file into the cache, then evicts old files if the cache is over its size limit.
+
+        Parameters:
+        key (str): The key returned by make_key.
+        source_path (str): The downloaded file.
+        metadata (dict, optional): Extra fields stored in the manifest, i.e. the month of the file.
+        pin (bool, optional): Keep the file out of eviction until release() is called. Defaults to False.
+
+        Returns:
+        str: The path of the cached file.
+        """
+        filename = f'{key}.nc'
+        cached_path = os.path.join(self.cache_dir, filename)
+        shutil.move(source_path, cached_path)
+
+        with self._lock:
+            now = time.time()
+            self.entries[key] = {
+                **(metadata or {}),
+                'filename': filename,
+                'size': os.path.getsize(cached_path),
+                'created': now,
+                'last_access': now,
+            }
+            if pin:
+                self._pins[key] = self._pins.get(key, 0) + 1
+            self._evict(keep_key=key)
+            self._write_manifest()
+
+        return cached_path
+
+    def release(self, cached_path: str) -> None:
+        """
+        Releases a file pinned by get or put, then evicts old files if the cache is over its size limit.
+        """
+        filename = os.path.basename(cached_path)
+        with self._lock:
+            for key, entry in self.entries.items():
+                if entry['filename'] == filename and self._pins.get(key):
+                    self._pins[key] -= 1
+                    if not self._pins[key]:
+                        del self._pins[key]
+                    break
+            self._evict()
+            self._write_manifest()
+
+    def size(self) -> int:
+        """
+        Returns the total size of the cached files in bytes.
+        """
+        return sum(entry['size'] for entry in self.entries.values())
+
+    def _evict(self, keep_key: Optional[str] = None) -> None:
+        if self.max_size_bytes is None:
+            return
+
+        # Least recently used first; the file that was just added and pinned files are never evicted
+        for key in sorted(self.entries, key=lambda k: self.entries[k]['last_access']):
+            if self.size() <= self.max_size_bytes:
+                break
+            if key == keep_key or key in self._pins:
+                continue
+
+            entry = self.entries.pop(key)
+            cached_path = os.path.join(self.cache_dir, entry['filename'])
+            if os.path.exists(cached_path):
+                os.remove(cached_path)
@@ -1,39 +1,58 @@
+import numpy as np
 import pandas as pd
-from typing import List
+from typing import List, Tuple
 
 
-def filter_beach_data(beach_info_sensor: pd.DataFrame, unfiltered_beach_data: pd.DataFrame) -> pd.DataFrame:
+def sensor_grid_cells(beach_info_sensor: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the grid cell of each beach, as located by beach_coordinates_locator.
+
+    Parameters:
+        - beach_info_sensor (pd.DataFrame): A DataFrame containing sensor information.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The latitude and longitude of the grid cell of each beach.
+    """
+    lat_points = np.array([lat_sensor[1] for lat_sensor in beach_info_sensor['lat_sensor']])
+    lon_points = np.array([lon_sensor[1] for lon_sensor in beach_info_sensor['lon_sensor']])
+    return lat_points, lon_points
+
+
+def filter_beach_data(beach_info_sensor: pd.DataFrame, unfiltered_beach_data: pd.DataFrame) -> List[pd.DataFrame]:
     """
     Filters beach data based on sensor information and associated unfiltered beach data.
 
+    For each beach, the sensor grid cell is taken at every timestamp. All beaches and timestamps
+    are gathered in one indexed take, instead of a .loc lookup per beach and timestamp.
+
     Parameters:
         - beach_info_sensor (pd.DataFrame): A DataFrame containing sensor information.
-        - unfiltered_beach_data (pd.DataFrame): A Multiindex DataFrame containing beach data.
+        - unfiltered_beach_data (pd.DataFrame): A Multiindex (time, latitude, longitude) DataFrame containing beach data.
 
     Returns:
         List[pd.DataFrame]: A list of DataFrames containing filtered beach data.
     """
-    result_df = []
-    for beach_i in range(len(beach_info_sensor)):
-        var_dict = {}
+    times = unfiltered_beach_data.index.levels[0]
+    lat_points, lon_points = sensor_grid_cells(beach_info_sensor)
 
-        for time in unfiltered_beach_data.index.levels[0]:
-            lat_point = beach_info_sensor.iloc[beach_i].lat_sensor[1]
-            lon_point = unfiltered_beach_data.loc[(time, lat_point)].index[0]
+    if not np.isin(lat_points, unfiltered_beach_data.index.levels[1]).all():
+        raise Exception('Latitude sensor not found')
 
-            if lat_point in unfiltered_beach_data.index.levels[1]:
-                pass
-            else:
-                raise Exception('Latitude sensor not found')
+    # (beach, time) cells, beach-major, so each beach is a contiguous block of rows
+    sensor_cells = pd.MultiIndex.from_arrays([
+        np.tile(times, len(lat_points)),
+        np.repeat(lat_points, len(times)),
+        np.repeat(lon_points, len(times)),
+    ])
+    beach_rows = unfiltered_beach_data.index.get_indexer(sensor_cells)
+    if (beach_rows < 0).any():
+        raise Exception('Longitude Sensor not found')
 
-            if lon_point in unfiltered_beach_data.loc[(time, lat_point)].index:
-                pass
-            else:
-                raise Exception('Longitude Sensor not found')
+    gathered = unfiltered_beach_data.iloc[beach_rows]
+    times = times.rename(None)
 
-            var_dict[time] = unfiltered_beach_data.loc[(
-                time, lat_point, lon_point)]
-
-        e = pd.DataFrame.from_dict(var_dict, orient='index')
-        result_df.append(e)
+    result_df = []
+    for beach_i in range(len(beach_info_sensor)):
+        beach_df = gathered.iloc[beach_i * len(times):(beach_i + 1) * len(times)]
+        result_df.append(beach_df.set_axis(times, axis=0))
     return result_df
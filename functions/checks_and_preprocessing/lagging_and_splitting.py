@@ -2,24 +2,52 @@ from pandas import DataFrame
 from typing import Tuple, Union
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
 
 
-def create_lagged_features(dataframe: DataFrame, lag: int = 3) -> DataFrame:
+def create_lagged_features(dataframe: DataFrame, lag: int = 3, float32: bool = False) -> DataFrame:
     """
     Creates lagged features for a DataFrame.
 
+    The lags of each group of columns of the same dtype are built as one shifted NumPy block, and all blocks
+    are joined to the DataFrame in a single concat. Lag columns get the dtype shift() would give them
+    (float columns keep their precision, integer columns become float64). Columns are named
+    f"{feature}_lag_{i}", grouped by feature, after the original columns.
+
     Parameters:
     dataframe (DataFrame): The input DataFrame.
     lag (int): The number of lags to create.
+    float32 (bool): Whether to return all columns as float32. Defaults to False.
 
     Returns:
     DataFrame: A DataFrame with the lagged features.
     """
-    dataframe_copy = dataframe.copy()
-
-    for feature in dataframe.columns:
-        for i in range(1, lag + 1):
-            dataframe_copy[f"{feature}_lag_{i}"] = dataframe[feature].shift(i)
+    base_df = dataframe.astype(np.float32) if float32 else dataframe
+    lag_dtypes = base_df.head(1).shift(1).dtypes
+
+    dtype_groups = {}
+    for column, dtype in lag_dtypes.items():
+        dtype_groups.setdefault(dtype, []).append(column)
+
+    lagged_blocks = []
+    for dtype, group_columns in dtype_groups.items():
+        group_lag_columns = [f"{feature}_lag_{i}" for feature in group_columns for i in range(1, lag + 1)]
+        if isinstance(dtype, np.dtype):
+            values = base_df[group_columns].to_numpy(dtype=dtype)
+            lagged = np.full((len(base_df), len(group_columns), lag), np.nan, dtype=dtype)
+            for i in range(1, lag + 1):
+                lagged[i:, :, i - 1] = values[:-i]
+            lagged_blocks.append(DataFrame(lagged.reshape(len(base_df), -1), index=base_df.index,
+                                           columns=group_lag_columns))
+        else:
+            # Extension dtypes (i.e. nullable integers) are shifted column by column
+            lagged_blocks.append(pd.concat({f"{feature}_lag_{i}": base_df[feature].shift(i)
+                                            for feature in group_columns for i in range(1, lag + 1)}, axis=1))
+
+    lag_columns = [f"{feature}_lag_{i}" for feature in base_df.columns for i in range(1, lag + 1)]
+    dataframe_copy = pd.concat([base_df] + lagged_blocks, axis=1)
+    dataframe_copy = dataframe_copy[list(base_df.columns) + lag_columns]
 
     dataframe_copy = dataframe_copy.dropna()
 
@@ -43,19 +71,83 @@ def split_dataframe(dataframe: DataFrame, train_ratio: float = 0.7, valid_ratio:
     train_length = int(total_length * train_ratio)
     valid_length = int(total_length * valid_ratio)
 
-    train = dataframe.iloc[:train_length].values
-    valid = dataframe.iloc[train_length:train_length + valid_length].values
-    test = dataframe.iloc[train_length + valid_length:].values
+    # One array for the whole frame; the splits are views into it
+    values = dataframe.to_numpy()
+    train = values[:train_length]
+    valid = values[train_length:train_length + valid_length]
+    test = values[train_length + valid_length:]
 
     test_index = dataframe.index[train_length + valid_length:]
 
     return train, valid, test, test_index  # type: ignore
 
 
+def create_scaler(scaler_type: str):
+    """
+    Creates an unfitted MinMaxScaler ('minmax') or StandardScaler ('standard').
+
+    Parameters:
+    scaler_type (str): Type of scaler to use. Choose either 'minmax' or 'standard'.
+
+    Returns:
+    The scaler, or None for an unknown scaler type.
+    """
+
+    if scaler_type == 'minmax':
+        return MinMaxScaler(feature_range=(0, 1))
+    if scaler_type == 'standard':
+        return StandardScaler()
+    return None
+
+
+def scale_data(train: np.ndarray, valid: np.ndarray, test: np.ndarray, scaler_type: str) -> tuple:
+    """
+    Function to scale data using either MinMaxScaler or StandardScaler.
+
+    Parameters:
+    train (np.ndarray): Training data to be scaled.
+    valid (np.ndarray): Validation data to be scaled.
+    test (np.ndarray): Test data to be scaled.
+    scaler_type (str): Type of scaler to use. Choose either 'minmax' or 'standard'.
+
+    Returns:
+    tuple: Scaled training, validation and test data as numpy np.ndarray, and the fitted scaler.
+    """
+
+    scaler = create_scaler(scaler_type)
+    if scaler is None:
+        return "Invalid scaler type. Choose either 'minmax' or 'standard'."  # type: ignore
+
+    train_scaled = scaler.fit_transform(train)
+    valid_scaled = scaler.transform(valid)
+    test_scaled = scaler.transform(test)
+
+    return train_scaled, valid_scaled, test_scaled, scaler
+
+
+def inverse_scale_data(scaler, *arrays):
+    """
+    Function to inverse scale data using a fitted scaler.
+
+    Parameters:
+    scaler: The fitted scaler used for the original scaling.
+    *arrays (np.ndarray): Scaled data arrays to be inverse transformed.
+
+    Returns:
+    tuple: Original unscaled data as numpy np.ndarray.
+    """
+
+    return tuple(scaler.inverse_transform(array) for array in arrays)
+
+
 def sliding_window(dataset: np.ndarray, window_size: int) -> Union[Tuple[np.ndarray, np.ndarray], str]:
     """
     Transforms a dataset into overlapping sequences (or "sliding windows") of a specific size.
 
+    The windows are strided views into dataset, so no data is copied whatever the window size. Both arrays
+    are read-only and share memory with dataset; copy them (np.array(x)) before writing to them.
+    As before, the last full window is left out: there are len(dataset) - window_size - 1 windows.
+
     Parameters:
     dataset (ndarray): The input dataset as a NumPy array.
     window_size (int): The size of the sequences (or "windows").
@@ -67,15 +159,17 @@ def sliding_window(dataset: np.ndarray, window_size: int) -> Union[Tuple[np.ndar
     if window_size <= 0:
         return "Error: window_size should be greater than 0."
 
-    x = []
-    y = []
+    dataset = np.asarray(dataset)
+    n_windows = max(len(dataset) - window_size - 1, 0)
 
-    for i in range(len(dataset) - window_size - 1):
-        window = dataset[i:(i+window_size), :]
-        x.append(window)
-        y.append(dataset[i+window_size, :])
+    if n_windows == 0:
+        x = np.empty((0, window_size) + dataset.shape[1:], dtype=dataset.dtype)
+        x.flags.writeable = False
+    else:
+        # (windows, features, window_size) view, moved to (windows, window_size, features)
+        x = np.moveaxis(sliding_window_view(dataset, window_size, axis=0)[:n_windows], -1, 1)
 
-    x = np.array(x)
-    y = np.array(y)
+    y = dataset[window_size:window_size + n_windows].view()
+    y.flags.writeable = False
 
     return x, y
@@ -1,10 +1,20 @@
+import numpy as np
 import pandas as pd
+from sqlalchemy import text
+
+from functions.data_load_and_transform.sql_connections import (beach_table_name, get_engine, iter_beach_data,
+                                                               load_beach_info)
+from functions.sql.duckdb_backend import get_duckdb_connection, is_duckdb_url, quote_duckdb, read_duckdb_sql
+
+GAP_TABLE_COLUMNS = ['beach', 'kind', 'column', 'start', 'end', 'n_hours']
 
 
 def check_missing_or_nan(single_beach_df, beach_name_sql_table, DATA_STARTDATE="1979-01-01", DATA_ENDDATE="2021-12-31"):
     """
     Analyze a DataFrame for missing hours and NaN values.
 
+    Missing hours and NaN values are printed as runs (first hour, last hour, number of hours).
+
     Parameters:
     -----------
     single_beach_df : pandas.DataFrame
@@ -19,16 +29,279 @@ def check_missing_or_nan(single_beach_df, beach_name_sql_table, DATA_STARTDATE="
     DATA_ENDDATE : str
         The end date of the dataset
     """
-    index_range = pd.date_range(DATA_STARTDATE, DATA_ENDDATE, freq='H')
-    missing_hours = index_range.difference(single_beach_df.index)
+    missing_hours = find_missing_hours(single_beach_df.index, DATA_STARTDATE, f'{DATA_ENDDATE} 23:00')
 
     if missing_hours.empty:
         print(f"No missing hours in {beach_name_sql_table}.")
     else:
         print("Missing hours:")
-        print(missing_hours)
+        print(missing_hours.to_string(index=False))
 
-    if single_beach_df.isna().any().any():
+    nan_runs = find_nan_runs(single_beach_df)
+    if not nan_runs.empty:
         print(f"NaN values in {beach_name_sql_table}")
+        print(nan_runs.to_string(index=False))
     else:
         print(f"No NaN in {beach_name_sql_table}")
+
+
+def run_lengths(mask):
+    """
+    Run-length encode the True runs of every column of a boolean array.
+
+    Parameters:
+    -----------
+    mask : numpy.ndarray
+        Boolean array of shape (rows,) or (rows, columns).
+
+    Returns:
+    --------
+    tuple of numpy.ndarray
+        Column, first row and last row (inclusive) of every run, ordered by column and first row.
+    """
+
+    mask = np.asarray(mask, dtype=np.int8)
+    if mask.ndim == 1:
+        mask = mask[:, None]
+
+    padding = np.zeros((1, mask.shape[1]), dtype=np.int8)
+    edges = np.diff(np.concatenate([padding, mask, padding]), axis=0)
+    start_columns, start_rows = np.nonzero(edges.T == 1)
+    _, end_rows = np.nonzero(edges.T == -1)
+    return start_columns, start_rows, end_rows - 1
+
+
+def find_missing_hours(index, start=None, end=None, freq='h'):
+    """
+    Find the runs of missing timestamps in a datetime index, without building the full expected range.
+
+    Parameters:
+    -----------
+    index : pandas.DatetimeIndex
+        The timestamps present.
+
+    start, end : str or pandas.Timestamp, optional
+        First and last expected timestamp (default is the first and last present).
+
+    freq : str
+        Expected spacing of the timestamps (default is 'h').
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per gap: start and end (first and last missing timestamp) and n_hours (number missing).
+    """
+
+    step = pd.Timedelta(pd.tseries.frequencies.to_offset(freq)).value
+    times = np.unique(pd.DatetimeIndex(index).as_unit('ns').asi8)
+
+    # Expected bounds act as virtual timestamps one step outside the range
+    if start is not None:
+        times = np.concatenate([[pd.Timestamp(start).value - step], times[times >= pd.Timestamp(start).value]])
+    if end is not None:
+        times = np.concatenate([times[times <= pd.Timestamp(end).value], [pd.Timestamp(end).value + step]])
+
+    gaps = np.flatnonzero(np.diff(times) > step)
+    gap_starts = times[gaps] + step
+    gap_ends = times[gaps + 1] - step
+
+    return pd.DataFrame({
+        'start': pd.to_datetime(gap_starts),
+        'end': pd.to_datetime(gap_ends),
+        'n_hours': (gap_ends - gap_starts) // step + 1,
+    })
+
+
+def find_nan_runs(df):
+    """
+    Find the runs of NaN values of every column of a DataFrame indexed by datetime, in one vectorized pass.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per run: column, start and end (first and last NaN timestamp) and n_hours (number of rows).
+    """
+
+    columns, first_rows, last_rows = run_lengths(df.isna().to_numpy())
+    return pd.DataFrame({
+        'column': df.columns[columns],
+        'start': df.index[first_rows],
+        'end': df.index[last_rows],
+        'n_hours': last_rows - first_rows + 1,
+    })
+
+
+def gap_table(beach, missing_hours, nan_runs):
+    tables = [missing_hours.assign(beach=beach, kind='missing', column=None), nan_runs.assign(beach=beach, kind='nan')]
+    return pd.concat([table for table in tables if not table.empty] or [pd.DataFrame(columns=GAP_TABLE_COLUMNS)],
+                     ignore_index=True)[GAP_TABLE_COLUMNS]
+
+
+def detect_gaps(beach_data, start=None, end=None, freq='h'):
+    """
+    Find missing hours and NaN runs of many beaches held in memory.
+
+    Parameters:
+    -----------
+    beach_data : dict of str -> pandas.DataFrame
+        Beach data keyed by beach, i.e. the output of load_many_beaches.
+
+    start, end : str, optional
+        First and last expected hour (default is the first and last hour of each beach).
+
+    freq : str
+        Expected spacing of the timestamps (default is 'h').
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per run, with columns beach, kind ('missing' or 'nan'), column (None for missing hours),
+        start, end and n_hours.
+    """
+
+    tables = [gap_table(beach, find_missing_hours(df.index, start, end, freq), find_nan_runs(df))
+              for beach, df in beach_data.items()]
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=GAP_TABLE_COLUMNS)
+
+
+def find_missing_hours_sql(database_connector, beach, since=None, start=None, end=None):
+    """
+    Find the gaps of a beach table in the database (PostgreSQL or DuckDB), comparing each hour to the next.
+
+    Only the gap boundaries are transferred. With since, only the hours after it are checked, starting
+    from the last hour at or before it, so a gap that straddles since is still found. With start and end,
+    as in find_missing_hours, the hours before the first row and after the last row of the range are
+    reported as gaps too (the whole range when it has no rows).
+
+    Returns:
+    --------
+    pandas.DataFrame
+        As find_missing_hours, for the hourly table.
+    """
+
+    table_name = beach_table_name(beach)
+    duckdb_backend = is_duckdb_url(database_connector)
+    table = quote_duckdb(table_name) if duckdb_backend else \
+        get_engine(database_connector).dialect.identifier_preparer.quote(table_name)
+
+    range_conditions, params = [], {}
+    if start is not None:
+        range_conditions.append('datetime >= :start')
+        params['start'] = pd.Timestamp(start).to_pydatetime()
+    if end is not None:
+        range_conditions.append('datetime <= :end')
+        params['end'] = pd.Timestamp(end).to_pydatetime()
+    conditions, range_params = list(range_conditions), dict(params)
+    if since is not None:
+        conditions.append(f'datetime >= (SELECT coalesce(max(datetime), :since) FROM {table} WHERE datetime <= :since)')
+        params['since'] = pd.Timestamp(since).to_pydatetime()
+    where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    range_sql = f"WHERE {' AND '.join(range_conditions)}" if range_conditions else ''
+    bounds = None
+
+    query = f"""
+        SELECT datetime + interval '1 hour' AS start, next_datetime - interval '1 hour' AS "end"
+        FROM (SELECT datetime, lead(datetime) OVER (ORDER BY datetime) AS next_datetime FROM {table} {where_sql}) hours
+        WHERE next_datetime - datetime > interval '1 hour'
+        ORDER BY datetime"""
+    bounds_query = f'SELECT min(datetime) AS first, max(datetime) AS last FROM {table} {range_sql}'
+
+    if duckdb_backend:
+        connection = get_duckdb_connection(database_connector)
+        gaps = read_duckdb_sql(connection, query, params)
+        if range_conditions:
+            bounds = read_duckdb_sql(connection, bounds_query, range_params)
+    else:
+        with get_engine(database_connector).connect() as connection:
+            gaps = pd.read_sql(text(query), connection, params=params)
+            if range_conditions:
+                bounds = pd.read_sql(text(bounds_query), connection, params=range_params)
+
+    gaps['start'] = pd.to_datetime(gaps['start'])
+    gaps['end'] = pd.to_datetime(gaps['end'])
+    gaps['n_hours'] = ((gaps['end'] - gaps['start']) // pd.Timedelta(hours=1) + 1).astype(np.int64)
+    if bounds is None:
+        return gaps
+
+    # Edge gaps against the requested range, found as find_missing_hours finds them from the first and last row
+    first, last = pd.to_datetime(bounds['first']).iloc[0], pd.to_datetime(bounds['last']).iloc[0]
+    if pd.isna(first):
+        edges = [find_missing_hours(pd.DatetimeIndex([]), start, end)]
+    else:
+        edges = [find_missing_hours(pd.DatetimeIndex([first]), start, None),
+                 find_missing_hours(pd.DatetimeIndex([last]), None, end)]
+    # As for the hours in between, only edge gaps that reach past since are reported
+    edges = [edge if since is None else edge[edge['end'] > pd.Timestamp(since)] for edge in edges]
+    edges = [edge for edge in edges if not edge.empty]
+    if not edges:
+        return gaps
+    return pd.concat([gaps] + edges if not gaps.empty else edges, ignore_index=True) \
+        .sort_values('start', ignore_index=True)
+
+
+def merge_runs(runs, step=pd.Timedelta(hours=1)):
+    """
+    Merge runs of the same column that continue each other, i.e. NaN runs cut by chunk boundaries.
+    """
+
+    if runs.empty:
+        return runs
+
+    runs = runs.sort_values(['column', 'start'], ignore_index=True)
+    new_run = (runs['column'] != runs['column'].shift()) | (runs['start'] != runs['end'].shift() + step)
+    run_id = new_run.cumsum()
+    return runs.groupby(run_id).agg(column=('column', 'first'), start=('start', 'first'), end=('end', 'last'),
+                                    n_hours=('n_hours', 'sum')).reset_index(drop=True)
+
+
+def detect_gaps_in_database(database_connector, beaches=None, since=None, start=None, end=None, batch_freq='Y'):
+    """
+    Find missing hours and NaN runs of many beach tables without loading them.
+
+    Gaps are found in SQL (find_missing_hours_sql); NaN runs are found batch by batch through iter_beach_data
+    and merged across batch boundaries, so memory stays bounded by one batch.
+
+    Parameters:
+    -----------
+    database_connector : str
+        The connector string for the database.
+
+    beaches : list, optional
+        Beach indexes, names or table names (default is all beaches in beach_info.csv).
+
+    since : str, pandas.Timestamp or dict, optional
+        Check only the hours after since, i.e. the previous watermark, for incremental checks after a load.
+        A dict gives one value per table name (default is None, the whole table).
+
+    start, end : str or pandas.Timestamp, optional
+        First and last expected hour; hours missing before the first or after the last row are gaps too
+        (default is the first and last hour of each table).
+
+    batch_freq : str
+        Period of each batch read for the NaN runs (default is 'Y').
+
+    Returns:
+    --------
+    pandas.DataFrame
+        As detect_gaps.
+    """
+
+    if beaches is None:
+        beaches = list(range(len(load_beach_info())))
+
+    tables = []
+    for beach in beaches:
+        table_name = beach_table_name(beach)
+        beach_since = since.get(table_name) if isinstance(since, dict) else since
+        nan_starts = [pd.Timestamp(start)] if start is not None else []
+        if beach_since is not None:
+            nan_starts.append(pd.Timestamp(beach_since) + pd.Timedelta(hours=1))
+        nan_start = max(nan_starts, default=None)
+
+        nan_runs = [find_nan_runs(batch) for batch in iter_beach_data(database_connector, table_name, start=nan_start,
+                                                                     end=end, dtype=None, batch_freq=batch_freq)]
+        nan_runs = pd.concat(nan_runs, ignore_index=True) if nan_runs else find_nan_runs(pd.DataFrame())
+        missing_hours = find_missing_hours_sql(database_connector, table_name, beach_since, start, end)
+        tables.append(gap_table(table_name, missing_hours, merge_runs(nan_runs)))
+
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=GAP_TABLE_COLUMNS)
@@ -0,0 +1,167 @@
+import json
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from typing import Dict, Optional, Tuple
+
+from functions.checks_and_preprocessing.lagging_and_splitting import create_scaler, sliding_window
+
+
+class PreprocessingPipeline:
+    """
+    Resample -> split -> scale -> window in one pass, with the fitted transform saved next to the model.
+
+    The resampled data is copied once into a single array, scaled in place with the scaler fitted on the
+    training rows, and the splits and windows are views into it. The fitted scaling is stored as the affine
+    map x * scale + offset (the same map as the sklearn scaler), so a saved pipeline applies exactly the
+    training transform at inference, and inverse_transform undoes it for 2D arrays and windows alike.
+    """
+
+    def __init__(self, freq: Optional[str] = None, agg: str = 'mean', train_ratio: float = 0.7,
+                 valid_ratio: float = 0.15, scaler_type: str = 'minmax', window_size: Optional[int] = None,
+                 dtype: str = 'float64'):
+        """
+        Parameters:
+        freq (str, Optional): Resample frequency, i.e. 'D'. Defaults to None (no resampling).
+        agg (str): Aggregation of each resampled bin. Defaults to 'mean'.
+        train_ratio (float): The ratio of the training set. Defaults to 0.7.
+        valid_ratio (float): The ratio of the validation set. Defaults to 0.15.
+        scaler_type (str): 'minmax' or 'standard'. Defaults to 'minmax'.
+        window_size (int, Optional): The size of the windows. Defaults to None (no windowing).
+        dtype (str): dtype of the scaled array. Defaults to 'float64', which matches scale_data to rounding;
+            'float32' halves the memory, with scaled values within about 1e-6 of it.
+        """
+        self.freq = freq
+        self.agg = agg
+        self.train_ratio = train_ratio
+        self.valid_ratio = valid_ratio
+        self.scaler_type = scaler_type
+        self.window_size = window_size
+        self.dtype = dtype
+
+        self.columns = None
+        self.scale_ = None
+        self.offset_ = None
+
+    def resample(self, dataframe: DataFrame) -> DataFrame:
+        if self.freq is None:
+            return dataframe
+        return dataframe.resample(self.freq).agg(self.agg)
+
+    def split_lengths(self, total_length: int) -> Tuple[int, int]:
+        """
+        Train and validation lengths, as in split_dataframe.
+        """
+        return int(total_length * self.train_ratio), int(total_length * self.valid_ratio)
+
+    def fit_transform(self, dataframe: DataFrame) -> Dict[str, object]:
+        """
+        Fits the scaling on the training rows and returns the scaled splits (and windows).
+
+        Parameters:
+        dataframe (DataFrame): The hourly beach data, indexed by datetime.
+
+        Returns:
+        Dict[str, object]: 'train', 'valid' and 'test' scaled arrays, 'test_index', and with window_size
+        'trainX', 'trainY', 'valX', 'valY', 'testX', 'testY' as returned by sliding_window.
+        """
+        resampled = self.resample(dataframe)
+        self.columns = list(resampled.columns)
+        values = resampled.to_numpy(dtype=self.dtype, copy=True)
+
+        train_length, valid_length = self.split_lengths(len(values))
+        scaler = create_scaler(self.scaler_type)
+        if scaler is None:
+            raise ValueError("Invalid scaler type. Choose either 'minmax' or 'standard'.")
+        scaler.fit(values[:train_length])
+
+        # Both scalers are affine: MinMaxScaler is x * scale_ + min_, StandardScaler is (x - mean_) / scale_
+        if self.scaler_type == 'minmax':
+            self.scale_, self.offset_ = scaler.scale_, scaler.min_
+        else:
+            self.scale_, self.offset_ = 1.0 / scaler.scale_, -scaler.mean_ / scaler.scale_
+
+        self.scale_values(values)
+        return self.split(values, resampled.index)
+
+    def scale_values(self, values: np.ndarray) -> np.ndarray:
+        values *= self.scale_.astype(values.dtype)
+        values += self.offset_.astype(values.dtype)
+        return values
+
+    def split(self, values: np.ndarray, index: pd.DatetimeIndex) -> Dict[str, object]:
+        train_length, valid_length = self.split_lengths(len(values))
+        splits = {
+            'train': values[:train_length],
+            'valid': values[train_length:train_length + valid_length],
+            'test': values[train_length + valid_length:],
+            'test_index': index[train_length + valid_length:],
+        }
+
+        if self.window_size is not None:
+            for name, prefix in (('train', 'train'), ('valid', 'val'), ('test', 'test')):
+                splits[f'{prefix}X'], splits[f'{prefix}Y'] = sliding_window(splits[name], self.window_size)
+
+        return splits
+
+    def transform(self, dataframe: DataFrame) -> np.ndarray:
+        """
+        Resamples and scales new data with the fitted transform, without refitting.
+
+        Returns:
+        np.ndarray: The scaled (time, features) array, in the fitted column order.
+        """
+        self.check_fitted()
+        resampled = self.resample(dataframe)[self.columns]
+        return self.scale_values(resampled.to_numpy(dtype=self.dtype, copy=True))
+
+    def transform_windows(self, dataframe: DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Resamples, scales and windows new data, i.e. the model input at inference.
+        """
+        if self.window_size is None:
+            raise ValueError('window_size is not set')
+        return sliding_window(self.transform(dataframe), self.window_size)  # type: ignore
+
+    def inverse_transform(self, array: np.ndarray) -> np.ndarray:
+        """
+        Maps scaled values (2D arrays, or windows with features on the last axis) back to the original units.
+        """
+        self.check_fitted()
+        return (np.asarray(array) - self.offset_) / self.scale_
+
+    def check_fitted(self) -> None:
+        if self.scale_ is None:
+            raise ValueError('The pipeline is not fitted; call fit_transform first')
+
+    def save(self, path: str) -> None:
+        """
+        Saves the settings and the fitted transform as JSON, i.e. next to the saved model.
+        """
+        self.check_fitted()
+        state = {
+            'freq': self.freq,
+            'agg': self.agg,
+            'train_ratio': self.train_ratio,
+            'valid_ratio': self.valid_ratio,
+            'scaler_type': self.scaler_type,
+            'window_size': self.window_size,
+            'dtype': self.dtype,
+            'columns': self.columns,
+            'scale': self.scale_.tolist(),
+            'offset': self.offset_.tolist(),
+        }
+        with open(path, 'w') as file:
+            json.dump(state, file, indent=1)
+
+    @classmethod
+    def load(cls, path: str) -> 'PreprocessingPipeline':
+        with open(path, 'r') as file:
+            state = json.load(file)
+
+        pipeline = cls(state['freq'], state['agg'], state['train_ratio'], state['valid_ratio'],
+                       state['scaler_type'], state['window_size'], state['dtype'])
+        pipeline.columns = state['columns']
+        pipeline.scale_ = np.array(state['scale'], dtype=np.float64)
+        pipeline.offset_ = np.array(state['offset'], dtype=np.float64)
+        return pipeline
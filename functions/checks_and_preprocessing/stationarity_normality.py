@@ -1,14 +1,69 @@
-from typing import Tuple, Dict
-from scipy.stats import shapiro, normaltest, anderson, kstest
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple, Dict, List, Optional, Sequence
+from scipy.stats import chi2, shapiro, normaltest, anderson, kstest
 from statsmodels.tsa.seasonal import seasonal_decompose
 from statsmodels.tsa.stattools import adfuller, kpss
 from statsmodels.tsa.filters.hp_filter import hpfilter
 import numpy as np
 import pandas as pd
 import warnings
+from functions.data_load_and_transform.sql_connections import iter_beach_data
 warnings.filterwarnings("ignore")
 
 
+# Transforms tried on non-stationary series, each computed only when requested. The seasonal
+# decomposition is computed once per series and shared through the cache dict.
+STATIONARITY_TRANSFORMS = {
+    'raw': lambda series, cache: series,
+    'first_order_diff': lambda series, cache: series.diff(),
+    'second_order_diff': lambda series, cache: series.diff(52),
+    'subtract_rolling_mean': lambda series, cache: series - series.rolling(window=52).mean(),
+    'log_transform': lambda series, cache: np.log(series),
+    'sd_detrend': lambda series, cache: seasonal_detrend(series, cache),
+    'cyclic': lambda series, cache: hpfilter(series)[0],
+}
+
+
+def cached_decomposition(series: pd.Series, cache: dict):
+    if 'decomposition' not in cache:
+        cache['decomposition'] = seasonal_decompose(series)
+    return cache['decomposition']
+
+
+def seasonal_detrend(series: pd.Series, cache: dict) -> pd.Series:
+    decomposition = cached_decomposition(series, cache)
+    return decomposition.observed - decomposition.trend
+
+
+def transform_series(series: pd.Series, transform: str, cache: Optional[dict] = None) -> pd.Series:
+    """
+    Apply one of STATIONARITY_TRANSFORMS to a series and drop the NaN it introduces.
+
+    Parameters:
+    -----------
+    series : pandas.Series
+        The time series to transform.
+    transform : str
+        A key of STATIONARITY_TRANSFORMS.
+    cache : dict, optional
+        Shared between calls on the same series, so the seasonal decomposition is computed once.
+
+    Returns:
+    --------
+    pandas.Series
+    """
+
+    return STATIONARITY_TRANSFORMS[transform](series, {} if cache is None else cache).dropna()
+
+
+def kpss_adf_pvalues(series) -> Tuple[float, float]:
+    """
+    Return the KPSS and ADF p-values of a series.
+    """
+
+    return kpss(series)[1], adfuller(series)[1]
+
+
 def kpss_adf_stationarity(df: pd.DataFrame) -> Tuple[str, str]:
     """
     Check the stationarity of a time series DataFrame.
@@ -28,10 +83,7 @@ def kpss_adf_stationarity(df: pd.DataFrame) -> Tuple[str, str]:
         Each element can be 'Stationary' or 'Non-stationary'.
     """
 
-    kps = kpss(df)
-    adf = adfuller(df)
-
-    kpss_pv, adf_pv = kps[1], adf[1]
+    kpss_pv, adf_pv = kpss_adf_pvalues(df)
     kpssh, adfh = 'KPSS - Stationary', 'ADF - Non-stationary'
 
     if kpss_pv < 0.05:
@@ -60,19 +112,13 @@ def check_stationarity(df: pd.DataFrame, non_stationary: dict) -> None:
     None
     """
 
-    methods = {
-        'first_order_diff': df.diff(),
-        'second_order_diff': df.diff(52),
-        'subtract_rolling_mean': df - df.rolling(window=52).mean(),
-        'log_transform': np.log(df),
-        'sd_detrend': seasonal_decompose(df).observed - seasonal_decompose(df).trend,
-        'cyclic': hpfilter(df)[0]
-    }
-
     for column in non_stationary.keys():
         print(f"\nColumn: {column}")
-        for name, method in methods.items():
-            method = method[column].dropna()
+        cache = {}
+        for name in STATIONARITY_TRANSFORMS:
+            if name == 'raw':
+                continue
+            method = transform_series(df[column], name, cache)
             kpss_s, adf_s = kpss_adf_stationarity(method)
 
             if kpss_s == 'KPSS - Stationary' and adf_s == 'ADF - Stationary':
@@ -114,3 +160,345 @@ def normality_testing(df: pd.DataFrame, p_level: float = 0.05) -> Dict[str, str]
     }
 
     return results
+
+
+def diagnostics_job(beach: str, column: str, series: pd.Series, transforms: Sequence[str],
+                    normality: bool, p_level: float) -> List[dict]:
+    """
+    Run the stationarity tests (and normality tests) of one beach column for the requested transforms.
+
+    The transforms of one series run in the same job, so its seasonal decomposition is computed once.
+
+    Returns:
+    --------
+    list of dict
+        One row per (transform, test), as in run_diagnostics.
+    """
+
+    rows = []
+    cache = {}
+    for transform in transforms:
+        row = {'beach': beach, 'column': column, 'transform': transform}
+        try:
+            transformed = transform_series(series, transform, cache)
+            kpss_pv, adf_pv = kpss_adf_pvalues(transformed)
+        except (ValueError, np.linalg.LinAlgError) as error:
+            rows.append({**row, 'test': 'KPSS/ADF', 'p_value': np.nan, 'result': f'Error: {error}'})
+            continue
+
+        rows.append({**row, 'test': 'KPSS', 'p_value': kpss_pv,
+                     'result': 'Non-stationary' if kpss_pv < p_level else 'Stationary'})
+        rows.append({**row, 'test': 'ADF', 'p_value': adf_pv,
+                     'result': 'Stationary' if adf_pv < p_level else 'Non-stationary'})
+
+        if normality:
+            for test, result in normality_testing(transformed, p_level).items():
+                rows.append({**row, 'test': test, 'p_value': np.nan, 'result': result})
+
+    return rows
+
+
+def run_diagnostics(beach_data: Dict[str, pd.DataFrame], columns: Optional[List[str]] = None,
+                    transforms: Sequence[str] = ('raw',), normality: bool = False, p_level: float = 0.05,
+                    max_workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Run the stationarity (and normality) battery for every beach, column and transform on a process pool.
+
+    Only the requested transforms are computed. Jobs are one (beach, column) series each, fanned out over
+    max_workers processes; on Windows, call this from under if __name__ == '__main__'.
+
+    Parameters:
+    -----------
+    beach_data : dict of str -> pandas.DataFrame
+        Beach data keyed by beach, i.e. the output of load_many_beaches.
+    columns : list of str, optional
+        Columns to test (default is all).
+    transforms : sequence of str
+        Keys of STATIONARITY_TRANSFORMS to test (default is ('raw',)).
+    normality : bool
+        Also run normality_testing on every transformed series (default is False).
+    p_level : float
+        The significance level of the tests (default is 0.05).
+    max_workers : int, optional
+        Number of processes (default is the number of CPUs; 1 runs in-process).
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per (beach, column, transform, test) with the p_value (NaN where a test has none) and result.
+    """
+
+    unknown = set(transforms) - set(STATIONARITY_TRANSFORMS)
+    if unknown:
+        raise ValueError(f'Unknown transforms: {sorted(unknown)}')
+
+    jobs = [(beach, column, df[column], tuple(transforms), normality, p_level)
+            for beach, df in beach_data.items()
+            for column in (columns if columns is not None else df.columns)]
+
+    if max_workers == 1:
+        results = [diagnostics_job(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(diagnostics_job, *zip(*jobs))) if jobs else []
+
+    return pd.DataFrame([row for rows in results for row in rows],
+                        columns=['beach', 'column', 'transform', 'test', 'p_value', 'result'])
+
+
+SHAPIRO_MAX_SAMPLES = 5000
+
+
+def sample_keys(positions: np.ndarray, seed: int) -> np.ndarray:
+    """
+    Pseudo-random uint64 key of every row, derived from its position (i.e. datetime in ns) with splitmix64.
+
+    Keys depend only on the row and the seed, so the rows kept by the smallest keys are the same sample
+    whether the data is processed at once or chunk by chunk.
+    """
+
+    golden = np.uint64(0x9E3779B97F4A7C15)
+    z = positions.astype(np.int64).view(np.uint64) + np.uint64(seed) * golden + golden
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def dagostino_pearson_pvalue(n: np.ndarray, skewness: np.ndarray, kurtosis: np.ndarray) -> np.ndarray:
+    """
+    D'Agostino-Pearson K^2 p-values from the sample size, skewness and (Pearson) kurtosis.
+
+    Same statistic as scipy.stats.normaltest, computed from moments instead of the raw data.
+    """
+
+    n = np.asarray(n, dtype=np.float64)
+    y = skewness * np.sqrt(((n + 1) * (n + 3)) / (6.0 * (n - 2)))
+    beta2 = (3.0 * (n ** 2 + 27 * n - 70) * (n + 1) * (n + 3) / ((n - 2.0) * (n + 5) * (n + 7) * (n + 9)))
+    w2 = -1 + np.sqrt(2 * (beta2 - 1))
+    delta = 1 / np.sqrt(0.5 * np.log(w2))
+    alpha = np.sqrt(2.0 / (w2 - 1))
+    y = np.where(y == 0, 1, y)
+    z_skew = delta * np.log(y / alpha + np.sqrt((y / alpha) ** 2 + 1))
+
+    expected = 3.0 * (n - 1) / (n + 1)
+    variance = 24.0 * n * (n - 2) * (n - 3) / ((n + 1) * (n + 1.0) * (n + 3) * (n + 5))
+    x = (kurtosis - expected) / np.sqrt(variance)
+    sqrt_beta1 = 6.0 * (n * n - 5 * n + 2) / ((n + 7) * (n + 9)) * np.sqrt((6.0 * (n + 3) * (n + 5)) / (n * (n - 2) * (n - 3)))
+    a = 6.0 + 8.0 / sqrt_beta1 * (2.0 / sqrt_beta1 + np.sqrt(1 + 4.0 / (sqrt_beta1 ** 2)))
+    term1 = 1 - 2 / (9.0 * a)
+    denom = 1 + x * np.sqrt(2 / (a - 4.0))
+    term2 = np.sign(denom) * np.where(denom == 0.0, np.nan, np.power((1 - 2.0 / a) / np.abs(denom), 1 / 3.0))
+    z_kurtosis = (term1 - term2) / np.sqrt(2 / (9.0 * a))
+
+    return chi2.sf(z_skew ** 2 + z_kurtosis ** 2, 2)
+
+
+class NormalityAccumulator:
+    """
+    Streaming normality battery over the columns of a DataFrame fed chunk by chunk.
+
+    Every chunk updates NaN-aware count/mean/M2/M3/M4 accumulators of all columns in one vectorized pass,
+    merged with the pairwise update formulas, so skewness, kurtosis and the D'Agostino-Pearson test cover
+    every row. Shapiro-Wilk, Anderson-Darling and Kolmogorov-Smirnov run on a reproducible sample of at most
+    n_samples rows, stratified by calendar month with proportional allocation, kept as the rows with the
+    smallest sample_keys per month.
+    """
+
+    def __init__(self, columns: List[str], n_samples: int = SHAPIRO_MAX_SAMPLES, seed: int = 0):
+        self.columns = list(columns)
+        self.n_samples = n_samples
+        self.seed = seed
+
+        n_columns = len(self.columns)
+        self.count = np.zeros(n_columns)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+        self.m3 = np.zeros(n_columns)
+        self.m4 = np.zeros(n_columns)
+
+        self.stratum_rows: Dict[int, int] = {}
+        self.reservoir_keys: Dict[int, np.ndarray] = {}
+        self.reservoir_values: Dict[int, np.ndarray] = {}
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        values = chunk[self.columns].to_numpy(dtype=np.float64)
+        self.update_moments(values)
+
+        if isinstance(chunk.index, pd.DatetimeIndex):
+            positions, strata = chunk.index.as_unit('ns').asi8, chunk.index.month.to_numpy()
+        else:
+            positions, strata = chunk.index.to_numpy(dtype=np.int64), np.zeros(len(chunk), dtype=np.int64)
+        keys = sample_keys(positions, self.seed)
+
+        for stratum in np.unique(strata):
+            rows = strata == stratum
+            self.stratum_rows[stratum] = self.stratum_rows.get(stratum, 0) + int(rows.sum())
+            stratum_keys = np.concatenate([self.reservoir_keys.get(stratum, keys[:0]), keys[rows]])
+            stratum_values = np.concatenate([self.reservoir_values.get(stratum, values[:0]), values[rows]])
+            if len(stratum_keys) > self.n_samples:
+                keep = np.argpartition(stratum_keys, self.n_samples)[:self.n_samples]
+                stratum_keys, stratum_values = stratum_keys[keep], stratum_values[keep]
+            self.reservoir_keys[stratum], self.reservoir_values[stratum] = stratum_keys, stratum_values
+
+    def update_moments(self, values: np.ndarray) -> None:
+        count_b = np.sum(~np.isnan(values), axis=0).astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_b = np.where(count_b > 0, np.nansum(values, axis=0) / count_b, 0.0)
+            deviation = values - mean_b
+            m2_b = np.nansum(deviation ** 2, axis=0)
+            m3_b = np.nansum(deviation ** 3, axis=0)
+            m4_b = np.nansum(deviation ** 4, axis=0)
+
+            count_a, mean_a, m2_a, m3_a, m4_a = self.count, self.mean, self.m2, self.m3, self.m4
+            count = count_a + count_b
+            safe_count = np.where(count > 0, count, 1.0)
+            delta = mean_b - mean_a
+
+            self.mean = mean_a + delta * count_b / safe_count
+            self.m4 = (m4_a + m4_b
+                       + delta ** 4 * count_a * count_b * (count_a ** 2 - count_a * count_b + count_b ** 2) / safe_count ** 3
+                       + 6 * delta ** 2 * (count_a ** 2 * m2_b + count_b ** 2 * m2_a) / safe_count ** 2
+                       + 4 * delta * (count_a * m3_b - count_b * m3_a) / safe_count)
+            self.m3 = (m3_a + m3_b
+                       + delta ** 3 * count_a * count_b * (count_a - count_b) / safe_count ** 2
+                       + 3 * delta * (count_a * m2_b - count_b * m2_a) / safe_count)
+            self.m2 = m2_a + m2_b + delta ** 2 * count_a * count_b / safe_count
+            self.count = count
+
+    def moments(self) -> pd.DataFrame:
+        """
+        Return count, mean, std, skewness and excess kurtosis of every column (biased, as scipy.stats).
+        """
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pd.DataFrame({
+                'count': self.count,
+                'mean': self.mean,
+                'std': np.sqrt(self.m2 / self.count),
+                'skewness': np.sqrt(self.count) * self.m3 / self.m2 ** 1.5,
+                'kurtosis': self.count * self.m4 / self.m2 ** 2 - 3.0,
+            }, index=self.columns)
+
+    def sample(self) -> np.ndarray:
+        """
+        Return the stratified sample rows, with months allocated in proportion to their row counts.
+        """
+
+        total_rows = sum(self.stratum_rows.values())
+        if total_rows == 0:
+            return np.empty((0, len(self.columns)))
+
+        strata = sorted(self.stratum_rows)
+        n_samples = min(self.n_samples, total_rows)
+        quotas = np.array([self.stratum_rows[stratum] for stratum in strata]) * n_samples / total_rows
+        allocation = np.floor(quotas).astype(int)
+        # Largest remainders get the rows left over by flooring
+        allocation[np.argsort(allocation - quotas)[:n_samples - allocation.sum()]] += 1
+
+        samples = []
+        for stratum, size in zip(strata, allocation):
+            order = np.argsort(self.reservoir_keys[stratum])[:size]
+            samples.append(self.reservoir_values[stratum][order])
+        return np.concatenate(samples)
+
+    def results(self, p_level: float = 0.05) -> Dict[str, Dict[str, str]]:
+        """
+        Return the normality_testing results of every column.
+        """
+
+        moments = self.moments()
+        dagostino_pvalues = dagostino_pearson_pvalue(moments['count'].to_numpy(), moments['skewness'].to_numpy(),
+                                                     moments['kurtosis'].to_numpy() + 3.0)
+        sample = self.sample()
+
+        results = {}
+        for i, column in enumerate(self.columns):
+            column_sample = sample[:, i][~np.isnan(sample[:, i])]
+            _, shapiro_pval = shapiro(column_sample)
+            anderson_stat = anderson(column_sample, dist='norm')
+            _, kstest_pval = kstest(column_sample, 'norm')
+
+            results[column] = {
+                'Shapiro-Wilk': 'Pass normality' if shapiro_pval > p_level else 'Non-normality',
+                "D'Agostino-Pearson": 'Pass normality' if dagostino_pvalues[i] > p_level else 'Non-normality',
+                'Anderson-Darling': 'Pass normality' if anderson_stat.statistic < anderson_stat.critical_values[2] else 'Non-normality',
+                'Kolmogorov-Smirnov': 'Pass normality' if kstest_pval > p_level else 'Non-normality',
+            }
+
+        return results
+
+
+def normality_testing_scalable(df: pd.DataFrame, p_level: float = 0.05, n_samples: int = SHAPIRO_MAX_SAMPLES,
+                               seed: int = 0) -> Dict[str, Dict[str, str]]:
+    """
+    Perform the normality_testing battery on every column of a large DataFrame.
+
+    D'Agostino-Pearson uses the moments of all rows; Shapiro-Wilk, Anderson-Darling and Kolmogorov-Smirnov
+    use a reproducible month-stratified sample of n_samples rows (Shapiro-Wilk is not valid above 5000).
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The DataFrame containing the data to be tested, preferably indexed by datetime.
+
+    p_level : float, optional
+        The significance level for the normality tests (default is 0.05).
+
+    n_samples : int, optional
+        Size of the sample used by the sampled tests (default is 5000).
+
+    seed : int, optional
+        Seed of the sample (default is 0).
+
+    Returns:
+    --------
+    dict
+        The results of each normality test, per column.
+    """
+
+    accumulator = NormalityAccumulator(df.columns, n_samples, seed)
+    accumulator.update(df)
+    return accumulator.results(p_level)
+
+
+def normality_testing_from_database(database_connector: str, beach, columns: Optional[List[str]] = None,
+                                    p_level: float = 0.05, n_samples: int = SHAPIRO_MAX_SAMPLES, seed: int = 0,
+                                    batch_freq: str = 'Y') -> Dict[str, Dict[str, str]]:
+    """
+    Perform normality_testing_scalable on a beach table, reading it one period at a time.
+
+    Only one batch (a year by default) and the bounded sample are held in memory. The results are the
+    same as normality_testing_scalable on the full table.
+
+    Parameters:
+    -----------
+    database_connector : str
+        The connector string for the database.
+
+    beach : int or str
+        The beach index, beach name or table name.
+
+    columns : list of str, optional
+        Columns to test (default is all).
+
+    p_level, n_samples, seed :
+        As in normality_testing_scalable.
+
+    batch_freq : str, optional
+        Period of each batch (default is 'Y').
+
+    Returns:
+    --------
+    dict
+        The results of each normality test, per column.
+    """
+
+    accumulator = None
+    for batch in iter_beach_data(database_connector, beach, columns=columns, dtype=None, batch_freq=batch_freq):
+        if accumulator is None:
+            accumulator = NormalityAccumulator(batch.columns, n_samples, seed)
+        accumulator.update(batch)
+
+    if accumulator is None:
+        return {}
+    return accumulator.results(p_level)
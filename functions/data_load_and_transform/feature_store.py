@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+
+from functions.checks_and_preprocessing.lagging_and_splitting import scale_data, split_dataframe
+from functions.data_load_and_transform.sql_connections import beach_data_version, beach_table_name, load_beach_data
+
+
+class FeatureStore:
+    """
+    On-disk store of preprocessed beach data: the scaled train/valid/test splits, the test index and
+    the fitted scaler, keyed by (beach, frequency, split ratios, scaler, data version).
+
+    Arrays are saved as .npy files and opened memory-mapped and read-only, so a stored entry loads in
+    milliseconds without copying. Entries of the same beach and settings built from an older data
+    version are removed when a newer one is stored.
+    """
+
+    MANIFEST_FILENAME = 'manifest.json'
+    ARRAY_NAMES = ('train', 'valid', 'test')
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        self.manifest_path = os.path.join(store_dir, self.MANIFEST_FILENAME)
+        self._lock = threading.Lock()
+
+        os.makedirs(store_dir, exist_ok=True)
+        self.entries = self._read_manifest()
+
+    @staticmethod
+    def make_settings(beach: str, freq: Optional[str], train_ratio: float, valid_ratio: float,
+                      scaler_type: str) -> dict:
+        """
+        Builds the settings of an entry, i.e. everything but the data version.
+        """
+        return {
+            'beach': beach,
+            'freq': freq,
+            'train_ratio': round(float(train_ratio), 6),
+            'valid_ratio': round(float(valid_ratio), 6),
+            'scaler_type': scaler_type,
+        }
+
+    @staticmethod
+    def make_key(settings: dict, data_version: str) -> str:
+        """
+        Builds the content address of an entry.
+
+        Parameters:
+        settings (dict): The output of make_settings.
+        data_version (str): Fingerprint of the source data, i.e. beach_data_version().
+
+        Returns:
+        str: A SHA-256 hex digest identifying the entry.
+        """
+        key_fields = {**settings, 'data_version': data_version}
+        return hashlib.sha256(json.dumps(key_fields, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _read_manifest(self) -> Dict[str, dict]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+
+        with open(self.manifest_path, 'r') as file:
+            entries = json.load(file)['entries']
+
+        # Drop entries whose directory was removed outside of the store
+        return {key: entry for key, entry in entries.items()
+                if os.path.isdir(os.path.join(self.store_dir, key))}
+
+    def _write_manifest(self) -> None:
+        # Written to a temporary file first, so a crash never leaves a half-written manifest
+        temporary_path = self.manifest_path + '.tmp'
+        with open(temporary_path, 'w') as file:
+            json.dump({'version': 1, 'entries': self.entries}, file, indent=1)
+        os.replace(temporary_path, self.manifest_path)
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Opens a stored entry, or returns None on a miss.
+
+        Returns:
+        dict: 'train', 'valid' and 'test' as read-only memory-mapped arrays, 'test_index' (pd.DatetimeIndex),
+        'columns' (list of str) and the fitted 'scaler'.
+        """
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            entry['last_access'] = time.time()
+            self._write_manifest()
+
+        entry_dir = os.path.join(self.store_dir, key)
+        features = {name: np.load(os.path.join(entry_dir, f'{name}.npy'), mmap_mode='r') for name in self.ARRAY_NAMES}
+        features['test_index'] = pd.DatetimeIndex(np.load(os.path.join(entry_dir, 'test_index.npy')), name='datetime')
+        features['columns'] = entry['columns']
+        with open(os.path.join(entry_dir, 'scaler.pkl'), 'rb') as file:
+            features['scaler'] = pickle.load(file)
+
+        return features
+
+    def put(self, settings: dict, data_version: str, train: np.ndarray, valid: np.ndarray, test: np.ndarray,
+            test_index: pd.DatetimeIndex, columns: list, scaler) -> str:
+        """
+        Stores an entry and removes the entries of the same settings built from other data versions.
+
+        Returns:
+        str: The key of the entry.
+        """
+        key = self.make_key(settings, data_version)
+        entry_dir = os.path.join(self.store_dir, key)
+        # Written next to the final directory and renamed, so readers never see a partial entry
+        temporary_dir = f'{entry_dir}.tmp'
+        shutil.rmtree(temporary_dir, ignore_errors=True)
+        os.makedirs(temporary_dir)
+
+        for name, array in zip(self.ARRAY_NAMES, (train, valid, test)):
+            np.save(os.path.join(temporary_dir, f'{name}.npy'), np.ascontiguousarray(array))
+        np.save(os.path.join(temporary_dir, 'test_index.npy'), np.asarray(test_index, dtype='datetime64[ns]'))
+        with open(os.path.join(temporary_dir, 'scaler.pkl'), 'wb') as file:
+            pickle.dump(scaler, file)
+
+        with self._lock:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(temporary_dir, entry_dir)
+
+            now = time.time()
+            self.entries[key] = {
+                **settings,
+                'data_version': data_version,
+                'columns': list(columns),
+                'created': now,
+                'last_access': now,
+            }
+            self._invalidate_stale(settings, keep_key=key)
+            self._write_manifest()
+
+        return key
+
+    def invalidate(self, beach: Optional[str] = None) -> None:
+        """
+        Removes all entries, or all entries of one beach.
+        """
+        with self._lock:
+            for key in [key for key, entry in self.entries.items() if beach is None or entry['beach'] == beach]:
+                self._remove(key)
+            self._write_manifest()
+
+    def _invalidate_stale(self, settings: dict, keep_key: str) -> None:
+        for key in [key for key, entry in self.entries.items()
+                    if key != keep_key and all(entry[field] == value for field, value in settings.items())]:
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        self.entries.pop(key, None)
+        shutil.rmtree(os.path.join(self.store_dir, key), ignore_errors=True)
+
+
+def load_or_build_features(store: FeatureStore, database_connector: str, beach, freq: Optional[str] = None,
+                           train_ratio: float = 0.7, valid_ratio: float = 0.15,
+                           scaler_type: str = 'minmax') -> dict:
+    """
+    Returns the scaled splits of a beach from the feature store, building and storing them on a miss.
+
+    A miss runs the usual notebook steps: load (resampled with freq, as a mean), split_dataframe and
+    scale_data. The data version is beach_data_version(), so the entry is rebuilt after hours are loaded or rewritten.
+    Windows can then be built on the returned arrays with sliding_window without copying them.
+
+    Parameters:
+    store (FeatureStore): The feature store.
+    database_connector (str): The connector string for the database.
+    beach (Union[int, str]): The beach index, beach name or table name.
+    freq (str, optional): Resample frequency, i.e. 'D'. Defaults to None (hourly).
+    train_ratio (float): The ratio of the training set. Defaults to 0.7.
+    valid_ratio (float): The ratio of the validation set. Defaults to 0.15.
+    scaler_type (str): 'minmax' or 'standard'. Defaults to 'minmax'.
+
+    Returns:
+    dict: The entry, as returned by FeatureStore.get.
+    """
+    table_name = beach_table_name(beach)
+    settings = FeatureStore.make_settings(table_name, freq, train_ratio, valid_ratio, scaler_type)
+    data_version = beach_data_version(database_connector, table_name)
+
+    key = FeatureStore.make_key(settings, data_version)
+    features = store.get(key)
+    if features is not None:
+        return features
+
+    single_beach_data = load_beach_data(database_connector, table_name, freq=freq, use_cache=False)
+    train, valid, test, test_index = split_dataframe(single_beach_data, train_ratio, valid_ratio)
+    scaled = scale_data(train, valid, test, scaler_type)
+    if isinstance(scaled, str):
+        raise ValueError(scaled)
+    train_scaled, valid_scaled, test_scaled, scaler = scaled
+
+    store.put(settings, data_version, train_scaled, valid_scaled, test_scaled, test_index,
+              list(single_beach_data.columns), scaler)
+    return store.get(key)
@@ -1,10 +1,24 @@
 import json 
 import pandas as pd
 import os
+import time
 
 from sqlalchemy import create_engine, MetaData
 from contextlib import contextmanager
 from pathlib import Path
+from urllib.parse import unquote
+from functions.data_load_and_transform.parquet_io import read_beach_parquet
+from functions.data_load_and_transform.sql_connections import BEACH_DATA_CACHE
+from functions.data_load_and_transform.json_stream import iter_json_split_chunks
+from functions.sql.bulk_load import copy_dataframe_to_table, ensure_unique_datetime, upsert_dataframe_to_table
+from functions.sql.incremental_load import (LOADED_FILES_TABLE, file_signature, WATERMARK_TABLE, ensure_load_state_tables,
+                                            is_file_loaded, read_watermarks, record_loaded_file, seed_watermark,
+                                            update_watermark)
+from functions.sql.rollups import ROLLUP_UNITS, is_rollup_table, refresh_rollups, rollup_table_name
+from functions.sql.duckdb_backend import (DUCKDB_LOADED_FILES_TABLE, duckdb_table_names, ensure_duckdb_loaded_files,
+                                          get_duckdb_connection, is_duckdb_url, quote_duckdb, write_duckdb_frame)
+from functions.sql.fact_table import (BEACH_TABLE, FACT_TABLE, create_fact_schema, ensure_beach_id,
+                                      ensure_year_partitions, fact_watermark_key, seed_fact_watermarks)
 
 
 def convert_to_multiindex(json_data):
@@ -54,7 +68,190 @@ def process_json_file(file_path):
     
     return multi_index_df, grouped_df
 
-def process_json_to_sql(db_url, beach_data_json_dir):
+def process_parquet_file(dataset_dir):
+    """
+    Read a Parquet dataset written by write_beach_parquet into a MultiIndex DataFrame and group it.
+
+    Parameters:
+    -----------
+    dataset_dir : str
+        Root directory of the Parquet dataset.
+
+    Returns:
+    --------
+    pandas.DataFrame, pandas.core.groupby.generic.DataFrameGroupBy
+        - MultiIndex DataFrame, same as process_json_file.
+        - Grouped DataFrame by the first MultiIndex level.
+    """
+
+    multi_index_df = read_beach_parquet(dataset_dir)
+    grouped_df = multi_index_df.groupby(level=0, sort=False)
+
+    return multi_index_df, grouped_df
+
+def iter_beach_frames(file_path, chunk_rows=100_000):
+    """
+    Stream a JSON file or Parquet dataset as per-beach DataFrames, with duplicate datetimes dropped.
+
+    JSON files are decoded chunk_rows rows at a time and Parquet datasets are read one beach partition
+    at a time, so memory stays bounded whatever the file size. Rows of a beach are expected in time order,
+    as written by black_sea_waves_reanalysis_to_json.py.
+
+    Parameters:
+    -----------
+    file_path : pathlib.Path
+        Path to a beach_df_*.json file or beach_df_*.parquet dataset.
+
+    chunk_rows : int
+        Number of JSON rows decoded per chunk (default is 100000).
+
+    Yields:
+    -------
+    str, pandas.DataFrame
+        Beach name and a DataFrame of its rows, indexed by 'datetime'.
+    """
+
+    if file_path.suffix == '.parquet':
+        beach_names = [path.name.split('=', 1)[1] for path in file_path.iterdir() if path.name.startswith('beach_name=')]
+        beach_frames = ((beach_name, read_beach_parquet(file_path, beach_names=[beach_name]).droplevel(0))
+                        for beach_name in map(unquote, beach_names))
+    else:
+        beach_frames = iter_json_split_chunks(file_path, chunk_rows)
+
+    last_datetime = {}
+    for beach_name, beach_df in beach_frames:
+        mask_index = beach_df.index.duplicated()
+        if beach_name in last_datetime:
+            mask_index |= beach_df.index <= last_datetime[beach_name]
+        if mask_index.any():
+            beach_df = beach_df[~mask_index]
+
+        if not beach_df.empty:
+            last_datetime[beach_name] = beach_df.index[-1]
+            yield beach_name, beach_df
+
+def process_files_to_duckdb(db_url, beach_data_path, incremental=False):
+    """
+    Load beach files into an embedded DuckDB database, one table per beach, as process_json_to_sql does.
+
+    Every file is loaded in one transaction. With incremental, files already loaded are skipped and only
+    rows after each table's max(datetime) are appended.
+
+    Parameters:
+    -----------
+    db_url : str
+        duckdb:/// connector string.
+
+    beach_data_path : list of pathlib.Path
+        Files to load, in order.
+
+    incremental : bool
+        Idempotent top-up load (default is False).
+    """
+
+    connection = get_duckdb_connection(db_url)
+    if incremental:
+        ensure_duckdb_loaded_files(connection)
+    existing_tables = set(duckdb_table_names(connection)) - {DUCKDB_LOADED_FILES_TABLE}
+    watermarks = {}
+    total_rows, total_seconds = 0, 0.0
+
+    for filename in beach_data_path:
+        file_rows = 0
+        start_time = time.perf_counter()
+        size, mtime = file_signature(filename)
+
+        if incremental and connection.execute(
+                f'SELECT 1 FROM {DUCKDB_LOADED_FILES_TABLE} WHERE file_name = $name AND file_size = $size '
+                'AND file_mtime = $mtime', {'name': filename.name, 'size': size, 'mtime': mtime}).fetchone():
+            print(f'{filename.name}: already loaded, skipped')
+            continue
+
+        connection.begin()
+        try:
+            for beach_name_sql, separate_beach_df in iter_beach_frames(filename):
+                table_name = beach_name_sql.replace(' ', '_').lower()
+
+                if incremental and table_name in existing_tables:
+                    if table_name not in watermarks:
+                        watermarks[table_name] = connection.execute(
+                            f'SELECT max(datetime) FROM {quote_duckdb(table_name)}').fetchone()[0]
+                    if watermarks[table_name] is not None:
+                        separate_beach_df = separate_beach_df[separate_beach_df.index > watermarks[table_name]]
+                if separate_beach_df.empty:
+                    continue
+
+                write_duckdb_frame(connection, table_name, separate_beach_df.reset_index())
+                existing_tables.add(table_name)
+                watermarks[table_name] = separate_beach_df.index.max()
+                file_rows += len(separate_beach_df)
+
+            if incremental:
+                connection.execute(
+                    f'INSERT OR REPLACE INTO {DUCKDB_LOADED_FILES_TABLE} (file_name, file_size, file_mtime, row_count) '
+                    'VALUES ($name, $size, $mtime, $row_count)',
+                    {'name': filename.name, 'size': size, 'mtime': mtime, 'row_count': file_rows})
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            watermarks.clear()
+            raise
+        if file_rows:
+            # Frames cached by load_beach_data before this file are stale now
+            BEACH_DATA_CACHE.clear()
+
+        file_seconds = time.perf_counter() - start_time
+        total_rows += file_rows
+        total_seconds += file_seconds
+        print(f'{filename.name}: {file_rows} rows in {file_seconds:.1f} s ({file_rows / max(file_seconds, 1e-9):,.0f} rows/sec)')
+
+    print(f'Total: {total_rows} rows in {total_seconds:.1f} s ({total_rows / max(total_seconds, 1e-9):,.0f} rows/sec)')
+
+
+def process_json_to_sql(db_url, beach_data_json_dir, use_copy=True, incremental=False, on_conflict='nothing',
+                        schema='per_beach', rollups=False):
+    """
+    Load every beach_df_*.json file / beach_df_*.parquet dataset of a directory into the database.
+
+    The schema is reflected once per run and every file is loaded in one transaction.
+    With use_copy, rows are bulk loaded with PostgreSQL COPY instead of DataFrame.to_sql inserts.
+    Throughput is printed in rows/sec per file and for the whole run.
+
+    Parameters:
+    -----------
+    db_url : str
+        Database connector string. A duckdb:/// string (i.e. 'duckdb:///data/waves.duckdb') loads into an
+        embedded DuckDB file instead of PostgreSQL, with the same per-beach tables (per_beach schema only,
+        use_copy and on_conflict do not apply).
+
+    beach_data_json_dir : str
+        Directory holding the files.
+
+    use_copy : bool
+        Use COPY FROM STDIN (PostgreSQL only) instead of DataFrame.to_sql (default is True).
+
+    incremental : bool
+        Idempotent top-up load (PostgreSQL only, default is False). Files already loaded (same name, size
+        and modification time) are skipped, rows at or before the per-beach max(datetime) watermark are
+        skipped, and the rest is written with ON CONFLICT on the unique (datetime) index, so reloading a
+        directory never duplicates rows. Backfills of history older than the watermark need incremental=False.
+
+    on_conflict : str
+        With incremental, 'nothing' keeps stored hours and 'update' overwrites them (default is 'nothing').
+        With 'update', the watermark filter is not applied, so every row of a new or modified file is
+        upserted and stored hours get the file's values.
+
+    schema : str
+        'per_beach' writes one table per beach (beach_name.replace(' ', '_').lower()), 'fact' writes all
+        beaches to the wave_obs table, range-partitioned by year, with a beach dimension table
+        (PostgreSQL only; hours already in wave_obs fail a non-incremental load). Default is 'per_beach'.
+
+    rollups : bool
+        Maintain daily/weekly/monthly/yearly mean rollup tables per beach table (<table>_rollup_d, ...),
+        recomputing only the bins touched by each file, in the file's transaction (PostgreSQL and
+        per_beach schema only, default is False). Missing rollups are backfilled from the whole table.
+        Rollups that already exist are refreshed by every per_beach load, whatever this flag says.
+    """
     @contextmanager
     def database_context(db_url):
         engine = create_engine(db_url)
@@ -63,34 +260,132 @@ def process_json_to_sql(db_url, beach_data_json_dir):
         finally:
             engine.dispose()
 
+    if schema not in ('per_beach', 'fact'):
+        raise ValueError("schema must be 'per_beach' or 'fact'")
+    if rollups and schema != 'per_beach':
+        raise ValueError("rollups are maintained for the per_beach schema only")
+
     beach_data_json_filenames = os.listdir(beach_data_json_dir)
-    beach_dir_filenames = [filename for filename in beach_data_json_filenames if filename.startswith('beach_df_') and filename.endswith('.json')]
-    beach_dir_filenames.sort(key=lambda x: x.split('_')[1])
+    # Both orient='split' JSON files and Parquet datasets (directories) are loaded
+    beach_dir_filenames = [filename for filename in beach_data_json_filenames if filename.startswith('beach_df_') and filename.endswith(('.json', '.parquet'))]
+    # beach_df_<start year>_<start month>-... names sort chronologically, which incremental watermarks rely on
+    beach_dir_filenames.sort()
         
 
     beach_data_dir = Path(beach_data_json_dir)
     beach_data_path = [beach_data_dir / Path(filename) for filename in beach_dir_filenames]
 
+    if is_duckdb_url(db_url):
+        if schema != 'per_beach' or rollups:
+            raise ValueError("DuckDB databases support the per_beach schema only, without rollups")
+        return process_files_to_duckdb(db_url, beach_data_path, incremental)
+
     with database_context(db_url) as engine:
         metadata = MetaData()
+        metadata.reflect(bind=engine)
+        existing_tables = set(metadata.tables) - {WATERMARK_TABLE, LOADED_FILES_TABLE, FACT_TABLE, BEACH_TABLE}
+        existing_tables = {name for name in existing_tables
+                           if not name.startswith(f'{FACT_TABLE}_') and not is_rollup_table(name)}
+        fact_schema_created = FACT_TABLE in metadata.tables
+        rollup_tables = {name for name in metadata.tables if is_rollup_table(name)}
+        beach_ids, partition_years = {}, set()
+        total_rows, total_seconds = 0, 0.0
+
+        if incremental:
+            with engine.begin() as connection:
+                ensure_load_state_tables(connection)
+                watermarks = read_watermarks(connection)
+                if schema == 'fact':
+                    if fact_schema_created:
+                        seed_fact_watermarks(connection)
+                else:
+                    for table_name in existing_tables:
+                        ensure_unique_datetime(connection, table_name)
+                        if table_name not in watermarks:
+                            seed_watermark(connection, table_name)
+                watermarks = read_watermarks(connection)
 
         for i, filename in enumerate(beach_data_path):
+            file_rows = 0
+            start_time = time.perf_counter()
+            file_key = fact_watermark_key(filename.name) if schema == 'fact' else None
+            touched_hours = {}
 
-            multiindex_df, _ = process_json_file(filename)
+            with engine.begin() as connection:
+                if incremental and is_file_loaded(connection, filename, file_key):
+                    print(f'{filename.name}: already loaded, skipped')
+                    continue
 
-            mask_index = multiindex_df.index.duplicated()
-            if mask_index.any():
-                multiindex_df = multiindex_df[~mask_index]
-                print(f'Check mask_index')
+                for beach_name_sql, separate_beach_df in iter_beach_frames(filename):
+                    table_name = beach_name_sql.replace(' ', '_').lower()
+                    watermark_key = fact_watermark_key(table_name) if schema == 'fact' else table_name
 
-            multiindex_df.reset_index(inplace=True)
+                    # With 'update', stored hours are rewritten, so rows at or before the watermark are kept
+                    if incremental and on_conflict != 'update' and watermark_key in watermarks:
+                        separate_beach_df = separate_beach_df[separate_beach_df.index > watermarks[watermark_key]]
+                        if separate_beach_df.empty:
+                            continue
+                    separate_beach_df = separate_beach_df.reset_index()
 
-            for beach_name_sql, separate_beach_df in multiindex_df.groupby('beach_name', sort=False):
-                table_name = beach_name_sql.replace(' ', '_').lower()
-                metadata.reflect(bind=engine)
-                separate_beach_df.drop(columns='beach_name', inplace=True)
+                    if schema == 'fact':
+                        if not fact_schema_created:
+                            create_fact_schema(connection, separate_beach_df.columns.drop('datetime'))
+                            fact_schema_created = True
+                        if beach_name_sql not in beach_ids:
+                            beach_ids[beach_name_sql] = ensure_beach_id(connection, beach_name_sql, table_name)
+                        new_years = set(separate_beach_df['datetime'].dt.year) - partition_years
+                        if new_years:
+                            ensure_year_partitions(connection, new_years)
+                            partition_years |= new_years
+
+                        separate_beach_df.insert(0, 'beach_id', beach_ids[beach_name_sql])
+                        target_table, conflict_columns = FACT_TABLE, ('beach_id', 'datetime')
+                    else:
+                        if table_name not in existing_tables:
+                            separate_beach_df.head(0).to_sql(table_name, connection, index=False)
+                            existing_tables.add(table_name)
+                            if incremental:
+                                ensure_unique_datetime(connection, table_name)
+                        target_table, conflict_columns = table_name, ('datetime',)
+
+                    if schema == 'per_beach':
+                        first_hour, last_hour = separate_beach_df['datetime'].min(), separate_beach_df['datetime'].max()
+                        if table_name in touched_hours:
+                            first_hour = min(first_hour, touched_hours[table_name][0])
+                            last_hour = max(last_hour, touched_hours[table_name][1])
+                        touched_hours[table_name] = (first_hour, last_hour, list(separate_beach_df.columns.drop('datetime')))
+
+                    if incremental:
+                        file_rows += upsert_dataframe_to_table(connection, target_table, separate_beach_df,
+                                                               on_conflict, conflict_columns)
+                        update_watermark(connection, watermark_key, separate_beach_df['datetime'].max().to_pydatetime())
+                    elif use_copy or schema == 'fact':
+                        copy_dataframe_to_table(connection, target_table, separate_beach_df)
+                        file_rows += len(separate_beach_df)
+                    else:
+                        separate_beach_df.to_sql(target_table, connection, if_exists='append', index=False)
+                        file_rows += len(separate_beach_df)
+
+                for table_name, (first_hour, last_hour, value_columns) in touched_hours.items():
+                    # Rollups that already exist are kept current even when this load doesn't ask for them
+                    frequencies = tuple(ROLLUP_UNITS) if rollups else \
+                        tuple(freq for freq in ROLLUP_UNITS if rollup_table_name(table_name, freq) in rollup_tables)
+                    if frequencies:
+                        refresh_rollups(connection, table_name, value_columns,
+                                        first_hour.to_pydatetime(), last_hour.to_pydatetime(), frequencies)
+                        rollup_tables |= {rollup_table_name(table_name, freq) for freq in frequencies}
+
+                if incremental:
+                    # Same transaction as the rows, so a failed file is neither half-loaded nor marked as loaded
+                    record_loaded_file(connection, filename, file_rows, file_key)
+                    watermarks = read_watermarks(connection)
 
-                if table_name not in metadata.tables:
-                    separate_beach_df.head(0).to_sql(table_name, engine, index=False)
+            if file_rows:
+                # Frames cached by load_beach_data before this file are stale now
+                BEACH_DATA_CACHE.clear()
+            file_seconds = time.perf_counter() - start_time
+            total_rows += file_rows
+            total_seconds += file_seconds
+            print(f'{filename.name}: {file_rows} rows in {file_seconds:.1f} s ({file_rows / max(file_seconds, 1e-9):,.0f} rows/sec)')
 
-                separate_beach_df.to_sql(table_name, engine, if_exists='append', index=False)
\ No newline at end of file
+        print(f'Total: {total_rows} rows in {total_seconds:.1f} s ({total_rows / max(total_seconds, 1e-9):,.0f} rows/sec)')
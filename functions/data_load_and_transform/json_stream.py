@@ -0,0 +1,166 @@
+import json
+import numpy as np
+import pandas as pd
+
+from itertools import islice
+
+
+class JSONStream:
+    """
+    Incremental reader over a JSON document, decoding one value at a time from a bounded text buffer.
+
+    Used to walk the large arrays of an orient='split' file without loading the whole document.
+    """
+
+    WHITESPACE = ' \t\n\r'
+
+    def __init__(self, file, buffer_size=1 << 20):
+        self.file = file
+        self.buffer_size = buffer_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.file.read(self.buffer_size)
+        if not chunk:
+            self.eof = True
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+
+    def peek(self):
+        """
+        Return the next non-whitespace character without consuming it ('' at the end of the file).
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in self.WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos:self.pos + 1]
+            self._fill()
+
+    def expect(self, character):
+        if self.peek() != character:
+            raise ValueError(f"Expected '{character}' in JSON stream, found '{self.peek()}'")
+        self.pos += 1
+
+    def value(self):
+        """
+        Decode and return the next JSON value.
+        """
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+
+            # A number at the end of the buffer may continue in the next read
+            if end == len(self.buffer) and not self.eof:
+                self._fill()
+                continue
+
+            self.pos = end
+            return obj
+
+    def iter_array(self):
+        """
+        Yield the elements of the array that starts at the current position, one at a time.
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+
+        while True:
+            yield self.value()
+            if self.peek() == ',':
+                self.pos += 1
+            else:
+                self.expect(']')
+                return
+
+    def seek_key(self, key):
+        """
+        Move to the value of a top-level key, skipping the values of the keys before it.
+        """
+        if self.pos == 0 and self.peek() == '{':
+            self.pos += 1
+
+        while True:
+            if self.peek() == ',':
+                self.pos += 1
+            if self.peek() == '}':
+                raise KeyError(key)
+
+            current_key = self.value()
+            self.expect(':')
+            if current_key == key:
+                return
+
+            if self.peek() == '[':
+                for _ in self.iter_array():
+                    pass
+            else:
+                self.value()
+
+
+def iter_json_split_chunks(file_path, chunk_rows=100_000):
+    """
+    Stream an orient='split' JSON file written from a (beach_name, datetime) MultiIndex DataFrame.
+
+    The 'index' and 'data' arrays are read in lockstep through two file handles, chunk_rows rows at a time,
+    into typed NumPy buffers. Each chunk is handed off per beach, so memory stays flat whatever the file size.
+
+    Parameters:
+    -----------
+    file_path : str
+        Path to the input JSON file.
+
+    chunk_rows : int
+        Number of rows decoded per chunk (default is 100000).
+
+    Yields:
+    -------
+    str, pandas.DataFrame
+        Beach name and a DataFrame of its rows in the chunk, indexed by 'datetime'.
+    """
+
+    with open(file_path, 'r') as index_file, open(file_path, 'r') as data_file:
+        data_stream = JSONStream(data_file)
+        data_stream.seek_key('columns')
+        columns = data_stream.value()
+        data_stream.seek_key('data')
+        data_rows = data_stream.iter_array()
+
+        index_stream = JSONStream(index_file)
+        index_stream.seek_key('index')
+        index_rows = index_stream.iter_array()
+
+        beach_codes = {}
+        while True:
+            datetimes = np.empty(chunk_rows, dtype=np.int64)
+            codes = np.empty(chunk_rows, dtype=np.int32)
+            values = np.empty((chunk_rows, len(columns)), dtype=np.float64)
+
+            n_rows = 0
+            for (beach_name, datetime_ms), row in zip(islice(index_rows, chunk_rows), data_rows):
+                codes[n_rows] = beach_codes.setdefault(beach_name, len(beach_codes))
+                datetimes[n_rows] = datetime_ms
+                values[n_rows] = row
+                n_rows += 1
+
+            if n_rows == 0:
+                return
+
+            beach_names = list(beach_codes)
+            run_starts = np.flatnonzero(np.r_[True, codes[1:n_rows] != codes[:n_rows - 1]])
+            run_ends = np.r_[run_starts[1:], n_rows]
+
+            for start, end in zip(run_starts, run_ends):
+                datetime_index = pd.DatetimeIndex(pd.to_datetime(datetimes[start:end], unit='ms'), name='datetime')
+                yield beach_names[codes[start]], pd.DataFrame(values[start:end], index=datetime_index, columns=columns)
@@ -0,0 +1,82 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+def write_beach_parquet(beach_df, dataset_dir, compression='zstd'):
+    """
+    Write a MultiIndex (beach_name, datetime) DataFrame as a Parquet dataset partitioned by beach and year.
+
+    Values are stored as compressed float32 columns, one directory per beach_name=.../year=... partition.
+
+    Parameters:
+    -----------
+    beach_df : pandas.DataFrame
+        DataFrame with MultiIndex (beach_name, datetime), i.e. the output of range_defined_beach_data.
+
+    dataset_dir : str
+        Root directory of the dataset. Partitions that already exist are added to, not replaced.
+
+    compression : str
+        Parquet compression codec (default is 'zstd').
+    """
+
+    flat_df = beach_df.astype(np.float32)
+    flat_df.index.set_names(['beach_name', 'datetime'], inplace=True)
+    flat_df = flat_df.reset_index()
+    flat_df['year'] = flat_df['datetime'].dt.year.astype(np.int16)
+
+    table = pa.Table.from_pandas(flat_df, preserve_index=False)
+    pq.write_to_dataset(table, dataset_dir, partition_cols=['beach_name', 'year'],
+                        compression=compression)
+
+
+def read_beach_parquet(dataset_dir, beach_names=None, years=None, columns=None):
+    """
+    Read a Parquet dataset written by write_beach_parquet back into a MultiIndex (beach_name, datetime) DataFrame.
+
+    Beach and year filters are applied to the partitions, so only the requested files are read.
+
+    Parameters:
+    -----------
+    dataset_dir : str
+        Root directory of the dataset.
+
+    beach_names : list of str, optional
+        Beaches to read (default is all).
+
+    years : list of int, optional
+        Years to read (default is all).
+
+    columns : list of str, optional
+        Value columns to read (default is all).
+
+    Returns:
+    --------
+    pandas.DataFrame
+        DataFrame with MultiIndex (beach_name, datetime), sorted by beach and datetime.
+    """
+
+    partitioning = ds.partitioning(
+        pa.schema([('beach_name', pa.string()), ('year', pa.int16())]), flavor='hive')
+    dataset = ds.dataset(dataset_dir, format='parquet', partitioning=partitioning)
+
+    row_filter = None
+    if beach_names is not None:
+        row_filter = ds.field('beach_name').isin(beach_names)
+    if years is not None:
+        year_filter = ds.field('year').isin(years)
+        row_filter = year_filter if row_filter is None else row_filter & year_filter
+
+    if columns is not None:
+        columns = ['beach_name', 'datetime'] + list(columns)
+    else:
+        columns = [name for name in dataset.schema.names if name != 'year']
+
+    df = dataset.to_table(columns=columns, filter=row_filter).to_pandas()
+    df['beach_name'] = df['beach_name'].astype(str)
+    df.set_index(['beach_name', 'datetime'], inplace=True)
+    df.sort_index(inplace=True)
+
+    return df
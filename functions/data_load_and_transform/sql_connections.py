@@ -1,18 +1,46 @@
+import hashlib
+import os
+import threading
+import numpy as np
 import pandas as pd
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from configparser import ConfigParser
-from sqlalchemy import create_engine
-from typing import Tuple
+from functools import lru_cache
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Engine
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from functions.sql.duckdb_backend import (duckdb_table_columns, get_duckdb_connection, is_duckdb_url, quote_duckdb,
+                                          read_duckdb_sql)
+from functions.sql.fact_table import BEACH_TABLE, FACT_TABLE
+from functions.sql.rollups import (ROLLUP_LABEL_SQL, has_rollup, rollup_bin_aligned, rollup_label,
+                                   rollup_table_name)
+
+# SQL label of each pandas resample frequency, matching the labels pandas gives the bins
+RESAMPLE_LABEL_SQL = {'H': "date_trunc('hour', datetime)", **ROLLUP_LABEL_SQL}
+RESAMPLE_ALIASES = {'h': 'H', 'W-SUN': 'W', 'ME': 'M', 'YE': 'Y', 'A': 'Y', 'A-DEC': 'Y', 'Y-DEC': 'Y'}
+# Offsets of the bins, spelled out so the reindex range works with both the old ('M', 'Y') and the new
+# ('ME', 'YE') pandas frequency strings
+RESAMPLE_OFFSETS = {'H': pd.offsets.Hour(), 'D': pd.offsets.Day(), 'W': pd.offsets.Week(weekday=6),
+                    'M': pd.offsets.MonthEnd(), 'Y': pd.offsets.YearEnd()}
+AGGREGATION_SQL = {'mean': 'avg', 'sum': 'sum', 'min': 'min', 'max': 'max', 'count': 'count'}
+
+BEACH_INFO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'csv_data', 'beach_info.csv')
 
 
 def get_database_connector() -> str:
     """
     Reads the database configuration from a file and returns a database connector string.
 
+    A [duckdb_config] section with a path selects the embedded DuckDB backend instead of PostgreSQL.
+
     Returns:
-        str: A string that can be used to connect to PostgreSQL.
+        str: A string that can be used to connect to PostgreSQL, or a duckdb:/// string.
     """
     config = ConfigParser()
     config.read('config/postgres_config.ini')
+    if config.has_section('duckdb_config'):
+        return f"duckdb:///{config['duckdb_config']['path']}"
     username = config['postgres_config']['username']
     password = config['postgres_config']['password']
     host = config['postgres_config']['host']
@@ -23,39 +51,457 @@ def get_database_connector() -> str:
     return database_connector
 
 
-def get_beach_data(database_connector: str) -> Tuple[pd.DataFrame, str]:
+class BeachDataCache:
+    """
+    In-process LRU cache of loaded beach DataFrames, evicting the least recently used frames
+    once their total memory exceeds max_bytes. Safe to share between threads.
+    """
+
+    def __init__(self, max_bytes: int = 2 * 1024 ** 3):
+        self.max_bytes = max_bytes
+        self.frames: "OrderedDict[tuple, pd.DataFrame]" = OrderedDict()
+        self.sizes: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[pd.DataFrame]:
+        with self._lock:
+            if key not in self.frames:
+                return None
+            self.frames.move_to_end(key)
+            return self.frames[key]
+
+    def put(self, key: tuple, df: pd.DataFrame) -> None:
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self.frames:
+                self.frames.pop(key)
+                self.sizes.pop(key)
+            self.frames[key] = df
+            self.sizes[key] = size
+            while sum(self.sizes.values()) > self.max_bytes:
+                evicted_key, _ = self.frames.popitem(last=False)
+                self.sizes.pop(evicted_key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.frames.clear()
+            self.sizes.clear()
+
+
+BEACH_DATA_CACHE = BeachDataCache()
+
+
+@lru_cache(maxsize=None)
+def get_engine(database_connector: str) -> Engine:
+    """
+    Returns one pooled SQLAlchemy engine per connector string, shared by all loaders of the process.
+
+    Args:
+        database_connector (str): The connector string for the database.
+
+    Returns:
+        Engine: The shared engine.
+    """
+    return create_engine(database_connector, pool_size=8, max_overflow=8, pool_pre_ping=True)
+
+
+@lru_cache(maxsize=None)
+def load_beach_info(beach_info_path: str = BEACH_INFO_PATH) -> pd.DataFrame:
+    """
+    Reads beach_info.csv once per process.
+
+    Args:
+        beach_info_path (str, optional): Path of the beach information CSV. Defaults to csv_data/beach_info.csv.
+
+    Returns:
+        pd.DataFrame: The beach information, indexed by beach index.
+    """
+    return pd.read_csv(beach_info_path, index_col=0)
+
+
+def beach_table_name(beach: Union[int, str]) -> str:
+    """
+    Resolves a beach index (position in beach_info.csv), beach name or table name to its SQL table name.
+
+    Args:
+        beach (Union[int, str]): The beach index, beach name or table name.
+
+    Returns:
+        str: The name of the beach table.
+    """
+    if isinstance(beach, (int, np.integer)):
+        return load_beach_info()['beach_name'].iloc[beach].replace(' ', '_').lower()
+    return beach.replace(' ', '_').lower()
+
+
+def resample_query(table_name: str, value_columns: List[str], freq: str, agg: str, where_sql: str,
+                   quote) -> str:
+    """
+    Builds a date_trunc + GROUP BY query aggregating a beach table to a pandas resample frequency.
+
+    Args:
+        table_name (str): The name of the beach table.
+        value_columns (List[str]): Value columns to aggregate.
+        freq (str): 'H', 'D', 'W', 'M' or 'Y' (or the 'h', 'ME', 'YE' aliases).
+        agg (str): 'mean', 'sum', 'min', 'max' or 'count'.
+        where_sql (str): WHERE clause filtering the hourly rows, or ''.
+        quote: Identifier quoting function of the engine dialect.
+
+    Returns:
+        str: The SQL query, returning one row per non-empty bin labelled 'datetime'.
+    """
+    freq = RESAMPLE_ALIASES.get(freq, freq)
+    if freq not in RESAMPLE_LABEL_SQL:
+        raise ValueError(f"freq must be one of {list(RESAMPLE_LABEL_SQL)}")
+    if agg not in AGGREGATION_SQL:
+        raise ValueError(f"agg must be one of {list(AGGREGATION_SQL)}")
+
+    aggregates = ', '.join(f'{AGGREGATION_SQL[agg]}({quote(column)}) AS {quote(column)}' for column in value_columns)
+    return (f'SELECT {RESAMPLE_LABEL_SQL[freq]} AS datetime, {aggregates} '
+            f'FROM {quote(table_name)} {where_sql} GROUP BY 1 ORDER BY 1')
+
+
+def load_beach_data(database_connector: str, beach: Union[int, str], start: Optional[str] = None,
+                    end: Optional[str] = None, columns: Optional[List[str]] = None,
+                    use_cache: bool = True, freq: Optional[str] = None, agg: str = 'mean') -> pd.DataFrame:
+    """
+    Fetches the data of one beach without prompting, through the shared pooled engine.
+
+    Only the requested time window and columns are read. Results are kept in BEACH_DATA_CACHE,
+    so repeated calls with the same arguments do not hit the database.
+
+    With freq, the aggregation is pushed down to the database (date_trunc + GROUP BY), so only one row
+    per bin is transferred. The result matches df.resample(freq).agg(agg) on the hourly data, including
+    the empty bins pandas adds between the first and last bin. Daily/weekly/monthly/yearly means are read
+    from the rollup tables maintained by process_json_to_sql(rollups=True) when they exist and the
+    window covers whole bins.
+
+    Args:
+        database_connector (str): The connector string for the database.
+        beach (Union[int, str]): The beach index (position in beach_info.csv), beach name or table name.
+        start (str, optional): First datetime to fetch, i.e. '2020-01-01 00:00'. Defaults to the first hour.
+        end (str, optional): Last datetime to fetch (inclusive). Defaults to the last hour.
+        columns (List[str], optional): Value columns to fetch. Defaults to all columns.
+        use_cache (bool, optional): Whether to read from and store in the in-process cache. Defaults to True.
+        freq (str, optional): Resample frequency, 'D', 'W', 'M', 'Y' (or 'H'). Defaults to None (hourly rows).
+        agg (str, optional): Aggregation of each bin: 'mean', 'sum', 'min', 'max' or 'count'. Defaults to 'mean'.
+
+    Returns:
+        pd.DataFrame: The beach data, indexed by datetime.
+    """
+    table_name = beach_table_name(beach)
+    cache_key = (database_connector, table_name, start, end, tuple(columns) if columns is not None else None,
+                 freq, agg if freq is not None else None)
+    if use_cache:
+        cached = BEACH_DATA_CACHE.get(cache_key)
+        if cached is not None:
+            return cached.copy()
+
+    duckdb_backend = is_duckdb_url(database_connector)
+    if duckdb_backend:
+        engine, quote = None, quote_duckdb
+    else:
+        engine = get_engine(database_connector)
+        quote = engine.dialect.identifier_preparer.quote
+
+    value_columns = '*' if columns is None else ', '.join(['datetime'] + [quote(column) for column in columns])
+    conditions, params = [], {}
+    if start is not None:
+        conditions.append('datetime >= :start')
+        params['start'] = pd.Timestamp(start).to_pydatetime()
+    if end is not None:
+        conditions.append('datetime <= :end')
+        params['end'] = pd.Timestamp(end).to_pydatetime()
+    where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    resample_freq = RESAMPLE_ALIASES.get(freq, freq)
+    if freq is None:
+        query = text(f'SELECT {value_columns} FROM {quote(table_name)} {where_sql} ORDER BY datetime')
+    elif (not duckdb_backend and agg == 'mean' and has_rollup(engine, table_name, resample_freq) and rollup_bin_aligned(resample_freq, start, end)):
+        # Bins are labelled like pandas, so the window becomes a range of bin labels
+        if start is not None:
+            params['start'] = rollup_label(resample_freq, start).to_pydatetime()
+        if end is not None:
+            params['end'] = rollup_label(resample_freq, end).to_pydatetime()
+        rollup_columns = '*' if columns is None else ', '.join(['datetime'] + [quote(column) for column in columns])
+        query = text(f'SELECT {rollup_columns} FROM {quote(rollup_table_name(table_name, resample_freq))} '
+                     f'{where_sql} ORDER BY datetime')
+    else:
+        if columns is None:
+            columns = duckdb_table_columns(get_duckdb_connection(database_connector), table_name) if duckdb_backend \
+                else [column['name'] for column in inspect(engine).get_columns(table_name)]
+            columns = [column for column in columns if column != 'datetime']
+        query = text(resample_query(table_name, columns, freq, agg, where_sql, quote))
+
+    if duckdb_backend:
+        # The DuckDB date_trunc/interval dialect matches PostgreSQL, so the same queries run in-process
+        single_beach_data = read_duckdb_sql(get_duckdb_connection(database_connector), query.text, params)
+        single_beach_data = single_beach_data.set_index('datetime')
+    else:
+        with engine.connect() as connection:
+            single_beach_data = pd.read_sql(query, connection, params=params, index_col='datetime',
+                                            parse_dates=['datetime'])
+
+    single_beach_data = single_beach_data.drop(columns='n_hours', errors='ignore')
+    if freq is not None and not single_beach_data.empty:
+        # pandas keeps the empty bins between the first and last bin; they hold NaN, or 0 for sum/count
+        full_range = pd.date_range(single_beach_data.index[0], single_beach_data.index[-1],
+                                   freq=RESAMPLE_OFFSETS[resample_freq], name='datetime')
+        fill_value = 0 if agg in ('sum', 'count') else np.nan
+        single_beach_data = single_beach_data.reindex(full_range, fill_value=fill_value)
+        if agg in ('sum', 'count'):
+            single_beach_data = single_beach_data.fillna(0)
+
+    if use_cache:
+        BEACH_DATA_CACHE.put(cache_key, single_beach_data)
+        return single_beach_data.copy()
+    return single_beach_data
+
+
+def load_many_beaches(database_connector: str, beaches: Optional[List[Union[int, str]]] = None,
+                      start: Optional[str] = None, end: Optional[str] = None,
+                      columns: Optional[List[str]] = None, max_workers: int = 8) -> Dict[str, pd.DataFrame]:
+    """
+    Fetches many beaches concurrently over the shared connection pool.
+
+    Args:
+        database_connector (str): The connector string for the database.
+        beaches (List[Union[int, str]], optional): Beach indexes, names or table names. Defaults to all beaches in beach_info.csv.
+        start (str, optional): First datetime to fetch. Defaults to the first hour.
+        end (str, optional): Last datetime to fetch (inclusive). Defaults to the last hour.
+        columns (List[str], optional): Value columns to fetch. Defaults to all columns.
+        max_workers (int, optional): Number of beaches fetched at once. Defaults to 8.
+
+    Returns:
+        Dict[str, pd.DataFrame]: The beach data keyed by table name, in the order of beaches.
+    """
+    if beaches is None:
+        beaches = list(range(len(load_beach_info())))
+    table_names = [beach_table_name(beach) for beach in beaches]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        frames = pool.map(lambda table_name: load_beach_data(database_connector, table_name, start, end, columns),
+                          table_names)
+        return dict(zip(table_names, frames))
+
+
+def beach_time_range(database_connector: str, beach: Union[int, str]) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    """
+    Returns the first and last datetime stored for a beach.
+
+    Args:
+        database_connector (str): The connector string for the database.
+        beach (Union[int, str]): The beach index, beach name or table name.
+
+    Returns:
+        Tuple[pd.Timestamp, pd.Timestamp]: First and last datetime (NaT, NaT for an empty table).
+    """
+    table_name = beach_table_name(beach)
+    if is_duckdb_url(database_connector):
+        first, last = get_duckdb_connection(database_connector).execute(
+            f'SELECT min(datetime), max(datetime) FROM {quote_duckdb(table_name)}').fetchone()
+    else:
+        engine = get_engine(database_connector)
+        quote = engine.dialect.identifier_preparer.quote
+        with engine.connect() as connection:
+            first, last = connection.execute(
+                text(f'SELECT min(datetime), max(datetime) FROM {quote(table_name)}')).fetchone()
+    return pd.Timestamp(first), pd.Timestamp(last)
+
+
+def beach_data_version(database_connector: str, beach: Union[int, str]) -> str:
+    """
+    Returns a fingerprint of the rows stored for a beach, which changes whenever hours are loaded or rewritten.
+
+    The row count and the first and last datetime change when hours are added; the sums of the value columns
+    also change when stored hours are overwritten, i.e. by an on_conflict='update' reload. Values are rounded
+    to 1e-6 and summed as integers, so the fingerprint does not depend on the order the rows are added in
+    (NaN is left out). All are computed in one aggregate query, which reads the table but returns one row.
+
+    Args:
+        database_connector (str): The connector string for the database.
+        beach (Union[int, str]): The beach index, beach name or table name.
+
+    Returns:
+        str: '<row count>:<first datetime>:<last datetime>:<checksum>', the checksum being a SHA-256 prefix
+        of the rounded column sums.
+    """
+    table_name = beach_table_name(beach)
+    duckdb_backend = is_duckdb_url(database_connector)
+    if duckdb_backend:
+        quote = quote_duckdb
+        columns = duckdb_table_columns(get_duckdb_connection(database_connector), table_name)
+    else:
+        engine = get_engine(database_connector)
+        quote = engine.dialect.identifier_preparer.quote
+        columns = [column['name'] for column in inspect(engine).get_columns(table_name)]
+
+    sums = ''.join(f", sum(CAST(round(nullif({quote(column)}, 'NaN') * 1e6) AS BIGINT))"
+                   for column in columns if column != 'datetime')
+    sql = f'SELECT count(*), min(datetime), max(datetime){sums} FROM {quote(table_name)}'
+    if duckdb_backend:
+        row = get_duckdb_connection(database_connector).execute(sql).fetchone()
+    else:
+        with engine.connect() as connection:
+            row = connection.execute(text(sql)).fetchone()
+
+    row_count, first, last = row[:3]
+    checksum = hashlib.sha256(repr([int(value) if value is not None else None for value in row[3:]])
+                              .encode('utf-8')).hexdigest()[:16]
+    return f'{row_count}:{first}:{last}:{checksum}'
+
+
+def iter_beach_data(database_connector: str, beach: Union[int, str], start: Optional[str] = None,
+                    end: Optional[str] = None, columns: Optional[List[str]] = None, dtype: Optional[str] = 'float32',
+                    batch_freq: str = 'Y') -> Iterator[pd.DataFrame]:
+    """
+    Streams the data of one beach as time-ordered batches, one per period (a year by default).
+
+    Each batch is one range query, downcast to dtype as it arrives, so only one period of float64 rows
+    is held at a time and long histories can be processed in bounded memory. Batches bypass BEACH_DATA_CACHE.
+
+    Args:
+        database_connector (str): The connector string for the database.
+        beach (Union[int, str]): The beach index, beach name or table name.
+        start (str, optional): First datetime to fetch. Defaults to the first hour.
+        end (str, optional): Last datetime to fetch (inclusive). Defaults to the last hour.
+        columns (List[str], optional): Value columns to fetch. Defaults to all columns.
+        dtype (str, optional): dtype of the value columns. Defaults to 'float32'; None keeps float64.
+        batch_freq (str, optional): Period of each batch, i.e. 'Y' or 'M'. Defaults to 'Y'.
+
+    Yields:
+        pd.DataFrame: The beach data of one period, indexed by datetime. Empty periods are skipped.
+    """
+    first, last = beach_time_range(database_connector, beach)
+    if pd.isna(first):
+        return
+    first = max(first, pd.Timestamp(start)) if start is not None else first
+    last = min(last, pd.Timestamp(end)) if end is not None else last
+
+    for period in pd.period_range(first, last, freq=batch_freq):
+        batch_start = max(period.start_time, first)
+        batch_end = min(period.end_time.floor('h'), last)
+        batch = load_beach_data(database_connector, beach, str(batch_start), str(batch_end), columns,
+                                use_cache=False)
+        if batch.empty:
+            continue
+        yield batch.astype(dtype) if dtype is not None else batch
+
+
+def load_beach_data_compact(database_connector: str, beach: Union[int, str], start: Optional[str] = None,
+                            end: Optional[str] = None, columns: Optional[List[str]] = None,
+                            dtype: Optional[str] = 'float32', batch_freq: str = 'Y') -> pd.DataFrame:
+    """
+    Fetches the data of one beach through iter_beach_data and concatenates the downcast batches.
+
+    Peak memory is the compact result plus one float64 batch, instead of the whole table as float64.
+
+    Args:
+        database_connector (str): The connector string for the database.
+        beach (Union[int, str]): The beach index, beach name or table name.
+        start (str, optional): First datetime to fetch. Defaults to the first hour.
+        end (str, optional): Last datetime to fetch (inclusive). Defaults to the last hour.
+        columns (List[str], optional): Value columns to fetch. Defaults to all columns.
+        dtype (str, optional): dtype of the value columns. Defaults to 'float32'.
+        batch_freq (str, optional): Period of each batch. Defaults to 'Y'.
+
+    Returns:
+        pd.DataFrame: The beach data, indexed by datetime.
+    """
+    batches = list(iter_beach_data(database_connector, beach, start, end, columns, dtype, batch_freq))
+    if not batches:
+        return load_beach_data(database_connector, beach, start, end, columns, use_cache=False).astype(
+            dtype if dtype is not None else 'float64')
+    return pd.concat(batches)
+
+
+def get_beach_data(database_connector: str, beach: Optional[Union[int, str]] = None) -> Tuple[pd.DataFrame, str]:
     """
     Fetches data for a specific beach from the database.
 
+    Asks for the beach index when no beach is given; batch jobs should pass beach, or use load_beach_data.
+
     Args:
         database_connector (str): The connector string for the database.
+        beach (Union[int, str], optional): The beach index, beach name or table name. Defaults to None (prompt).
 
     Returns:
         Tuple[pd.DataFrame, str]: A tuple containing a DataFrame with the beach data and the name of the beach.
     """
-    beaches_lat_lon_info = pd.read_csv('csv_data/beach_info.csv', index_col=0)
-    max_attempts = 3
-    attempts = 0
-
-    while attempts < max_attempts:
-        try:
-            index = int(input("Enter the index of the beach (0 to {}): ".format(
-                len(beaches_lat_lon_info) - 1)))
-            beach_name_sql_table = beaches_lat_lon_info.iloc[index][0].replace(
-                ' ', '_').lower()
-            print("\nSelected Beach Details:")
-            print(beach_name_sql_table)
-            break
-        except (ValueError, IndexError):
-            attempts += 1
-            print("Invalid input. Please enter a valid index.")
-            if attempts == max_attempts:
-                print("Maximum number of attempts reached. Exiting function.")
-                return None, None
-
-    engine = create_engine(database_connector)
-    single_beach_data = pd.read_sql_table(
-        beach_name_sql_table, engine, index_col="datetime", parse_dates=["datetime"])
-    engine.dispose()
+    if beach is None:
+        beaches_lat_lon_info = load_beach_info()
+        max_attempts = 3
+        attempts = 0
+
+        while attempts < max_attempts:
+            try:
+                beach = int(input("Enter the index of the beach (0 to {}): ".format(
+                    len(beaches_lat_lon_info) - 1)))
+                beach_name_sql_table = beach_table_name(beach)
+                print("\nSelected Beach Details:")
+                print(beach_name_sql_table)
+                break
+            except (ValueError, IndexError):
+                attempts += 1
+                print("Invalid input. Please enter a valid index.")
+                if attempts == max_attempts:
+                    print("Maximum number of attempts reached. Exiting function.")
+                    return None, None
+
+    beach_name_sql_table = beach_table_name(beach)
+    single_beach_data = load_beach_data(database_connector, beach_name_sql_table)
 
     return single_beach_data, beach_name_sql_table
+
+
+def get_wave_obs(database_connector: str, beach_names: Optional[List[str]] = None, start: Optional[str] = None,
+                 end: Optional[str] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Fetches any subset of beaches and time window from the wave_obs fact table in one query.
+
+    Only the yearly partitions overlapping [start, end] are scanned, through the (beach_id, datetime) key.
+
+    Args:
+        database_connector (str): The connector string for the database.
+        beach_names (List[str], optional): Beaches to fetch, as in beach_info.csv. Defaults to all beaches.
+        start (str, optional): First datetime to fetch, i.e. '2020-01-01 00:00'. Defaults to the first hour.
+        end (str, optional): Last datetime to fetch (inclusive). Defaults to the last hour.
+        columns (List[str], optional): Value columns to fetch. Defaults to all columns.
+
+    Returns:
+        pd.DataFrame: A DataFrame with MultiIndex (beach_name, datetime).
+    """
+    if is_duckdb_url(database_connector):
+        raise ValueError('wave_obs is a PostgreSQL table; use load_many_beaches with DuckDB databases')
+    engine = get_engine(database_connector)
+    quote = engine.dialect.identifier_preparer.quote
+
+    if columns is None:
+        columns = [column['name'] for column in inspect(engine).get_columns(FACT_TABLE)
+                   if column['name'] not in ('beach_id', 'datetime')]
+    value_columns = ''.join(f', o.{quote(column)}' for column in columns)
+    conditions, params = [], {}
+    if beach_names is not None:
+        conditions.append('b.beach_name = ANY(:beach_names)')
+        params['beach_names'] = list(beach_names)
+    if start is not None:
+        conditions.append('o.datetime >= :start')
+        params['start'] = pd.Timestamp(start).to_pydatetime()
+    if end is not None:
+        conditions.append('o.datetime <= :end')
+        params['end'] = pd.Timestamp(end).to_pydatetime()
+    where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    query = text(f"""
+        SELECT b.beach_name, o.datetime{value_columns}
+        FROM {quote(FACT_TABLE)} o JOIN {quote(BEACH_TABLE)} b USING (beach_id)
+        {where_sql}
+        ORDER BY b.beach_name, o.datetime""")
+
+    with engine.connect() as connection:
+        wave_obs = pd.read_sql(query, connection, params=params, parse_dates=['datetime'])
+
+    return wave_obs.set_index(['beach_name', 'datetime'])
@@ -21,17 +21,15 @@ def persistence_with_lag_model(dataset, window_size, lag, column_names):
     Tuple[ndarray, Dict[str, float], float]: A tuple containing the predictions for each sequence in the dataset, a dictionary with the RMSE for each feature, and the total RMSE.
     """
 
+    # Zero-copy windows: only the lagged step and the targets are read
     x, y = sliding_window(dataset, window_size)
 
     # For each sequence, the prediction is the value at the specified lag
     predictions = x[:, -lag, :]  # type: ignore
 
     # Calculate the RMSE for each feature
-    persistance_rmse_dict = {}
-    for i in range(predictions.shape[1]):  # type: ignore
-        rmse = sqrt(mean_squared_error(
-            y[:, i], predictions[:, i]))  # type: ignore
-        persistance_rmse_dict[column_names[i]] = rmse
+    rmse = np.sqrt(mean_squared_error(y, predictions, multioutput='raw_values'))
+    persistance_rmse_dict = dict(zip(column_names, rmse))
 
     total_rmse = sqrt(mean_squared_error(y, predictions))
 
@@ -51,9 +49,9 @@ def vecm_baseline_model(trainX, valX, column_names):
     Tuple[dict, float]: A tuple containing a dictionary with the RMSE for each feature and the total RMSE.
     """
 
-    # Flatten the data back into 2D
-    trainX = trainX.reshape(trainX.shape[0], -1)
-    valX = valX.reshape(valX.shape[0], -1)
+    # Flatten the data back into 2D (windows from sliding_window are read-only views; reshape copies them here only)
+    trainX = np.reshape(trainX, (trainX.shape[0], -1))
+    valX = np.reshape(valX, (valX.shape[0], -1))
 
     model = VECM(endog=trainX)
     model_fit = model.fit()
@@ -2,8 +2,10 @@ import numpy as np
 import time
 from typing import Dict, Any
 
-from keras.callbacks import EarlyStopping, History, TensorBoard, ReduceLROnPlateau
+from keras.callbacks import Callback, EarlyStopping, History, TensorBoard, ReduceLROnPlateau
 from functions.models.lstm_model import create_multiple_LSTM
+from functions.models.pruning import should_prune
+from functions.models.windowed_dataset import make_windowed_dataset
 from keras import Model, backend as K
 from typing import Dict, Any
 
@@ -44,6 +46,70 @@ def generate_models(layers: list, units: list, window: int, features: int, dropo
     return models
 
 
+class MedianStopping(Callback):
+    """
+    Median-stopping pruning: stops training once the best val_loss so far is worse than the median of the
+    best val_loss that the other trials reached by the same epoch (see should_prune).
+    """
+
+    def __init__(self, shared_curves, trial_name: str, warmup_epochs: int = 3, min_references: int = 3):
+        """
+        Parameters:
+        shared_curves: Mapping of trial name to its val_loss per epoch, shared by all trials of a search
+            (i.e. a multiprocessing Manager dict). This trial's curve is written to it after every epoch.
+        trial_name (str): The name of this trial.
+        warmup_epochs (int, Optional): Epochs trained before pruning is considered. Defaults to 3.
+        min_references (int, Optional): Other trials that must have reached an epoch to prune at it. Defaults to 3.
+        """
+        super().__init__()
+        self.shared_curves = shared_curves
+        self.trial_name = trial_name
+        self.warmup_epochs = warmup_epochs
+        self.min_references = min_references
+        self.curve = []
+        self.pruned_epoch = None
+
+    def on_epoch_end(self, epoch, logs=None):
+        if logs is None or 'val_loss' not in logs:
+            return
+        self.curve.append(float(logs['val_loss']))
+        self.shared_curves[self.trial_name] = self.curve
+
+        if should_prune(self.curve, dict(self.shared_curves), self.trial_name, self.warmup_epochs,
+                        self.min_references):
+            self.pruned_epoch = len(self.curve)
+            self.model.stop_training = True
+
+
+def create_callbacks(patience: int = 5, use_tensorboard: bool = False) -> list:
+    """
+    Creates the early stopping, learning rate and (optionally) TensorBoard callbacks used for training.
+
+    Parameters:
+    patience (int, Optional): The number of epochs to wait for improvement before stopping. Defaults to 5.
+    use_tensorboard (bool, Optional): Whether to add a TensorBoard callback. Defaults to False.
+
+    Returns:
+    list: The Keras callbacks.
+    """
+
+    early_stopping = EarlyStopping(monitor='val_loss', min_delta=0, patience=patience,
+                                   verbose=1, mode='auto', restore_best_weights=True)
+
+    callbacks = [early_stopping]
+    reduce_lr = ReduceLROnPlateau(
+        monitor='val_loss', factor=0.1, patience=10, min_lr=0.00001)  # type: ignore
+    callbacks.append(reduce_lr)  # type: ignore
+
+    if use_tensorboard:
+        # TensorBoard callback
+        log_dir = "logs/fit/" + time.strftime("%Y%m%d-%H%M%S")
+        tensorboard_callback = TensorBoard(log_dir=log_dir, histogram_freq=1)
+        callbacks.append(tensorboard_callback)  # type: ignore
+
+    return callbacks
+
+
 def train_model(model: Model,
                 trainX: np.ndarray, trainY: np.ndarray,
                 valX: np.ndarray, valY: np.ndarray,
@@ -71,19 +137,7 @@ def train_model(model: Model,
     History: The training history.
     """
 
-    early_stopping = EarlyStopping(monitor='val_loss', min_delta=0, patience=patience,
-                                   verbose=1, mode='auto', restore_best_weights=True)
-
-    callbacks = [early_stopping]
-    reduce_lr = ReduceLROnPlateau(
-        monitor='val_loss', factor=0.1, patience=10, min_lr=0.00001)  # type: ignore
-    callbacks.append(reduce_lr)  # type: ignore
-
-    if use_tensorboard:
-        # TensorBoard callback
-        log_dir = "logs/fit/" + time.strftime("%Y%m%d-%H%M%S")
-        tensorboard_callback = TensorBoard(log_dir=log_dir, histogram_freq=1)
-        callbacks.append(tensorboard_callback)  # type: ignore
+    callbacks = create_callbacks(patience, use_tensorboard)
 
     history = model.fit(trainX, trainY, validation_data=(valX, valY),
                         shuffle=False, epochs=epochs,
@@ -93,6 +147,46 @@ def train_model(model: Model,
     return history
 
 
+def train_model_on_series(model: Model,
+                          train_series: np.ndarray, val_series: np.ndarray,
+                          window_size: int,
+                          epochs: int = 500,
+                          patience: int = 5,
+                          batch_size: int = 32,
+                          verbose: int = 1,
+                          use_tensorboard: bool = False) -> History:
+    """
+    Trains the provided model on windows built on the fly from the scaled 2D series.
+
+    Same as train_model(model, *sliding_window(train_series, window_size), *sliding_window(val_series, window_size)),
+    but batches are assembled by a prefetching tf.data pipeline, so memory stays O(series) instead of
+    O(series x window_size). The series can be memory-mapped (np.load(..., mmap_mode='r')).
+
+    Parameters:
+    model (Model): The Keras model to train.
+    train_series (np.ndarray): The scaled (time, features) training series.
+    val_series (np.ndarray): The scaled (time, features) validation series.
+    window_size (int): The size of the windows.
+    epochs (int, Optional): The number of epochs to train for. Defaults to 500.
+    patience (int, Optional): The number of epochs to wait for improvement before stopping. Defaults to 5.
+    batch_size (int, Optional): The batch size for training. Defaults to 32.
+    verbose (int, Optional): The level of verbosity. Defaults to 1.
+    use_tensorboard (bool, Optional): Whether to use TensorBoard callback. Defaults to False.
+
+    Returns:
+    History: The training history.
+    """
+
+    train_dataset = make_windowed_dataset(train_series, window_size, batch_size)
+    val_dataset = make_windowed_dataset(val_series, window_size, batch_size)
+
+    history = model.fit(train_dataset, validation_data=val_dataset,
+                        epochs=epochs, verbose=verbose,
+                        callbacks=create_callbacks(patience, use_tensorboard))  # type: ignore
+
+    return history
+
+
 def get_best_model(models: Dict[str, Dict[str, Any]], metric: str = 'root_mean_squared_error') -> Dict[str, Dict[str, Any]]:
     """
     This function calculates the metrics for all models, prints them in a table format, and finds the best model based on a specified metric.
@@ -0,0 +1,226 @@
+import itertools
+import multiprocessing
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple
+
+from functions.models.parallel_grid import as_history, create_pool, rebuild_model, save_series, train_config
+from functions.models.pruning import should_prune  # noqa: F401  # the rule MedianStopping applies in the workers
+
+SEARCH_SPACE_KEYS = ('n_layers', 'units', 'dropout', 'window_size')
+
+
+def sample_configs(search_space: Dict[str, list], n_trials: Optional[int] = None, seed: int = 0) -> List[dict]:
+    """
+    Draws the trial configurations of a search from the grid of the search space.
+
+    Parameters:
+    search_space (Dict[str, list]): The values to try for 'n_layers', 'units', 'dropout' and 'window_size'.
+    n_trials (int, Optional): Number of configurations, drawn without replacement. Defaults to None (the full grid).
+    seed (int, Optional): Seed of the draw. Defaults to 0.
+
+    Returns:
+    List[dict]: One dict per trial, with the keys of SEARCH_SPACE_KEYS.
+    """
+    missing_keys = [key for key in SEARCH_SPACE_KEYS if key not in search_space]
+    if missing_keys:
+        raise ValueError(f'search_space is missing {missing_keys}')
+
+    grid = [dict(zip(SEARCH_SPACE_KEYS, values))
+            for values in itertools.product(*(search_space[key] for key in SEARCH_SPACE_KEYS))]
+    if n_trials is None or n_trials >= len(grid):
+        return grid
+
+    chosen = np.random.default_rng(seed).choice(len(grid), size=n_trials, replace=False)
+    return [grid[i] for i in sorted(chosen)]
+
+
+def trial_name(config: dict) -> str:
+    # Ends with ', dropout {d}' as the generate_models names, which get_best_model parses
+    return f"{config['n_layers']} layers, {config['units']} units, window {config['window_size']}, " \
+           f"dropout {config['dropout']}"
+
+
+def halving_budgets(min_epochs: int, max_epochs: int, eta: int) -> List[int]:
+    """
+    Cumulative epochs of every rung of successive halving: min_epochs * eta ** rung, capped at max_epochs.
+    """
+    budgets = []
+    budget = min_epochs
+    while budget < max_epochs:
+        budgets.append(budget)
+        budget *= eta
+    return budgets + [max_epochs]
+
+
+def merge_histories(history: Dict[str, list], new_history: Dict[str, list]) -> Dict[str, list]:
+    return {key: history.get(key, []) + list(new_history.get(key, [])) for key in set(history) | set(new_history)}
+
+
+def best_val_loss(history: Dict[str, list]) -> float:
+    return float(min(history.get('val_loss') or [np.inf]))
+
+
+class SearchState:
+    """
+    Configuration, merged history and latest weights of every trial of a search.
+    """
+
+    def __init__(self, configs: List[dict], use_attention: bool, train_path: str, val_path: str,
+                 patience: int, batch_size: int):
+        self.trials = {trial_name(config): {'config': config, 'history': {}, 'weights': None, 'rung': 0,
+                                            'pruned': False} for config in configs}
+        self.common = {'use_attention': use_attention, 'train_path': train_path, 'val_path': val_path,
+                       'patience': patience, 'batch_size': batch_size}
+
+    def epochs_trained(self, name: str) -> int:
+        return len(self.trials[name]['history'].get('val_loss', []))
+
+    def task(self, name: str, epochs: int, **extra) -> Dict[str, Any]:
+        trial = self.trials[name]
+        return {'name': name, **trial['config'], **self.common, 'epochs': epochs,
+                'initial_epoch': self.epochs_trained(name), 'weights': trial['weights'], **extra}
+
+    def update(self, result: Dict[str, Any]) -> None:
+        trial = self.trials[result['name']]
+        trial['history'] = merge_histories(trial['history'], result['history'])
+        trial['weights'] = result['weights']
+
+    def results(self) -> pd.DataFrame:
+        return pd.DataFrame([{'name': name, **trial['config'], 'epochs': self.epochs_trained(name),
+                              'val_loss': best_val_loss(trial['history']), 'rung': trial['rung'],
+                              'pruned': trial['pruned']} for name, trial in self.trials.items()]) \
+            .sort_values('val_loss', ignore_index=True)
+
+    def models(self, features: int, names: List[str]) -> dict:
+        models = {}
+        for name in names:
+            trial = self.trials[name]
+            config = trial['config']
+            models[name] = {
+                'model': rebuild_model(config['n_layers'], config['units'], config['window_size'], features,
+                                       config['dropout'], self.common['use_attention'], trial['weights']),
+                'history': as_history(trial['history']),
+            }
+        return models
+
+
+def successive_halving_search(train_series: np.ndarray, val_series: np.ndarray, search_space: Dict[str, list],
+                              n_trials: Optional[int] = None, min_epochs: int = 2, max_epochs: int = 54,
+                              eta: int = 3, patience: int = 5, batch_size: int = 32, use_attention: bool = False,
+                              seed: int = 0, max_workers: Optional[int] = None,
+                              threads_per_worker: Optional[int] = None,
+                              data_dir: Optional[str] = None) -> Tuple[pd.DataFrame, dict]:
+    """
+    Searches LSTM configurations with successive halving, instead of training every configuration to the end.
+
+    All trials train min_epochs epochs; the best 1 / eta of them (by their best val_loss) resume from their
+    weights up to min_epochs * eta epochs, and so on until max_epochs, so most configurations are pruned
+    after a few epochs. The trials of a rung train concurrently in worker processes (see train_grid_parallel),
+    and each worker builds the windowed dataset of a window size once and reuses it for all its trials.
+
+    Parameters:
+    train_series (np.ndarray): The scaled (time, features) training series.
+    val_series (np.ndarray): The scaled (time, features) validation series.
+    search_space (Dict[str, list]): The values to try for 'n_layers', 'units', 'dropout' and 'window_size'.
+    n_trials (int, Optional): Number of configurations sampled from the search space. Defaults to None (all).
+    min_epochs (int, Optional): Epochs of the first rung. Defaults to 2.
+    max_epochs (int, Optional): Epochs of the last rung. Defaults to 54.
+    eta (int, Optional): Reduction factor: 1 / eta of the trials are promoted to eta times the epochs. Defaults to 3.
+    patience (int, Optional): The number of epochs to wait for improvement before stopping. Defaults to 5.
+    batch_size (int, Optional): The batch size for training. Defaults to 32.
+    use_attention (bool, Optional): Whether to add temporal attention layers. Defaults to False.
+    seed (int, Optional): Seed of the sampling of configurations. Defaults to 0.
+    max_workers (int, Optional): Number of worker processes. Defaults to cores // threads_per_worker.
+    threads_per_worker (int, Optional): Intra-op threads per worker. Defaults to cores // max_workers, or 1.
+    data_dir (str, Optional): Directory of the memory-mapped series. Defaults to a temporary directory.
+
+    Returns:
+    Tuple[pd.DataFrame, dict]: One row per trial (name, configuration, epochs trained, best val_loss, last rung
+    reached and whether it was pruned), best first, and the models of the last rung in the generate_models
+    dictionary shape, ready for get_best_model and save_models.
+    """
+    if eta < 2:
+        raise ValueError('eta must be at least 2')
+
+    configs = sample_configs(search_space, n_trials, seed)
+    budgets = halving_budgets(min_epochs, max_epochs, eta)
+
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        data_dir = data_dir or temporary_dir
+        state = SearchState(configs, use_attention,
+                            save_series(train_series, os.path.join(data_dir, 'train_series.npy')),
+                            save_series(val_series, os.path.join(data_dir, 'val_series.npy')), patience, batch_size)
+
+        survivors = list(state.trials)
+        with create_pool(max_workers, threads_per_worker, len(survivors)) as pool:
+            for rung, budget in enumerate(budgets):
+                tasks = [state.task(name, budget) for name in survivors]
+                for result in pool.map(train_config, tasks):
+                    state.update(result)
+                for name in survivors:
+                    state.trials[name]['rung'] = rung
+
+                if rung == len(budgets) - 1:
+                    break
+                ranked = sorted(survivors, key=lambda name: best_val_loss(state.trials[name]['history']))
+                survivors = ranked[:max(len(ranked) // eta, 1)]
+                for name in ranked[len(survivors):]:
+                    state.trials[name]['pruned'] = True
+
+    return state.results(), state.models(train_series.shape[1], survivors)
+
+
+def median_stopping_search(train_series: np.ndarray, val_series: np.ndarray, search_space: Dict[str, list],
+                           n_trials: Optional[int] = None, max_epochs: int = 500, warmup_epochs: int = 3,
+                           min_references: int = 3, patience: int = 5, batch_size: int = 32,
+                           use_attention: bool = False, seed: int = 0, max_workers: Optional[int] = None,
+                           threads_per_worker: Optional[int] = None,
+                           data_dir: Optional[str] = None) -> Tuple[pd.DataFrame, dict]:
+    """
+    Searches LSTM configurations with median-stopping pruning.
+
+    All trials are queued on the worker pool, so a new trial starts whenever a worker is free. After every
+    epoch, each trial writes its val_loss curve to a dict shared by all workers, and stops as soon as it falls
+    behind the median of the other trials at the same epoch (should_prune). Running trials are compared to
+    each other too, so trials are pruned even when they all run at once (i.e. n_trials <= workers).
+
+    Parameters:
+    train_series (np.ndarray): The scaled (time, features) training series.
+    val_series (np.ndarray): The scaled (time, features) validation series.
+    search_space (Dict[str, list]): The values to try for 'n_layers', 'units', 'dropout' and 'window_size'.
+    n_trials (int, Optional): Number of configurations sampled from the search space. Defaults to None (all).
+    max_epochs (int, Optional): The number of epochs to train for. Defaults to 500.
+    warmup_epochs (int, Optional): Epochs trained before a trial can be pruned. Defaults to 3.
+    min_references (int, Optional): Other trials that must have reached an epoch to prune at it. Defaults to 3.
+    patience (int, Optional): The number of epochs to wait for improvement before stopping. Defaults to 5.
+    batch_size (int, Optional): The batch size for training. Defaults to 32.
+    use_attention (bool, Optional): Whether to add temporal attention layers. Defaults to False.
+    seed (int, Optional): Seed of the sampling of configurations. Defaults to 0.
+    max_workers (int, Optional): Number of worker processes. Defaults to cores // threads_per_worker.
+    threads_per_worker (int, Optional): Intra-op threads per worker. Defaults to cores // max_workers, or 1.
+    data_dir (str, Optional): Directory of the memory-mapped series. Defaults to a temporary directory.
+
+    Returns:
+    Tuple[pd.DataFrame, dict]: As successive_halving_search, with the models of the trials that were not pruned.
+    """
+    configs = sample_configs(search_space, n_trials, seed)
+
+    with tempfile.TemporaryDirectory() as temporary_dir, multiprocessing.get_context('spawn').Manager() as manager:
+        data_dir = data_dir or temporary_dir
+        state = SearchState(configs, use_attention,
+                            save_series(train_series, os.path.join(data_dir, 'train_series.npy')),
+                            save_series(val_series, os.path.join(data_dir, 'val_series.npy')), patience, batch_size)
+
+        shared_curves = manager.dict()
+        tasks = [state.task(name, max_epochs, shared_curves=shared_curves, warmup_epochs=warmup_epochs,
+                            min_references=min_references) for name in state.trials]
+        with create_pool(max_workers, threads_per_worker, len(tasks)) as pool:
+            for result in pool.map(train_config, tasks):
+                state.update(result)
+                state.trials[result['name']]['pruned'] = result['pruned_epoch'] is not None
+
+    completed = [name for name, trial in state.trials.items() if not trial['pruned']]
+    return state.results(), state.models(train_series.shape[1], completed)
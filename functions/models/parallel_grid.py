@@ -0,0 +1,225 @@
+import os
+import tempfile
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS')
+
+
+def save_series(series: np.ndarray, path: str) -> str:
+    """
+    Saves a scaled 2D series as .npy, so worker processes can open it memory-mapped instead of receiving a copy.
+    """
+    np.save(path, np.ascontiguousarray(series))
+    return path
+
+
+def init_worker_threads(intra_op_threads: int, inter_op_threads: int = 1) -> None:
+    """
+    Limits the threads of a worker process, so concurrent trainings share the cores instead of oversubscribing them.
+
+    Parameters:
+    intra_op_threads (int): Threads used inside one op (and by OpenMP/BLAS).
+    inter_op_threads (int, Optional): Ops run concurrently. Defaults to 1.
+    """
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(intra_op_threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = str(inter_op_threads)
+
+    try:
+        import tensorflow as tf
+    except ImportError:  # The environment variables still limit OpenMP/BLAS
+        return
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+
+@lru_cache(maxsize=None)
+def cached_windowed_dataset(path: str, window_size: int, batch_size: int):
+    """
+    Memory-maps a saved series and builds its windowed dataset once per worker process, so the trials of a
+    search that share a window size reuse the same tf.data pipeline.
+    """
+    from functions.models.windowed_dataset import make_windowed_dataset
+
+    return make_windowed_dataset(np.load(path, mmap_mode='r'), window_size, batch_size)
+
+
+def train_config(task: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Builds and trains one model configuration in a worker process, on windows built from memory-mapped series.
+
+    Parameters:
+    task (Dict[str, Any]): 'name', 'n_layers', 'units', 'dropout', 'use_attention', 'window_size', 'train_path',
+        'val_path', 'epochs', 'patience', 'batch_size', and optionally 'weights' and 'initial_epoch' to resume
+        a model trained in an earlier call, and 'shared_curves' (with 'warmup_epochs' and 'min_references') to
+        prune the training with MedianStopping.
+
+    Returns:
+    Dict[str, Any]: 'name', 'history' (the History.history dict), 'weights' (the trained weights) and
+    'pruned_epoch' (the epoch MedianStopping stopped at, or None).
+    """
+    from keras import backend as K
+    from functions.models.build_test_model import MedianStopping, create_callbacks
+    from functions.models.lstm_model import create_multiple_LSTM
+
+    K.clear_session()
+    train_dataset = cached_windowed_dataset(task['train_path'], task['window_size'], task['batch_size'])
+    val_dataset = cached_windowed_dataset(task['val_path'], task['window_size'], task['batch_size'])
+
+    model = create_multiple_LSTM(n_layers=task['n_layers'], units=task['units'], window=task['window_size'],
+                                 features=train_dataset.element_spec[0].shape[-1], dropout=task['dropout'],
+                                 use_attention=task.get('use_attention', False))
+    if task.get('weights') is not None:
+        model.set_weights(task['weights'])
+
+    callbacks = create_callbacks(task['patience'])
+    median_stopping = None
+    if task.get('shared_curves') is not None:
+        median_stopping = MedianStopping(task['shared_curves'], task['name'], task.get('warmup_epochs', 3),
+                                         task.get('min_references', 3))
+        callbacks.append(median_stopping)
+
+    history = model.fit(train_dataset, validation_data=val_dataset,
+                        initial_epoch=task.get('initial_epoch', 0), epochs=task['epochs'], verbose=0,
+                        callbacks=callbacks)
+
+    return {'name': task['name'], 'history': history.history, 'weights': model.get_weights(),
+            'pruned_epoch': median_stopping.pruned_epoch if median_stopping else None}
+
+
+def run_tasks(tasks: List[Dict[str, Any]], max_workers: Optional[int] = None,
+              threads_per_worker: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Runs train_config tasks concurrently on spawned worker processes with a thread budget each.
+
+    Parameters:
+    tasks (List[Dict[str, Any]]): The train_config tasks.
+    max_workers (int, Optional): Number of worker processes. Defaults to cores // threads_per_worker.
+    threads_per_worker (int, Optional): Intra-op threads per worker. Defaults to cores // max_workers, or 1.
+
+    Returns:
+    List[Dict[str, Any]]: The train_config results, in the order of tasks.
+    """
+    with create_pool(max_workers, threads_per_worker, len(tasks)) as pool:
+        return list(pool.map(train_config, tasks))
+
+
+def resolve_workers(max_workers: Optional[int] = None, threads_per_worker: Optional[int] = None,
+                    n_tasks: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Splits the cores into worker processes and intra-op threads per worker, as create_pool does.
+    """
+    cores = os.cpu_count() or 1
+    if threads_per_worker is None:
+        threads_per_worker = max(cores // max_workers, 1) if max_workers else 1
+    if max_workers is None:
+        max_workers = max(cores // threads_per_worker, 1)
+    if n_tasks is not None:
+        max_workers = max(min(max_workers, n_tasks), 1)
+    return max_workers, threads_per_worker
+
+
+def create_pool(max_workers: Optional[int] = None, threads_per_worker: Optional[int] = None,
+                n_tasks: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Creates the spawned worker pool of run_tasks, i.e. to keep the same workers (and their cached datasets)
+    across several rounds of tasks.
+
+    Parameters:
+    max_workers (int, Optional): Number of worker processes. Defaults to cores // threads_per_worker.
+    threads_per_worker (int, Optional): Intra-op threads per worker. Defaults to cores // max_workers, or 1.
+    n_tasks (int, Optional): Number of tasks, an upper bound of the workers needed. Defaults to None.
+
+    Returns:
+    ProcessPoolExecutor: The pool, to be used as a context manager.
+    """
+    max_workers, threads_per_worker = resolve_workers(max_workers, threads_per_worker, n_tasks)
+
+    # TensorFlow is not fork-safe, so workers are spawned
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=init_worker_threads, initargs=(threads_per_worker,))
+
+
+def rebuild_model(n_layers: int, units: int, window_size: int, features: int, dropout: float,
+                  use_attention: bool, weights: List[np.ndarray]):
+    """
+    Recreates a trained model in the calling process from its configuration and weights.
+    """
+    from functions.models.lstm_model import create_multiple_LSTM
+
+    model = create_multiple_LSTM(n_layers=n_layers, units=units, window=window_size, features=features,
+                                 dropout=dropout, use_attention=use_attention)
+    model.set_weights(weights)
+    return model
+
+
+def as_history(history_dict: Dict[str, list]):
+    """
+    Wraps a History.history dict returned by a worker in a keras History, as get_best_model expects.
+    """
+    from keras.callbacks import History
+
+    history = History()
+    history.history = history_dict
+    return history
+
+
+def train_grid_parallel(train_series: np.ndarray, val_series: np.ndarray, window_size: int,
+                        layers: list, units: list, dropout: list, use_attention: bool = False,
+                        epochs: int = 500, patience: int = 5, batch_size: int = 32,
+                        max_workers: Optional[int] = None, threads_per_worker: Optional[int] = None,
+                        data_dir: Optional[str] = None) -> dict:
+    """
+    Trains every (layers, units, dropout) configuration of generate_models concurrently in worker processes.
+
+    The scaled series are saved once as .npy and memory-mapped by every worker, which builds its windows on
+    the fly (make_windowed_dataset), so the data is neither copied per worker nor expanded by window_size.
+    Each worker gets threads_per_worker intra-op threads; on Windows, call this under if __name__ == '__main__'.
+
+    Parameters:
+    train_series (np.ndarray): The scaled (time, features) training series.
+    val_series (np.ndarray): The scaled (time, features) validation series.
+    window_size (int): The size of the windows.
+    layers (list): Numbers of LSTM layers to try.
+    units (list): Numbers of LSTM units to try.
+    dropout (list): Dropout rates to try.
+    use_attention (bool, Optional): Whether to add temporal attention layers. Defaults to False.
+    epochs (int, Optional): The number of epochs to train for. Defaults to 500.
+    patience (int, Optional): The number of epochs to wait for improvement before stopping. Defaults to 5.
+    batch_size (int, Optional): The batch size for training. Defaults to 32.
+    max_workers (int, Optional): Number of worker processes. Defaults to cores // threads_per_worker.
+    threads_per_worker (int, Optional): Intra-op threads per worker. Defaults to cores // max_workers, or 1.
+    data_dir (str, Optional): Directory of the memory-mapped series. Defaults to a temporary directory.
+
+    Returns:
+    dict: The generate_models dictionary shape, {model name: {'model': trained model, 'history': History}},
+    ready for get_best_model and save_models.
+    """
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        data_dir = data_dir or temporary_dir
+        train_path = save_series(train_series, os.path.join(data_dir, 'train_series.npy'))
+        val_path = save_series(val_series, os.path.join(data_dir, 'val_series.npy'))
+
+        configs = {f'{n_layers} layers, {n_units} units, dropout {drop}': (n_layers, n_units, drop)
+                   for n_layers in layers for n_units in units for drop in dropout}
+        tasks = [{'name': name, 'n_layers': n_layers, 'units': n_units, 'dropout': drop,
+                  'use_attention': use_attention, 'window_size': window_size, 'train_path': train_path,
+                  'val_path': val_path, 'epochs': epochs, 'patience': patience, 'batch_size': batch_size}
+                 for name, (n_layers, n_units, drop) in configs.items()]
+
+        results = run_tasks(tasks, max_workers, threads_per_worker)
+
+    models = {}
+    for result in results:
+        n_layers, n_units, drop = configs[result['name']]
+        models[result['name']] = {
+            'model': rebuild_model(n_layers, n_units, window_size, train_series.shape[1], drop, use_attention,
+                                   result['weights']),
+            'history': as_history(result['history']),
+        }
+
+    return models
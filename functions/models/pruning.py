@@ -0,0 +1,30 @@
+import numpy as np
+from typing import Dict, List
+
+
+def should_prune(curve: List[float], curves: Dict[str, List[float]], trial_name: str, warmup_epochs: int = 3,
+                 min_references: int = 3) -> bool:
+    """
+    Median-stopping rule: whether a trial whose val_loss per epoch is curve should stop after its last epoch.
+
+    The trial is pruned when its best val_loss so far is worse than the median of the best val_loss that the
+    other trials (finished, pruned or still running) reached by the same epoch. Nothing is pruned during the
+    first warmup_epochs, or while fewer than min_references other trials have reached the epoch.
+
+    Parameters:
+    curve (List[float]): The val_loss per epoch of the trial.
+    curves (Dict[str, List[float]]): The val_loss per epoch of every trial of the search, by trial name.
+    trial_name (str): The name of the trial, left out of the references.
+    warmup_epochs (int, Optional): Epochs trained before pruning is considered. Defaults to 3.
+    min_references (int, Optional): Other trials that must have reached the epoch. Defaults to 3.
+
+    Returns:
+    bool: Whether to stop the trial.
+    """
+    epochs = len(curve)
+    if epochs <= warmup_epochs:
+        return False
+
+    references = [min(other_curve[:epochs]) for name, other_curve in curves.items()
+                  if name != trial_name and len(other_curve) >= epochs]
+    return len(references) >= max(min_references, 1) and min(curve) > np.median(references)
@@ -0,0 +1,99 @@
+import numpy as np
+from typing import Iterator, Optional, Tuple
+
+try:
+    import tensorflow as tf
+except ImportError:  # TensorFlow is only needed for make_windowed_dataset
+    tf = None
+
+
+def window_count(n_rows: int, window_size: int) -> int:
+    """
+    Number of windows sliding_window builds from n_rows rows (the last full window is left out).
+    """
+    return max(n_rows - window_size - 1, 0)
+
+
+def gather_windows(series: np.ndarray, starts: np.ndarray, window_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Assembles one batch of windows and targets from a 2D series, as sliding_window would for these rows.
+
+    Only the rows of the batch are read, so series can be a np.memmap.
+
+    Parameters:
+    series (np.ndarray): The scaled (time, features) series, in memory or memory-mapped.
+    starts (np.ndarray): First row of every window of the batch.
+    window_size (int): The size of the windows.
+
+    Returns:
+    Tuple[np.ndarray, np.ndarray]: The (batch, window_size, features) windows and the (batch, features) targets.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    x = series[starts[:, None] + np.arange(window_size)]
+    y = series[starts + window_size]
+    return x, y
+
+
+def windowed_batches(series: np.ndarray, window_size: int, batch_size: int = 32,
+                     shuffle: bool = False, seed: Optional[int] = None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Yields (x, y) batches of sliding windows built on the fly, for one pass over the series.
+
+    Parameters:
+    series (np.ndarray): The scaled (time, features) series, in memory or memory-mapped.
+    window_size (int): The size of the windows.
+    batch_size (int, Optional): The number of windows per batch. Defaults to 32.
+    shuffle (bool, Optional): Whether to shuffle the window order. Defaults to False.
+    seed (int, Optional): Seed of the shuffle. Defaults to None.
+
+    Yields:
+    Tuple[np.ndarray, np.ndarray]: One batch of windows and targets.
+    """
+    starts = np.arange(window_count(len(series), window_size))
+    if shuffle:
+        np.random.default_rng(seed).shuffle(starts)
+
+    for batch_start in range(0, len(starts), batch_size):
+        yield gather_windows(series, starts[batch_start:batch_start + batch_size], window_size)
+
+
+def make_windowed_dataset(series: np.ndarray, window_size: int, batch_size: int = 32,
+                          shuffle: bool = False, seed: Optional[int] = None) -> 'tf.data.Dataset':
+    """
+    Builds a tf.data pipeline of the same windows and targets as sliding_window(series, window_size).
+
+    The dataset holds only window start indices; each batch is gathered from series when it is needed,
+    on parallel map calls, with prefetching. Memory is the series plus a few batches, instead of
+    window_size copies of the series.
+
+    Parameters:
+    series (np.ndarray): The scaled (time, features) series, in memory or memory-mapped.
+    window_size (int): The size of the windows.
+    batch_size (int, Optional): The number of windows per batch. Defaults to 32.
+    shuffle (bool, Optional): Whether to reshuffle the windows every epoch. Defaults to False.
+    seed (int, Optional): Seed of the shuffle. Defaults to None.
+
+    Returns:
+    tf.data.Dataset: A dataset of (x, y) batches, x of shape (batch, window_size, features).
+    """
+    n_windows = window_count(len(series), window_size)
+    n_features = series.shape[1]
+    dtype = tf.as_dtype(series.dtype)
+
+    def gather(starts):
+        x, y = gather_windows(series, starts, window_size)
+        return x, y
+
+    def load_batch(starts):
+        x, y = tf.numpy_function(gather, [starts], (dtype, dtype))
+        x.set_shape((None, window_size, n_features))
+        y.set_shape((None, n_features))
+        return x, y
+
+    dataset = tf.data.Dataset.range(n_windows)
+    if shuffle:
+        dataset = dataset.shuffle(n_windows, seed=seed, reshuffle_each_iteration=True)
+
+    return (dataset.batch(batch_size)
+            .map(load_batch, num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+            .prefetch(tf.data.AUTOTUNE))
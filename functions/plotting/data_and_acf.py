@@ -6,8 +6,10 @@ from typing import Tuple, Optional
 from IPython.display import display, clear_output
 import ipywidgets as widgets
 
+TIMESCALE_RULES = {'Daily': 'D', 'Weekly': 'W', 'Monthly': 'M', 'Yearly': 'Y'}
 
-def plot_interactive(df: DataFrame, timescale: str, date_range: Tuple[str, str], column_name: str, plot_type: str, num_lags: Optional[int] = None) -> None:
+
+def plot_interactive(df: DataFrame, timescale: str, date_range: Tuple[str, str], column_name: str, plot_type: str, num_lags: Optional[int] = None, resampled_cache: Optional[dict] = None) -> None:
     """
     Plots the data in an interactive way based on the provided parameters.
 
@@ -18,23 +20,19 @@ def plot_interactive(df: DataFrame, timescale: str, date_range: Tuple[str, str],
         column_name (str): The name of the column in df to be plotted.
         plot_type (str): The type of plot to be generated. Options are 'Data', 'ACF/PACF', 'Lag Plot'.
         num_lags (int, Optional): The number of lags to be used if plot_type is 'Lag Plot'. Defaults to None.
+        resampled_cache (dict, Optional): Resampled data per timescale, reused across calls on the same df. Defaults to None.
     """
 
-    single_beach_data_daily = df.resample('D').mean()
-    single_beach_data_weekly = df.resample('W').mean()
-    single_beach_data_monthly = df.resample('M').mean()
-    single_beach_data_yearly = df.resample('Y').mean()
-
-    if timescale == 'Hourly':
+    if resampled_cache is not None and timescale in resampled_cache:
+        data = resampled_cache[timescale]
+    elif timescale == 'Hourly':
         data = df
-    elif timescale == 'Daily':
-        data = single_beach_data_daily
-    elif timescale == 'Weekly':
-        data = single_beach_data_weekly
-    elif timescale == 'Monthly':
-        data = single_beach_data_monthly
-    elif timescale == 'Yearly':
-        data = single_beach_data_yearly
+    else:
+        # Only the selected timescale is resampled
+        data = df.resample(TIMESCALE_RULES[timescale]).mean()
+
+    if resampled_cache is not None:
+        resampled_cache[timescale] = data
 
     data = data.loc[date_range[0]:date_range[1]]  # type: ignore
 
@@ -109,6 +107,7 @@ def create_widgets_and_plot(single_beach_data: DataFrame) -> widgets.VBox:
     )
 
     button = widgets.Button(description="Generate Plot")
+    resampled_cache = {}
 
     def on_plot_type_change(change):
         if change['new'] == 'Lag Plot':
@@ -143,7 +142,7 @@ def create_widgets_and_plot(single_beach_data: DataFrame) -> widgets.VBox:
         ]))
 
         plot_interactive(
-            single_beach_data, timescale, date_range, column_name, plot_type, num_lags)  # type: ignore
+            single_beach_data, timescale, date_range, column_name, plot_type, num_lags, resampled_cache)  # type: ignore
 
     button.on_click(update_plot)
 
@@ -0,0 +1,129 @@
+import io
+
+from sqlalchemy import text
+
+
+def copy_dataframe_to_table(connection, table_name, df):
+    """
+    Append a DataFrame to a PostgreSQL table with COPY FROM STDIN, through an in-memory CSV buffer.
+
+    Parameters:
+    -----------
+    connection : sqlalchemy.engine.Connection
+        Open connection (psycopg2 or psycopg driver); the COPY runs in its transaction.
+
+    table_name : str
+        Name of the existing table.
+
+    df : pandas.DataFrame
+        Rows to append; the columns must match the table columns by name.
+    """
+
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False, date_format='%Y-%m-%d %H:%M:%S')
+    buffer.seek(0)
+
+    quote = connection.dialect.identifier_preparer.quote
+    columns = ', '.join(quote(column) for column in df.columns)
+    copy_sql = f'COPY {quote(table_name)} ({columns}) FROM STDIN WITH (FORMAT csv)'
+
+    cursor = connection.connection.cursor()
+    try:
+        if hasattr(cursor, 'copy_expert'):  # psycopg2
+            cursor.copy_expert(copy_sql, buffer)
+        else:  # psycopg 3
+            with cursor.copy(copy_sql) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+
+def has_unique_datetime_index(connection, table_name):
+    """
+    Whether a table has a unique index (or constraint) on exactly (datetime).
+    """
+
+    return bool(connection.execute(text("""
+        SELECT 1 FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indrelid = to_regclass(:table) AND i.indisunique AND i.indnatts = 1 AND a.attname = 'datetime'"""),
+        {'table': connection.dialect.identifier_preparer.quote(table_name)}).first())
+
+
+def ensure_unique_datetime(connection, table_name):
+    """
+    Create the unique (datetime) index that upserts rely on.
+
+    Duplicate hours appended by earlier, non-incremental loads are removed first, keeping one row per hour.
+    Nothing is done when the table already has a unique (datetime) index, so incremental runs don't scan
+    the history again.
+    """
+
+    if has_unique_datetime_index(connection, table_name):
+        return
+
+    quote = connection.dialect.identifier_preparer.quote
+    index_name = quote(f'{table_name}_datetime_key')
+    table = quote(table_name)
+
+    removed = connection.execute(text(f"""
+        DELETE FROM {table} a USING {table} b
+        WHERE a.datetime = b.datetime AND a.ctid > b.ctid""")).rowcount
+    if removed:
+        print(f'Removed {removed} duplicate hours from {table_name}')
+
+    connection.execute(text(f'CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON {table} (datetime)'))
+
+
+def upsert_dataframe_to_table(connection, table_name, df, on_conflict='nothing', conflict_columns=('datetime',)):
+    """
+    Insert a DataFrame into a table with a unique index, skipping or updating existing hours.
+
+    Rows are COPYed into a temporary staging table, then inserted with ON CONFLICT.
+
+    Parameters:
+    -----------
+    connection : sqlalchemy.engine.Connection
+
+    table_name : str
+        Name of the target table.
+
+    df : pandas.DataFrame
+        Rows with a 'datetime' column and the value columns of the table.
+
+    on_conflict : str
+        'nothing' keeps the stored row of an existing hour, 'update' overwrites it (default is 'nothing').
+
+    conflict_columns : tuple of str
+        Columns of the unique index (default is ('datetime',)).
+
+    Returns:
+    --------
+    int
+        Number of rows inserted or updated.
+    """
+
+    quote = connection.dialect.identifier_preparer.quote
+    table = quote(table_name)
+    staging_name = f'{table_name}_staging'
+    staging = quote(staging_name)
+    columns = ', '.join(quote(column) for column in df.columns)
+    conflict_target = ', '.join(quote(column) for column in conflict_columns)
+
+    if on_conflict == 'nothing':
+        conflict_sql = 'DO NOTHING'
+    elif on_conflict == 'update':
+        updates = ', '.join(f'{quote(column)} = EXCLUDED.{quote(column)}' for column in df.columns if column not in conflict_columns)
+        conflict_sql = f'DO UPDATE SET {updates}'
+    else:
+        raise ValueError("on_conflict must be 'nothing' or 'update'")
+
+    connection.execute(text(f'CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS)'))
+    try:
+        copy_dataframe_to_table(connection, staging_name, df)
+        written = connection.execute(text(
+            f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} ON CONFLICT ({conflict_target}) {conflict_sql}')).rowcount
+    finally:
+        connection.execute(text(f'DROP TABLE {staging}'))
+
+    return written
@@ -1,11 +1,20 @@
+from sqlalchemy import text
+from functions.sql.duckdb_backend import drop_all_duckdb_tables, is_duckdb_url
+
+
 def drop_all_tables(engine):
     """
-    Drop all tables in the 'public' schema of a PostgreSQL database.
+    Drop all tables in the 'public' schema of a PostgreSQL database, or all tables of a DuckDB database.
 
     Parameters:
     -----------
-    engine : sqlalchemy.engine.base.Engine
+    engine : sqlalchemy.engine.base.Engine or str
+        PostgreSQL engine, or duckdb:/// connector string.
     """
+
+    if isinstance(engine, str) and is_duckdb_url(engine):
+        drop_all_duckdb_tables(engine)
+        return
     
     sql = """
     DO $$ 
@@ -0,0 +1,130 @@
+import re
+import threading
+import pandas as pd
+
+from functools import lru_cache
+
+try:
+    import duckdb
+except ImportError:  # DuckDB is only needed for duckdb:/// connector strings
+    duckdb = None
+
+DUCKDB_SCHEME = 'duckdb://'
+DUCKDB_LOADED_FILES_TABLE = 'loaded_files'
+_PARAMETER = re.compile(r'(?<!:):(\w+)')
+_connection_lock = threading.Lock()
+
+
+def is_duckdb_url(database_connector):
+    """
+    Check whether a connector string points to an embedded DuckDB file, i.e. 'duckdb:///data/waves.duckdb'.
+    """
+
+    return database_connector.startswith(DUCKDB_SCHEME)
+
+
+def duckdb_path(database_connector):
+    """
+    Database file of a duckdb:/// connector string ('duckdb:///:memory:' for an in-memory database).
+    """
+
+    return database_connector[len(DUCKDB_SCHEME) + 1:] or ':memory:'
+
+
+@lru_cache(maxsize=None)
+def _duckdb_database(database_connector):
+    if duckdb is None:
+        raise ImportError('duckdb is required for duckdb:/// connector strings (pip install duckdb)')
+    return duckdb.connect(duckdb_path(database_connector))
+
+
+def get_duckdb_connection(database_connector):
+    """
+    Return a cursor on the process-wide DuckDB database of a connector string.
+
+    DuckDB allows one writer process per file, so the database is opened once per process and every
+    caller gets its own cursor, which is safe to use from its thread.
+
+    Parameters:
+    -----------
+    database_connector : str
+        duckdb:/// connector string.
+
+    Returns:
+    --------
+    duckdb.DuckDBPyConnection
+    """
+
+    with _connection_lock:
+        return _duckdb_database(database_connector).cursor()
+
+
+def read_duckdb_sql(connection, query, params=None):
+    """
+    Run a query written with SQLAlchemy-style :name parameters and return the result as a DataFrame.
+    """
+
+    query = _PARAMETER.sub(r'$\1', query)
+    return connection.execute(query, params or {}).df()
+
+
+def duckdb_table_names(connection):
+    return [name for (name,) in connection.execute(
+        "SELECT table_name FROM information_schema.tables WHERE table_schema = 'main'").fetchall()]
+
+
+def duckdb_table_columns(connection, table_name):
+    return [name for (name,) in connection.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_schema = 'main' AND table_name = $table "
+        "ORDER BY ordinal_position", {'table': table_name}).fetchall()]
+
+
+def write_duckdb_frame(connection, table_name, df):
+    """
+    Append a DataFrame to a DuckDB table, creating the table from the DataFrame's columns if missing.
+
+    The rows are scanned straight from the DataFrame's arrays, without a CSV or INSERT round trip.
+
+    Parameters:
+    -----------
+    connection : duckdb.DuckDBPyConnection
+
+    table_name : str
+        Name of the target table.
+
+    df : pandas.DataFrame
+        Rows to append, with the same columns as the table.
+    """
+
+    table = quote_duckdb(table_name)
+    connection.register('beach_frame', df)
+    try:
+        connection.execute(f'CREATE TABLE IF NOT EXISTS {table} AS SELECT * FROM beach_frame LIMIT 0')
+        connection.execute(f'INSERT INTO {table} SELECT * FROM beach_frame')
+    finally:
+        connection.unregister('beach_frame')
+
+
+def quote_duckdb(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def ensure_duckdb_loaded_files(connection):
+    connection.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DUCKDB_LOADED_FILES_TABLE} (
+            file_name text PRIMARY KEY,
+            file_size bigint NOT NULL,
+            file_mtime double NOT NULL,
+            row_count bigint NOT NULL,
+            loaded_at timestamp NOT NULL DEFAULT current_timestamp
+        )""")
+
+
+def drop_all_duckdb_tables(database_connector):
+    """
+    Drop all tables of a DuckDB database.
+    """
+
+    connection = get_duckdb_connection(database_connector)
+    for table_name in duckdb_table_names(connection):
+        connection.execute(f'DROP TABLE IF EXISTS {quote_duckdb(table_name)}')
@@ -0,0 +1,81 @@
+from sqlalchemy import text
+from functions.sql.incremental_load import update_watermark
+
+FACT_TABLE = 'wave_obs'
+BEACH_TABLE = 'beach'
+
+
+def create_fact_schema(connection, value_columns):
+    """
+    Create the beach dimension table and the wave_obs fact table, if missing.
+
+    wave_obs(beach_id, datetime, <value columns>) is range-partitioned by datetime (one partition per year)
+    with a (beach_id, datetime) primary key, so any subset of beaches and time window is one indexed query.
+
+    Parameters:
+    -----------
+    connection : sqlalchemy.engine.Connection
+
+    value_columns : list of str
+        Names of the measurement columns, i.e. VHM0, VMDR, ...
+    """
+
+    quote = connection.dialect.identifier_preparer.quote
+    columns_sql = ''.join(f',\n            {quote(column)} double precision' for column in value_columns)
+
+    connection.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {BEACH_TABLE} (
+            beach_id integer GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+            beach_name text NOT NULL UNIQUE,
+            table_name text NOT NULL UNIQUE
+        )"""))
+    connection.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {FACT_TABLE} (
+            beach_id integer NOT NULL REFERENCES {BEACH_TABLE} (beach_id),
+            datetime timestamp NOT NULL{columns_sql},
+            PRIMARY KEY (beach_id, datetime)
+        ) PARTITION BY RANGE (datetime)"""))
+
+
+def ensure_year_partitions(connection, years):
+    """
+    Create the yearly partitions of wave_obs for the given years, if missing.
+    """
+
+    for year in sorted(set(int(year) for year in years)):
+        connection.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {FACT_TABLE}_{year} PARTITION OF {FACT_TABLE}
+            FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"""))
+
+
+def ensure_beach_id(connection, beach_name, table_name):
+    """
+    Return the beach_id of a beach, adding it to the beach dimension table if missing.
+    """
+
+    connection.execute(text(f"""
+        INSERT INTO {BEACH_TABLE} (beach_name, table_name) VALUES (:beach_name, :table_name)
+        ON CONFLICT (beach_name) DO NOTHING"""), {'beach_name': beach_name, 'table_name': table_name})
+    return connection.execute(text(f'SELECT beach_id FROM {BEACH_TABLE} WHERE beach_name = :beach_name'),
+                              {'beach_name': beach_name}).scalar()
+
+
+def fact_watermark_key(table_name):
+    """
+    Watermark key of a beach inside wave_obs, next to the per-beach table watermarks.
+    """
+
+    return f'{FACT_TABLE}.{table_name}'
+
+
+def seed_fact_watermarks(connection):
+    """
+    Set the watermarks of beaches loaded into wave_obs before incremental loads were used.
+    """
+
+    rows = connection.execute(text(f"""
+        SELECT b.table_name, max(o.datetime)
+        FROM {FACT_TABLE} o JOIN {BEACH_TABLE} b USING (beach_id)
+        GROUP BY b.table_name"""))
+    for table_name, max_datetime in rows:
+        update_watermark(connection, fact_watermark_key(table_name), max_datetime)
@@ -0,0 +1,108 @@
+import os
+
+from sqlalchemy import text
+
+WATERMARK_TABLE = 'load_watermarks'
+LOADED_FILES_TABLE = 'loaded_files'
+
+
+def ensure_load_state_tables(connection):
+    """
+    Create the bookkeeping tables of incremental loads, if missing.
+
+    load_watermarks holds the max(datetime) loaded per table, loaded_files the files already loaded.
+
+    Parameters:
+    -----------
+    connection : sqlalchemy.engine.Connection
+    """
+
+    connection.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+            table_name text PRIMARY KEY,
+            max_datetime timestamp NOT NULL,
+            updated_at timestamp NOT NULL DEFAULT now()
+        )"""))
+    connection.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {LOADED_FILES_TABLE} (
+            file_name text PRIMARY KEY,
+            file_size bigint NOT NULL,
+            file_mtime double precision NOT NULL,
+            row_count bigint NOT NULL,
+            loaded_at timestamp NOT NULL DEFAULT now()
+        )"""))
+
+
+def file_signature(file_path):
+    """
+    Size and modification time of a file, or of all files of a directory (Parquet dataset).
+
+    Parameters:
+    -----------
+    file_path : pathlib.Path
+
+    Returns:
+    --------
+    tuple of (int, float)
+    """
+
+    if not file_path.is_dir():
+        stat = file_path.stat()
+        return stat.st_size, stat.st_mtime
+
+    stats = [os.stat(os.path.join(root, name)) for root, _, names in os.walk(file_path) for name in names]
+    return sum(stat.st_size for stat in stats), max((stat.st_mtime for stat in stats), default=0.0)
+
+
+def is_file_loaded(connection, file_path, file_key=None):
+    """
+    Check whether a file with the same name, size and modification time was already loaded.
+
+    file_key replaces the file name as the registry key, i.e. to track loads into different schemas apart.
+    """
+
+    size, mtime = file_signature(file_path)
+    row = connection.execute(
+        text(f'SELECT file_size, file_mtime FROM {LOADED_FILES_TABLE} WHERE file_name = :name'),
+        {'name': file_key or file_path.name}).fetchone()
+    return row is not None and row[0] == size and row[1] == mtime
+
+
+def record_loaded_file(connection, file_path, row_count, file_key=None):
+    size, mtime = file_signature(file_path)
+    connection.execute(text(f"""
+        INSERT INTO {LOADED_FILES_TABLE} (file_name, file_size, file_mtime, row_count)
+        VALUES (:name, :size, :mtime, :row_count)
+        ON CONFLICT (file_name) DO UPDATE
+        SET file_size = EXCLUDED.file_size, file_mtime = EXCLUDED.file_mtime,
+            row_count = EXCLUDED.row_count, loaded_at = now()"""),
+        {'name': file_key or file_path.name, 'size': size, 'mtime': mtime, 'row_count': row_count})
+
+
+def read_watermarks(connection):
+    """
+    Return the max(datetime) loaded per table, as a dict of table_name -> pandas-comparable datetime.
+    """
+
+    rows = connection.execute(text(f'SELECT table_name, max_datetime FROM {WATERMARK_TABLE}'))
+    return {table_name: max_datetime for table_name, max_datetime in rows}
+
+
+def update_watermark(connection, table_name, max_datetime):
+    connection.execute(text(f"""
+        INSERT INTO {WATERMARK_TABLE} (table_name, max_datetime)
+        VALUES (:table_name, :max_datetime)
+        ON CONFLICT (table_name) DO UPDATE
+        SET max_datetime = GREATEST({WATERMARK_TABLE}.max_datetime, EXCLUDED.max_datetime), updated_at = now()"""),
+        {'table_name': table_name, 'max_datetime': max_datetime})
+
+
+def seed_watermark(connection, table_name):
+    """
+    Set the watermark of a table loaded before incremental loads were used, from its max(datetime).
+    """
+
+    table = connection.dialect.identifier_preparer.quote(table_name)
+    max_datetime = connection.execute(text(f'SELECT max(datetime) FROM {table}')).scalar()
+    if max_datetime is not None:
+        update_watermark(connection, table_name, max_datetime)
@@ -0,0 +1,154 @@
+import pandas as pd
+
+from sqlalchemy import inspect, text
+
+# Bin unit and SQL label of each rollup frequency. Labels match pandas resample:
+# weeks end on Sunday, months and years are labelled with their last day.
+ROLLUP_UNITS = {'D': 'day', 'W': 'week', 'M': 'month', 'Y': 'year'}
+ROLLUP_LABEL_SQL = {
+    'D': "date_trunc('day', datetime)",
+    'W': "date_trunc('week', datetime) + interval '6 days'",
+    'M': "date_trunc('month', datetime) + interval '1 month' - interval '1 day'",
+    'Y': "date_trunc('year', datetime) + interval '1 year' - interval '1 day'",
+}
+ROLLUP_PERIODS = {'D': 'D', 'W': 'W-SUN', 'M': 'M', 'Y': 'Y'}
+ROLLUP_SUFFIX = '_rollup_'
+
+
+def rollup_table_name(table_name, freq):
+    """
+    Name of the rollup table of a beach table, i.e. 'kara_dere_rollup_d'.
+    """
+
+    return f'{table_name}{ROLLUP_SUFFIX}{freq.lower()}'
+
+
+def is_rollup_table(table_name):
+    return any(table_name.endswith(f'{ROLLUP_SUFFIX}{freq.lower()}') for freq in ROLLUP_UNITS)
+
+
+def ensure_rollup_tables(connection, table_name, value_columns, frequencies=tuple(ROLLUP_UNITS)):
+    """
+    Create the rollup tables of a beach table, if missing, and fill new ones from the whole hourly table.
+
+    Each holds one row per bin: the bin label (datetime, primary key), the number of hours in the bin
+    and the mean of every value column. A rollup created on a table that already holds history is
+    backfilled, so it always covers every hour of the table.
+
+    Returns:
+    --------
+    list of str
+        The frequencies whose rollup tables were created (and backfilled).
+    """
+
+    quote = connection.dialect.identifier_preparer.quote
+    columns_sql = ''.join(f', {quote(column)} double precision' for column in value_columns)
+    existing_tables = set(inspect(connection).get_table_names())
+
+    created = [freq for freq in frequencies if rollup_table_name(table_name, freq) not in existing_tables]
+    for freq in created:
+        connection.execute(text(f"""
+            CREATE TABLE {quote(rollup_table_name(table_name, freq))} (
+                datetime timestamp PRIMARY KEY, n_hours integer NOT NULL{columns_sql}
+            )"""))
+        upsert_rollup_bins(connection, table_name, value_columns, freq)
+    return created
+
+
+def existing_rollups(connection, table_name):
+    """
+    Frequencies of the rollup tables that exist for a beach table.
+    """
+
+    existing_tables = set(inspect(connection).get_table_names())
+    return [freq for freq in ROLLUP_UNITS if rollup_table_name(table_name, freq) in existing_tables]
+
+
+def upsert_rollup_bins(connection, table_name, value_columns, freq, min_datetime=None, max_datetime=None):
+    """
+    Aggregate the hourly table into the rollup bins overlapping [min_datetime, max_datetime] (default is
+    every bin) and upsert them.
+    """
+
+    quote = connection.dialect.identifier_preparer.quote
+    aggregates = ', '.join(f'avg({quote(column)})' for column in value_columns)
+    updates = ', '.join(['n_hours = EXCLUDED.n_hours'] +
+                        [f'{quote(column)} = EXCLUDED.{quote(column)}' for column in value_columns])
+    columns = ', '.join(['datetime', 'n_hours'] + [quote(column) for column in value_columns])
+
+    unit = ROLLUP_UNITS[freq]
+    where_sql, params = '', {}
+    if min_datetime is not None:
+        where_sql = f"""WHERE datetime >= date_trunc('{unit}', CAST(:min_datetime AS timestamp))
+              AND datetime < date_trunc('{unit}', CAST(:max_datetime AS timestamp)) + interval '1 {unit}'"""
+        params = {'min_datetime': min_datetime, 'max_datetime': max_datetime}
+
+    connection.execute(text(f"""
+        INSERT INTO {quote(rollup_table_name(table_name, freq))} ({columns})
+        SELECT {ROLLUP_LABEL_SQL[freq]}, count(*), {aggregates}
+        FROM {quote(table_name)}
+        {where_sql}
+        GROUP BY 1
+        ON CONFLICT (datetime) DO UPDATE SET {updates}"""), params)
+
+
+def refresh_rollups(connection, table_name, value_columns, min_datetime, max_datetime,
+                    frequencies=tuple(ROLLUP_UNITS)):
+    """
+    Recompute the rollup bins touched by new hours in [min_datetime, max_datetime] from the hourly table.
+
+    Only the bins overlapping the new hours are aggregated and upserted, so a nightly top-up
+    recomputes one day, week, month and year per beach instead of the full history. Rollups that
+    did not exist yet are created and backfilled from the whole table instead.
+
+    Parameters:
+    -----------
+    connection : sqlalchemy.engine.Connection
+
+    table_name : str
+        Name of the hourly beach table.
+
+    value_columns : list of str
+        Value columns of the table.
+
+    min_datetime, max_datetime : datetime
+        First and last hour written by the load.
+
+    frequencies : tuple of str
+        Rollups to refresh (default is all of 'D', 'W', 'M', 'Y').
+    """
+
+    created = ensure_rollup_tables(connection, table_name, value_columns, frequencies)
+    for freq in frequencies:
+        if freq not in created:
+            upsert_rollup_bins(connection, table_name, value_columns, freq, min_datetime, max_datetime)
+
+
+def rollup_bin_aligned(freq, start=None, end=None):
+    """
+    Check whether [start, end] covers whole bins, so the rollup holds exactly the requested hours.
+    """
+
+    period = ROLLUP_PERIODS[freq]
+    if start is not None:
+        start = pd.Timestamp(start)
+        if start != start.to_period(period).start_time:
+            return False
+    if end is not None:
+        end = pd.Timestamp(end)
+        if end != end.to_period(period).end_time.floor('h'):
+            return False
+    return True
+
+
+def rollup_label(freq, timestamp):
+    """
+    Label of the bin holding timestamp, as stored in the rollup table.
+    """
+
+    period = pd.Timestamp(timestamp).to_period(ROLLUP_PERIODS[freq])
+    return period.start_time if freq == 'D' else period.end_time.normalize()
+
+
+def has_rollup(engine, table_name, freq):
+    return freq in ROLLUP_UNITS and inspect(engine).has_table(rollup_table_name(table_name, freq))
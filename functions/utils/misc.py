@@ -1,10 +1,17 @@
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
-from typing import List
+from typing import List, Optional, Tuple
+from sklearn.neighbors import BallTree
 import calendar
+import hashlib
+import os
+import pickle
+import numpy as np
 import pandas as pd
 pd.options.mode.chained_assignment = None
 
+EARTH_RADIUS_KM = 6371.0
+
 
 def remove_months(end_date_str: str, months_to_remove: int) -> str:
     """
@@ -56,6 +63,49 @@ def add_months(start_date_str: str, months_to_add: int) -> str:
     return new_start_date.strftime(date_format)
 
 
+def monthly_date_ranges(start_date: str, end_date: str, total_month_range: int) -> List[Tuple[str, str]]:
+    """
+    Splits a date range into consecutive one-month (start, end) date ranges.
+
+    Args:
+        start_date (str): The start date in the format '%Y-%m-%d %H:%M:%S', on the first day of a month.
+        end_date (str): The end date in the format '%Y-%m-%d %H:%M:%S', on the last day of a month.
+        total_month_range (int): The number of months between start_date and end_date.
+
+    Returns:
+        list: A list of (start_date, end_date) tuples, one per month, in date order.
+    """
+    if total_month_range == 0:  # Edge case where only one month is processed
+        return [(start_date, end_date)]
+
+    # The start_date & end_date are set to the same month, then shifted by 1 month per step.
+    # add_months accounts for varying month length (i.e. 30 or 31 days) and leap years.
+    month_end_date = remove_months(end_date, total_month_range)
+    date_ranges = [(start_date, month_end_date)]
+    for _ in range(total_month_range):
+        start_date = add_months(start_date, 1)
+        month_end_date = add_months(month_end_date, 1)
+        date_ranges.append((start_date, month_end_date))
+
+    return date_ranges
+
+
+def monthly_output_filename(output_filename: str, start_date: str) -> str:
+    """
+    Derives a per-month file name, so concurrent downloads do not overwrite each other.
+
+    Args:
+        output_filename (str): The base file name, i.e. 'black_sea_waves_reanalysis.nc'.
+        start_date (str): The start date of the month in the format '%Y-%m-%d %H:%M:%S'.
+
+    Returns:
+        str: The file name with a '_YYYY_MM' suffix, i.e. 'black_sea_waves_reanalysis_2021_12.nc'.
+    """
+    stem, extension = os.path.splitext(output_filename)
+    month = datetime.strptime(start_date, "%Y-%m-%d %H:%M:%S")
+    return f"{stem}_{month.year}_{month.month:02d}{extension}"
+
+
 def binary_search(arr: List[int], target: int) -> List[int]:
     """
     Perform binary search on a sorted array to find the target value.
@@ -88,26 +138,66 @@ def binary_search(arr: List[int], target: int) -> List[int]:
     return [closest_index, arr[closest_index]]
 
 
-def beach_coordinates_locator(beach_info: pd.DataFrame, beach_df: pd.DataFrame) -> pd.DataFrame:
+def ocean_cell_index(beach_df: pd.DataFrame, index_dir: Optional[str] = None) -> Tuple[BallTree, np.ndarray]:
+    """
+    Builds a haversine BallTree over the grid cells holding data (ocean cells) of beach_df.
+
+    When index_dir is given, the tree is stored there under a hash of the grid cells and loaded
+    on later calls with the same grid, instead of being rebuilt.
+
+    Args:
+        beach_df (pandas.DataFrame): MultiIndex (time, latitude, longitude) DataFrame without empty rows.
+        index_dir (str, optional): Directory where the built trees are stored. Defaults to None.
+
+    Returns:
+        tuple: The BallTree and the (latitude, longitude) array of the ocean cells, in degrees.
+    """
+    ocean_cells = beach_df.index.droplevel(0).unique()
+    cell_coordinates = np.column_stack([ocean_cells.get_level_values(0),
+                                        ocean_cells.get_level_values(1)]).astype(np.float64)
+
+    index_path = None
+    if index_dir is not None:
+        grid_hash = hashlib.sha256(cell_coordinates.tobytes()).hexdigest()[:16]
+        index_path = os.path.join(index_dir, f"ocean_cells_{grid_hash}.pkl")
+        if os.path.exists(index_path):
+            with open(index_path, "rb") as f:
+                return pickle.load(f), cell_coordinates
+
+    tree = BallTree(np.radians(cell_coordinates), metric="haversine")
+
+    if index_path is not None:
+        os.makedirs(index_dir, exist_ok=True)  # type: ignore
+        with open(index_path, "wb") as f:
+            pickle.dump(tree, f)
+
+    return tree, cell_coordinates
+
+
+def beach_coordinates_locator(beach_info: pd.DataFrame, beach_df: pd.DataFrame, index_dir: Optional[str] = None) -> pd.DataFrame:
     """
-    Assigns lat_sensor and lon_sensor values to each row in beach_info based on binary search in beach_df.
+    Assigns lat_sensor and lon_sensor values to each row in beach_info: the nearest grid cell
+    holding data (by haversine distance), found for all beaches in one BallTree query.
 
     Args:
         beach_info (pandas.DataFrame): DataFrame containing beach information.
-        beach_df (pandas.DataFrame): DataFrame for binary search.
+        beach_df (pandas.DataFrame): MultiIndex (time, latitude, longitude) DataFrame of the grid.
+        index_dir (str, optional): Directory where the BallTree of the grid is stored. Defaults to None.
 
     Returns:
-        pandas.DataFrame: Updated beach_info DataFrame with lat_sensor and lon_sensor values.
+        pandas.DataFrame: Updated beach_info DataFrame with lat_sensor and lon_sensor values
+        ([index, value] within the latitude/longitude levels of beach_df) and sensor_distance_km.
     """
-    beach_info['lat_sensor'] = None
-    beach_info['lon_sensor'] = None
+    tree, cell_coordinates = ocean_cell_index(beach_df, index_dir)
 
-    for i, lat_val in enumerate(beach_info['latitude']):
-        c = binary_search(beach_df.index.levels[1], lat_val)
-        beach_info['lat_sensor'][i] = c
+    beach_points = np.radians(beach_info[["latitude", "longitude"]].to_numpy(dtype=np.float64))
+    distances, nearest = tree.query(beach_points, k=1)
+    nearest_cells = cell_coordinates[nearest[:, 0]]
 
-    for i, lon_val in enumerate(beach_info['longitude']):
-        d = binary_search(beach_df.index.levels[2], lon_val)
+    lat_indexes = beach_df.index.levels[1].get_indexer(nearest_cells[:, 0])
+    lon_indexes = beach_df.index.levels[2].get_indexer(nearest_cells[:, 1])
 
-        beach_info['lon_sensor'][i] = d
+    beach_info["lat_sensor"] = [[i, lat] for i, lat in zip(lat_indexes, nearest_cells[:, 0])]
+    beach_info["lon_sensor"] = [[i, lon] for i, lon in zip(lon_indexes, nearest_cells[:, 1])]
+    beach_info["sensor_distance_km"] = distances[:, 0] * EARTH_RADIUS_KM
     return beach_info
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from functions.checks_and_preprocessing.lagging_and_splitting import create_lagged_features
+
+
+def shift_lagged_features(dataframe, lag):
+    # The original column-by-column implementation
+    dataframe_copy = dataframe.copy()
+    for feature in dataframe.columns:
+        for i in range(1, lag + 1):
+            dataframe_copy[f"{feature}_lag_{i}"] = dataframe[feature].shift(i)
+    return dataframe_copy.dropna()
+
+
+def test_mixed_dtypes_match_column_shifts():
+    rng = np.random.default_rng(0)
+    index = pd.date_range('2021-01-01', periods=50, freq=pd.offsets.Hour(), name='datetime')
+    dataframe = pd.DataFrame({
+        'VHM0': rng.random(50).astype(np.float32),
+        'count': rng.integers(0, 10, 50),
+        'VMDR': rng.random(50),
+        'VTPK': rng.random(50).astype(np.float32),
+    }, index=index)
+
+    result = create_lagged_features(dataframe, lag=3)
+    expected = shift_lagged_features(dataframe, lag=3)
+
+    pd.testing.assert_frame_equal(result, expected)
+    assert result['VHM0_lag_2'].dtype == np.float32
+    assert result['count'].dtype == np.int64
+    assert result['count_lag_1'].dtype == np.float64
+
+
+def test_float32_casts_every_column():
+    dataframe = pd.DataFrame({'VHM0': np.arange(10.0), 'count': np.arange(10)})
+
+    result = create_lagged_features(dataframe, lag=2, float32=True)
+
+    assert (result.dtypes == np.float32).all()
+    np.testing.assert_array_equal(result['count_lag_2'].to_numpy(), np.arange(8, dtype=np.float32))
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from functions.checks_and_preprocessing.missing_or_nan import (detect_gaps_in_database, find_missing_hours,
+                                                               find_missing_hours_sql)
+from functions.sql.duckdb_backend import get_duckdb_connection, write_duckdb_frame
+
+
+@pytest.fixture(scope='module')
+def beach_database(tmp_path_factory):
+    database_connector = f"duckdb:///{tmp_path_factory.mktemp('duckdb') / 'beaches.duckdb'}"
+    hours = pd.date_range('2021-01-01 05:00', '2021-01-09 18:00', freq=pd.offsets.Hour(), name='datetime')
+    # One interior gap of 10 hours
+    hours = hours[(hours < '2021-01-04') | (hours >= '2021-01-04 10:00')]
+    hourly = pd.DataFrame({'VHM0': np.random.default_rng(0).random(len(hours))}, index=hours)
+
+    write_duckdb_frame(get_duckdb_connection(database_connector), 'kara_dere', hourly.reset_index())
+    return database_connector, hourly
+
+
+@pytest.mark.parametrize('start, end', [
+    (None, None),
+    ('2021-01-01', '2021-01-10 23:00'),  # leading and trailing gaps
+    ('2021-01-01', None),
+    (None, '2021-01-10 23:00'),
+    ('2021-01-02', '2021-01-05'),  # range inside the data
+    ('2021-02-01', '2021-02-02'),  # range without rows
+])
+def test_matches_find_missing_hours(beach_database, start, end):
+    database_connector, hourly = beach_database
+
+    gaps = find_missing_hours_sql(database_connector, 'kara_dere', start=start, end=end)
+
+    expected = find_missing_hours(hourly.index, start, end)
+    pd.testing.assert_frame_equal(gaps, expected, check_dtype=False, check_index_type=False)
+
+
+def test_detect_gaps_in_database_reports_edges(beach_database):
+    database_connector, _ = beach_database
+
+    gaps = detect_gaps_in_database(database_connector, ['kara_dere'], start='2021-01-01', end='2021-01-10 23:00')
+
+    assert gaps[['start', 'end', 'n_hours']].astype(str).values.tolist() == [
+        ['2021-01-01 00:00:00', '2021-01-01 04:00:00', '5'],
+        ['2021-01-04 00:00:00', '2021-01-04 09:00:00', '10'],
+        ['2021-01-09 19:00:00', '2021-01-10 23:00:00', '29'],
+    ]
+
+
+def test_since_skips_edge_gaps_before_it(beach_database):
+    database_connector, hourly = beach_database
+
+    gaps = find_missing_hours_sql(database_connector, 'kara_dere', since='2021-01-03', start='2021-01-01',
+                                  end='2021-01-10 23:00')
+
+    expected = find_missing_hours(hourly.index, '2021-01-01', '2021-01-10 23:00').iloc[1:]
+    pd.testing.assert_frame_equal(gaps, expected.reset_index(drop=True), check_dtype=False)
@@ -0,0 +1,84 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import functions.models.hyperparameter_search as hyperparameter_search
+from functions.models.pruning import should_prune
+
+SEARCH_SPACE = {'n_layers': [1, 2], 'units': [8, 32], 'dropout': [0.0, 0.3], 'window_size': [24]}
+
+
+def fake_train_config(task):
+    # Stands in for train_config: a learning curve set by the configuration, pruned like MedianStopping
+    floor = 1.0 / task['units'] + task['dropout'] + 0.01 * task['n_layers']
+    curve, pruned_epoch = [], None
+    for epoch in range(task['initial_epoch'], task['epochs']):
+        time.sleep(0.005)
+        curve.append(floor + 1.0 / (epoch + 1))
+        if task.get('shared_curves') is not None:
+            task['shared_curves'][task['name']] = list(curve)
+            if should_prune(curve, dict(task['shared_curves']), task['name'], task['warmup_epochs'],
+                            task['min_references']):
+                pruned_epoch = len(curve)
+                break
+    return {'name': task['name'], 'history': {'loss': curve, 'val_loss': curve},
+            'weights': [np.zeros(1)], 'pruned_epoch': pruned_epoch}
+
+
+@pytest.fixture
+def fake_workers(monkeypatch):
+    monkeypatch.setattr(hyperparameter_search, 'train_config', fake_train_config)
+    monkeypatch.setattr(hyperparameter_search, 'create_pool',
+                        lambda max_workers=None, threads_per_worker=None, n_tasks=None: ThreadPoolExecutor(max_workers))
+    monkeypatch.setattr(hyperparameter_search, 'rebuild_model', lambda *args: args)
+    monkeypatch.setattr(hyperparameter_search, 'as_history', lambda history: history)
+
+
+def test_should_prune_needs_warmup_and_references():
+    curves = {'a': [1.0, 0.5, 0.4, 0.3], 'b': [1.0, 0.6, 0.5, 0.4], 'c': [1.0, 0.7, 0.6, 0.5]}
+    slow = [2.0, 1.9, 1.8, 1.7]
+
+    assert not should_prune(slow[:3], curves, 'slow', warmup_epochs=3, min_references=3)
+    assert should_prune(slow, curves, 'slow', warmup_epochs=3, min_references=3)
+    assert not should_prune(slow, curves, 'slow', warmup_epochs=3, min_references=4)
+    assert not should_prune(curves['a'], curves, 'a', warmup_epochs=3, min_references=2)
+
+
+def test_median_stopping_prunes_when_all_trials_run_at_once(fake_workers):
+    n_trials = 8
+    results, models = hyperparameter_search.median_stopping_search(
+        np.zeros((100, 2)), np.zeros((50, 2)), SEARCH_SPACE, max_epochs=40, warmup_epochs=3, min_references=3,
+        max_workers=n_trials)
+
+    assert len(results) == n_trials
+    assert results['pruned'].any()
+    assert (results.loc[results['pruned'], 'epochs'] < 40).all()
+    assert not results['pruned'].iloc[0]
+    assert set(models) == set(results.loc[~results['pruned'], 'name'])
+
+
+def test_successive_halving_trains_a_fraction_of_the_epochs(fake_workers):
+    results, models = hyperparameter_search.successive_halving_search(
+        np.zeros((100, 2)), np.zeros((50, 2)), SEARCH_SPACE, min_epochs=2, max_epochs=18, eta=3, max_workers=4)
+
+    assert results['epochs'].sum() < len(results) * 18
+    assert list(models) == list(results.loc[~results['pruned'], 'name'])
+    assert results['name'].iloc[0] in models
+
+
+def test_median_stopping_on_spawned_workers(monkeypatch):
+    # Real create_pool and Manager dict; the workers unpickle fake_train_config from this module
+    monkeypatch.setattr(hyperparameter_search, 'train_config', fake_train_config)
+    monkeypatch.setattr(hyperparameter_search, 'rebuild_model', lambda *args: args)
+    monkeypatch.setattr(hyperparameter_search, 'as_history', lambda history: history)
+
+    results, models = hyperparameter_search.median_stopping_search(
+        np.zeros((100, 2)), np.zeros((50, 2)), SEARCH_SPACE, max_epochs=40, warmup_epochs=3, min_references=3,
+        max_workers=2, threads_per_worker=1)
+
+    assert len(results) == 8
+    assert results['pruned'].any()
+    assert (results.loc[results['pruned'], 'epochs'] < 40).all()
+    assert set(models) == set(results.loc[~results['pruned'], 'name'])
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from functions.data_load_and_transform.sql_connections import RESAMPLE_OFFSETS, load_beach_data
+from functions.sql.duckdb_backend import get_duckdb_connection, write_duckdb_frame
+
+# Every frequency documented by load_beach_data, with the bins it must produce
+DOCUMENTED_FREQS = {'H': 'H', 'h': 'H', 'D': 'D', 'W': 'W', 'W-SUN': 'W', 'M': 'M', 'ME': 'M',
+                    'Y': 'Y', 'YE': 'Y', 'A': 'Y', 'A-DEC': 'Y', 'Y-DEC': 'Y'}
+
+
+@pytest.fixture(scope='module')
+def beach_database(tmp_path_factory):
+    database_connector = f"duckdb:///{tmp_path_factory.mktemp('duckdb') / 'beaches.duckdb'}"
+    hours = pd.date_range('2019-11-20', '2021-02-10 23:00', freq=pd.offsets.Hour(), name='datetime')
+    # Two months without data, so the reindex has empty bins to fill
+    hours = hours[(hours < '2020-05-01') | (hours >= '2020-07-01')]
+    hourly = pd.DataFrame({'VHM0': np.random.default_rng(0).random(len(hours))}, index=hours)
+
+    write_duckdb_frame(get_duckdb_connection(database_connector), 'kara_dere', hourly.reset_index())
+    return database_connector, hourly
+
+
+@pytest.mark.parametrize('freq', DOCUMENTED_FREQS)
+@pytest.mark.parametrize('agg', ['mean', 'count'])
+def test_documented_freqs_match_pandas_resample(beach_database, freq, agg):
+    database_connector, hourly = beach_database
+
+    result = load_beach_data(database_connector, 'kara_dere', use_cache=False, freq=freq, agg=agg)
+    expected = hourly.resample(RESAMPLE_OFFSETS[DOCUMENTED_FREQS[freq]]).agg(agg)
+
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_freq=False, check_index_type=False)
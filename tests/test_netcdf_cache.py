@@ -0,0 +1,33 @@
+import os
+
+from functions.API_preprocessing.netcdf_cache import NetCDFCache
+
+
+def download(tmp_path, name, size=100):
+    path = tmp_path / name
+    path.write_bytes(b'x' * size)
+    return str(path)
+
+
+def test_pinned_months_are_not_evicted_until_released(tmp_path):
+    cache = NetCDFCache(str(tmp_path / 'cache'), max_size_bytes=150)
+
+    paths = [cache.put(f'month{i}', download(tmp_path, f'{i}.nc'), pin=True) for i in range(3)]
+    assert all(os.path.exists(path) for path in paths)
+
+    for path in paths:
+        cache.release(path)
+    assert [os.path.exists(path) for path in paths] == [False, False, True]
+    assert cache.size() <= 150
+
+
+def test_get_pins_a_cached_month(tmp_path):
+    cache = NetCDFCache(str(tmp_path / 'cache'), max_size_bytes=150)
+    first_path = cache.put('month0', download(tmp_path, '0.nc'))
+
+    assert cache.get('month0', pin=True) == first_path
+    cache.put('month1', download(tmp_path, '1.nc'))
+    assert os.path.exists(first_path)
+
+    cache.release(first_path)
+    assert not os.path.exists(first_path)
@@ -0,0 +1,34 @@
+import os
+
+import numpy as np
+
+import functions.models.parallel_grid as parallel_grid
+from functions.models.parallel_grid import run_tasks, save_series
+
+
+def stub_train_config(task):
+    # Stands in for train_config in the spawned workers: reads the memory-mapped series as cached_windowed_dataset does
+    train_series = np.load(task['train_path'], mmap_mode='r')
+    val_series = np.load(task['val_path'], mmap_mode='r')
+    return {'name': task['name'], 'pid': os.getpid(), 'threads': os.environ.get('OMP_NUM_THREADS'),
+            'memmapped': isinstance(train_series, np.memmap),
+            'sums': (float(train_series[task['window_size']:].sum()), float(val_series.sum()))}
+
+
+def test_run_tasks_on_spawned_workers(monkeypatch, tmp_path):
+    # Pickled by reference, so the workers import the stub from this module
+    monkeypatch.setattr(parallel_grid, 'train_config', stub_train_config)
+    rng = np.random.default_rng(0)
+    train_series, val_series = rng.random((200, 3)), rng.random((50, 3))
+    train_path = save_series(train_series, str(tmp_path / 'train_series.npy'))
+    val_path = save_series(val_series, str(tmp_path / 'val_series.npy'))
+    tasks = [{'name': f'trial {i}', 'window_size': i, 'train_path': train_path, 'val_path': val_path}
+             for i in range(6)]
+
+    results = run_tasks(tasks, max_workers=2, threads_per_worker=1)
+
+    assert [result['name'] for result in results] == [task['name'] for task in tasks]
+    assert os.getpid() not in {result['pid'] for result in results}
+    assert all(result['threads'] == '1' and result['memmapped'] for result in results)
+    for task, result in zip(tasks, results):
+        np.testing.assert_allclose(result['sums'], (train_series[task['window_size']:].sum(), val_series.sum()))
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from functions.checks_and_preprocessing.lagging_and_splitting import scale_data, sliding_window, split_dataframe
+from functions.checks_and_preprocessing.preprocessing_pipeline import PreprocessingPipeline
+
+
+@pytest.fixture
+def hourly():
+    index = pd.date_range('2020-01-01', periods=24 * 60, freq=pd.offsets.Hour(), name='datetime')
+    values = np.random.default_rng(0).random((len(index), 3)) * [3.0, 360.0, 12.0]
+    return pd.DataFrame(values, index=index, columns=['VHM0', 'VMDR', 'VTM10'])
+
+
+@pytest.mark.parametrize('scaler_type', ['minmax', 'standard'])
+def test_default_matches_scale_data(hourly, scaler_type):
+    daily = hourly.resample('D').mean()
+    train, valid, test, test_index = split_dataframe(daily)
+    expected = scale_data(train, valid, test, scaler_type)[:3]
+
+    splits = PreprocessingPipeline(freq='D', scaler_type=scaler_type, window_size=5).fit_transform(hourly)
+
+    for name, expected_split in zip(('train', 'valid', 'test'), expected):
+        assert splits[name].dtype == np.float64
+        np.testing.assert_allclose(splits[name], expected_split, rtol=0, atol=1e-12)
+    pd.testing.assert_index_equal(splits['test_index'], test_index)
+    trainX, trainY = sliding_window(expected[0], 5)
+    np.testing.assert_allclose(splits['trainX'], trainX, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(splits['trainY'], trainY, rtol=0, atol=1e-12)
+
+
+def test_float32_within_documented_tolerance(hourly):
+    expected = PreprocessingPipeline(scaler_type='minmax').fit_transform(hourly)
+
+    splits = PreprocessingPipeline(scaler_type='minmax', dtype='float32').fit_transform(hourly)
+
+    assert splits['train'].dtype == np.float32
+    np.testing.assert_allclose(splits['test'], expected['test'], rtol=0, atol=1e-6)
+
+
+def test_saved_pipeline_transforms_and_inverts(hourly, tmp_path):
+    pipeline = PreprocessingPipeline(freq='D', scaler_type='standard')
+    splits = pipeline.fit_transform(hourly)
+    pipeline.save(tmp_path / 'pipeline.json')
+
+    loaded = PreprocessingPipeline.load(tmp_path / 'pipeline.json')
+
+    np.testing.assert_array_equal(loaded.transform(hourly)[-len(splits['test']):], splits['test'])
+    np.testing.assert_allclose(loaded.inverse_transform(splits['test']),
+                               hourly.resample('D').mean().to_numpy()[-len(splits['test']):], rtol=1e-12)
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from functions.checks_and_preprocessing.lagging_and_splitting import sliding_window
+from functions.models.windowed_dataset import gather_windows, make_windowed_dataset, tf, window_count, windowed_batches
+
+
+@pytest.fixture
+def series():
+    return np.random.default_rng(0).random((103, 4)).astype(np.float32)
+
+
+@pytest.mark.parametrize('n_rows, window_size', [(103, 10), (12, 10), (11, 10), (3, 10)])
+def test_window_count_matches_sliding_window(n_rows, window_size):
+    x, y = sliding_window(np.zeros((n_rows, 2)), window_size)
+
+    assert window_count(n_rows, window_size) == len(x) == len(y)
+
+
+def test_gather_windows_matches_sliding_window(series):
+    x, y = sliding_window(series, 10)
+    starts = np.array([0, 5, 41, len(x) - 1])
+
+    batch_x, batch_y = gather_windows(series, starts, 10)
+
+    np.testing.assert_array_equal(batch_x, x[starts])
+    np.testing.assert_array_equal(batch_y, y[starts])
+
+
+@pytest.mark.parametrize('batch_size', [32, 7, 92, 200])
+def test_windowed_batches_match_sliding_window(series, batch_size):
+    x, y = sliding_window(series, 10)
+
+    batches = list(windowed_batches(series, 10, batch_size=batch_size))
+
+    # Every batch is full except the last partial one
+    assert [len(batch_x) for batch_x, _ in batches[:-1]] == [batch_size] * (len(batches) - 1)
+    assert 0 < len(batches[-1][0]) <= batch_size
+    np.testing.assert_array_equal(np.concatenate([batch_x for batch_x, _ in batches]), x)
+    np.testing.assert_array_equal(np.concatenate([batch_y for _, batch_y in batches]), y)
+
+
+def test_shuffled_batches_hold_every_window_once(series):
+    x, y = sliding_window(series, 10)
+
+    batches = list(windowed_batches(series, 10, batch_size=32, shuffle=True, seed=1))
+    batch_x = np.concatenate([batch_x for batch_x, _ in batches])
+    batch_y = np.concatenate([batch_y for _, batch_y in batches])
+
+    assert len(batches[-1][0]) == len(x) % 32
+    assert not np.array_equal(batch_x, x)
+    # Each window carries its first row, which is unique in random data: use it to undo the shuffle
+    order = np.argsort(batch_x[:, 0, 0])
+    expected = np.argsort(x[:, 0, 0])
+    np.testing.assert_array_equal(batch_x[order], x[expected])
+    np.testing.assert_array_equal(batch_y[order], y[expected])
+
+
+def test_windowed_batches_read_from_memmap(series, tmp_path):
+    mapped = np.memmap(tmp_path / 'series.dat', dtype=series.dtype, mode='w+', shape=series.shape)
+    mapped[:] = series
+    x, y = sliding_window(series, 10)
+
+    batch_x, batch_y = next(windowed_batches(mapped, 10, batch_size=len(x)))
+
+    np.testing.assert_array_equal(batch_x, x)
+    np.testing.assert_array_equal(batch_y, y)
+
+
+@pytest.mark.skipif(tf is None, reason='TensorFlow is not installed')
+def test_make_windowed_dataset_matches_sliding_window(series):
+    x, y = sliding_window(series, 10)
+
+    batches = list(make_windowed_dataset(series, 10, batch_size=32).as_numpy_iterator())
+
+    np.testing.assert_array_equal(np.concatenate([batch_x for batch_x, _ in batches]), x)
+    np.testing.assert_array_equal(np.concatenate([batch_y for _, batch_y in batches]), y)